@@ -1,22 +1,40 @@
 # BSFwebdashboard.py - Main Flask application for BSF Larvae Monitoring Dashboard
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, send_file, Response
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, send_file, Response, make_response, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, date, timedelta, timezone
 from collections import defaultdict
 import os
 import base64
 from PIL import Image
-from io import BytesIO
+from io import BytesIO, StringIO
 from random import uniform, randint
 import json
+import csv
+import sqlite3
 import time
+import numpy as np
 from flask import Response, stream_with_context
-import queue  # Add this import
 # Add query optimization
-from sqlalchemy.orm import load_only
+from sqlalchemy.orm import load_only, deferred
+from sqlalchemy import func, case, select, tuple_, event, and_
+
+import metrics_engine
+import json_stream
+import fast_json
+from fast_json import FastJSONProvider
+import columnar
+import mask_codec
+from quantile_sketch import TDigest, merge_all
+from event_broadcaster import EventBroadcaster
+from event_bus import build_event_bus
+from event_coalescer import EventCoalescer
+from response_cache import build_response_cache
+from overlay_renderer import OverlayRenderer, OVERLAY_STYLES, OVERLAY_SIZES
+from session_auth import UserRecord, UserCache, session_login_required
+from functools import wraps
 
 import threading
 import paho.mqtt.client as mqtt
@@ -25,9 +43,7 @@ import gc
 import uuid
 import collections
 from collections import OrderedDict
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email_outbox import SMTPSender, OutboxWorker, utcnow
 import random
 import string
 
@@ -52,7 +68,9 @@ import string
 
 # --- Flask App Configuration ---
 app = Flask(__name__, static_folder='static')
-app.secret_key = os.urandom(24)
+# Set SECRET_KEY when running more than one worker, or sessions only work on the worker that issued them
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
+app.json = FastJSONProvider(app)  # orjson with NumPy arrays serialized natively (stdlib fallback)
 
 # PostgreSQL Database Configuration
 database_url = os.environ.get('DATABASE_URL', 'sqlite:///larvae_monitoring.db')
@@ -73,6 +91,43 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False  # Reduce JSON size
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# Versioned response cache for dashboard reads (set RESPONSE_CACHE_DIR to share it between workers)
+response_cache = build_response_cache(
+    cache_dir=os.environ.get('RESPONSE_CACHE_DIR'),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+)
+
+# Uploaded images are only stored (with their boxes and masks) when this is set
+IMAGES_ENABLED = os.environ.get('IMAGES_ENABLED', 'false').lower() == 'true'
+
+# Gallery pages from /api/images (metadata only; pictures come from the thumbnail/overlay routes)
+IMAGE_PAGE_SIZE = int(os.environ.get('IMAGE_PAGE_SIZE', 12))
+IMAGE_PAGE_MAX = 60
+THUMBNAIL_SIZE = 320  # One of OVERLAY_SIZES
+# /image/<id> streams the stored image in pieces of this many bytes (memory per download stays bounded)
+IMAGE_CHUNK_SIZE = int(os.environ.get('IMAGE_CHUNK_SIZE', 256 * 1024))
+
+# Detection overlays are drawn here on request, in a worker pool, and cached per (image, style, size);
+# set OVERLAY_CACHE_DIR to share rendered overlays between workers
+overlays = OverlayRenderer(
+    build_response_cache(
+        cache_dir=os.environ.get('OVERLAY_CACHE_DIR'),
+        max_bytes=int(os.environ.get('OVERLAY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    ),
+    workers=int(os.environ.get('OVERLAY_WORKERS', min(4, os.cpu_count() or 1)))
+)
+
+# Per-row responses for users with more larvae rows than this are streamed instead of built in memory
+STREAM_ROW_THRESHOLD = int(os.environ.get('STREAM_ROW_THRESHOLD', 20000))
+
+# Weight a tray is projected to reach for harvest (same unit as LarvaeData.weight);
+# defaults to the top bin of the dashboard's weight distribution
+HARVEST_TARGET_WEIGHT = float(os.environ.get('HARVEST_TARGET_WEIGHT', metrics_engine.WEIGHT_BIN_EDGES[-1]))
+
+# Rows per keyset page in /api/export; the DB connection is released between pages
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 5000))
+EXPORT_COLUMNS = ('id', 'tray_number', 'timestamp', 'length', 'width', 'area', 'weight', 'count')
+
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
@@ -103,24 +158,8 @@ def cleanup_memory():
     while True:
         time.sleep(30)  # Run every 30 seconds (changed from 60)
         try:
-            # Clean up inactive SSE clients (reduced from 120)
-            removed = client_manager.cleanup_inactive(max_age_seconds=60)
-            
-            # Force disconnect clients if too many
-            with client_manager.lock:
-                if len(client_manager.clients) > 5:
-                    # Remove oldest clients
-                    to_remove = list(client_manager.clients.keys())[:-5]
-                    for client_id in to_remove:
-                        client_manager.clients.pop(client_id, None)
-                    print(f"🧹 Force removed {len(to_remove)} excess clients")
-            
-            # Aggressive garbage collection
+            # SSE streams unsubscribe themselves when they end; just collect garbage
             gc.collect()
-            
-            if removed:
-                print(f"🧹 Memory cleanup: removed {len(removed)} clients")
-            
         except Exception as e:
             print(f"⚠️ Cleanup error: {e}")
             
@@ -138,92 +177,29 @@ mqtt_client = None
 mqtt_thread = None
 
 
-# --- Thread-safe SSE Client Management ---
-class ClientManager:
-    """Thread-safe manager for SSE clients to prevent memory leaks"""
-    def __init__(self):
-        self.clients = OrderedDict()
-        self.lock = threading.Lock()
-        self.max_clients = 10  # Prevent memory exhaustion
-        self.max_queue_size = 5  # Prevent queue memory bloat
-    
-    def add_client(self, client_id):
-        """Add a new client with a bounded queue"""
-        with self.lock:
-            if len(self.clients) >= self.max_clients:
-                # Remove oldest client to prevent memory exhaustion
-                oldest_id = next(iter(self.clients))
-                self.clients.pop(oldest_id, None)
-                print(f"🧹 Removed oldest client {oldest_id} to prevent memory overflow")
-            
-            client_queue = queue.Queue(maxsize=self.max_queue_size)
-            self.clients[client_id] = {
-                'queue': client_queue,
-                'created': time.time(),
-                'last_active': time.time()
-            }
-            print(f"✅ Added client {client_id}, total: {len(self.clients)}")
-            return client_queue
-    
-    def remove_client(self, client_id):
-        """Remove a client"""
-        with self.lock:
-            if client_id in self.clients:
-                self.clients.pop(client_id, None)
-                print(f"✅ Removed client {client_id}, remaining: {len(self.clients)}")
-    
-    def broadcast(self, data):
-        """Broadcast data to all clients - thread-safe with timeout"""
-        disconnected = []
-        
-        with self.lock:
-            clients_copy = list(self.clients.items())
-        
-        for client_id, client_info in clients_copy:
-            try:
-                # Use put_nowait with bounded queue to prevent memory bloat
-                client_info['queue'].put_nowait(data)
-                client_info['last_active'] = time.time()
-            except queue.Full:
-                # Queue is full - client is not reading fast enough, remove it
-                print(f"⚠️ Queue full for client {client_id}, removing")
-                disconnected.append(client_id)
-            except Exception as e:
-                print(f"❌ Error sending to client {client_id}: {e}")
-                disconnected.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected:
-            self.remove_client(client_id)
-        
-        return len(clients_copy) - len(disconnected)
-    
-    def cleanup_inactive(self, max_age_seconds=120):
-        """Remove inactive clients (older than max_age_seconds)"""
-        current_time = time.time()
-        removed = []
-        
-        with self.lock:
-            to_remove = []
-            for client_id, client_info in list(self.clients.items()):
-                if current_time - client_info['last_active'] > max_age_seconds:
-                    to_remove.append(client_id)
-            
-            for client_id in to_remove:
-                self.clients.pop(client_id, None)
-                removed.append(client_id)
-        
-        if removed:
-            print(f"🧹 Cleaned up {len(removed)} inactive clients")
-        return removed
+# --- SSE Event Broadcasting ---
+# One shared ring buffer of sequence-numbered events; streams block until a newer sequence arrives
+event_broadcaster = EventBroadcaster(
+    capacity=int(os.environ.get('SSE_BUFFER_EVENTS', 256)),
+    max_clients=int(os.environ.get('SSE_MAX_CLIENTS', 10))
+)
 
-# Initialize the thread-safe client manager
-client_manager = ClientManager()
+# Carries events to the streams held by other processes (gunicorn workers, mqtt_worker.py);
+# set EVENT_BUS_URL to a postgresql:// URL or unix:///path to run more than one
+event_bus = build_event_bus(event_broadcaster.publish, os.environ.get('EVENT_BUS_URL'))
 
-# Keep broadcast_to_clients for backward compatibility
-def broadcast_to_clients(data):
-    """Legacy function - use client_manager.broadcast instead"""
-    return client_manager.broadcast(data)
+# Where dashboards open their event stream: this app's /stream by default, or sse_server.py
+SSE_STREAM_URL = os.environ.get('SSE_STREAM_URL')
+
+# Uploads to one tray within this many seconds go out as a single data-carrying SSE event
+SSE_COALESCE_SECONDS = float(os.environ.get('SSE_COALESCE_SECONDS', 1.0))
+
+def broadcast_to_clients(data, user_id=None):
+    """
+    Publishes an event to the user's SSE streams (those following its tray_number, or all
+    trays) in every process. Returns its local sequence number.
+    """
+    return event_bus.publish(data, user_id, data.get('tray_number'))
 
 
 
@@ -264,8 +240,12 @@ class ImageFile(db.Model):
     tray_number = db.Column(db.Integer, nullable=False,index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
+    # The image and its detections are deferred with raiseload: ImageFile queries never pull
+    # them into memory, and reading one that wasn't asked for raises instead of quietly
+    # querying again. Fetch them with image_blob(), or undefer() them on the query.
+
     # Use LargeBinary for PostgreSQL BYTEA - MADE OPTIONAL
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    image_data = deferred(db.Column(db.LargeBinary, nullable=True), raiseload=True)
     image_format = db.Column(db.String(10), nullable=True)
     image_size = db.Column(db.Integer, nullable=True)
     
@@ -276,18 +256,32 @@ class ImageFile(db.Model):
     count = db.Column(db.Integer, nullable=True)
     
     # Use Text for PostgreSQL (better for large JSON)
-    bounding_boxes = db.Column(db.Text, nullable=True)
-    masks = db.Column(db.Text, nullable=True)
+    bounding_boxes = deferred(db.Column(db.Text, nullable=True), raiseload=True)
+    masks = deferred(db.Column(db.Text, nullable=True), raiseload=True)
+    # "[height, width]" of the capture the detections were made on; the stored image may be smaller
+    detection_frame = db.Column(db.String(32), nullable=True)
 
     # ADDED: Composite index for common queries
     __table_args__ = (
         db.Index('idx_image_tray_timestamp', 'tray_number', 'timestamp'),
         db.Index('idx_image_user_tray', 'user_id', 'tray_number'),
+        # Keyset pagination order for the /api/images gallery, per tray and across trays
+        db.Index('idx_image_user_tray_ts_id', 'user_id', 'tray_number', 'timestamp', 'id'),
+        db.Index('idx_image_user_ts_id', 'user_id', 'timestamp', 'id'),
     )
 
     def __repr__(self):
         return f"<ImageFile Tray {self.tray_number} - {self.timestamp}>"
 
+def image_blob(image_id, user_id, *columns):
+    """
+    The heavy columns of one of the user's images, e.g. image_blob(id, uid, ImageFile.image_data,
+    ImageFile.image_format), as a Row - or None if the image doesn't exist or isn't theirs.
+    """
+    return db.session.execute(
+        select(*columns).where(ImageFile.id == image_id, ImageFile.user_id == user_id)
+    ).first()
+
 class LarvaeData(db.Model):
     __tablename__ = "larvae_data"
     id = db.Column(db.Integer, primary_key=True)
@@ -304,35 +298,566 @@ class LarvaeData(db.Model):
     __table_args__ = (
         db.Index('idx_larvae_tray_timestamp', 'tray_number', 'timestamp'),
         db.Index('idx_larvae_user_tray', 'user_id', 'tray_number'),
+        # Covering index for latest-capture lookups: rows come back already ordered
+        # per tray and PostgreSQL can answer them with an index-only scan
+        db.Index('idx_larvae_user_tray_ts', 'user_id', 'tray_number', 'timestamp',
+                 postgresql_include=['length', 'width', 'area', 'weight', 'count']),
+        # Keyset pagination order for /api/export
+        db.Index('idx_larvae_user_ts_id', 'user_id', 'timestamp', 'id'),
     )
 
     def __repr__(self):
         return f"<LarvaeData Tray {self.tray_number} - {self.timestamp}>"
 
+class TraySummary(db.Model):
+    """Per-tray rollup maintained on ingest so pages don't rescan larvae_data."""
+    __tablename__ = "tray_summary"
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    tray_number = db.Column(db.Integer, primary_key=True)
+    first_timestamp = db.Column(db.DateTime, nullable=False)
+    last_timestamp = db.Column(db.DateTime, nullable=False)
+    total_count = db.Column(db.Integer, nullable=False, default=0)    # Sum of LarvaeData.count
+    capture_count = db.Column(db.Integer, nullable=False, default=0)  # Number of uploads
+
+    # Averages of the latest capture
+    latest_length = db.Column(db.Float, nullable=False, default=0.0)
+    latest_width = db.Column(db.Float, nullable=False, default=0.0)
+    latest_area = db.Column(db.Float, nullable=False, default=0.0)
+    latest_weight = db.Column(db.Float, nullable=False, default=0.0)
+    latest_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Sums over every larvae row, so combined metrics don't have to average larvae_data
+    larvae_rows = db.Column(db.Integer, nullable=False, default=0)
+    sum_length = db.Column(db.Float, nullable=False, default=0.0)
+    sum_width = db.Column(db.Float, nullable=False, default=0.0)
+    sum_area = db.Column(db.Float, nullable=False, default=0.0)
+    sum_weight = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<TraySummary User {self.user_id} Tray {self.tray_number} - {self.last_timestamp}>"
+
+class WeightSketch(db.Model):
+    """Per (user, tray, day) t-digest of larva weights, merged to answer quantile queries."""
+    __tablename__ = "weight_sketch"
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    tray_number = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC capture date
+    count = db.Column(db.Integer, nullable=False, default=0)  # Larvae folded into the digest
+    digest = db.Column(db.LargeBinary, nullable=False)       # TDigest.to_bytes()
+
+    def __repr__(self):
+        return f"<WeightSketch User {self.user_id} Tray {self.tray_number} - {self.day}>"
+
+class GrowthStats(db.Model):
+    """
+    Per (user, tray, day) sufficient statistics of larva weight over time (t in days since
+    metrics_engine.GROWTH_EPOCH). Summing days gives any window's regression in O(1).
+    """
+    __tablename__ = "growth_stats"
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    tray_number = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC capture date
+    n = db.Column(db.Float, nullable=False, default=0.0)  # Larvae
+    sum_t = db.Column(db.Float, nullable=False, default=0.0)
+    sum_w = db.Column(db.Float, nullable=False, default=0.0)
+    sum_tt = db.Column(db.Float, nullable=False, default=0.0)
+    sum_tw = db.Column(db.Float, nullable=False, default=0.0)
+    sum_ww = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<GrowthStats User {self.user_id} Tray {self.tray_number} - {self.day}>"
+
+class EmailOutbox(db.Model):
+    """Emails queued by request handlers and delivered in the background by email_outbox.OutboxWorker."""
+    __tablename__ = "email_outbox"
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)  # Cleared once sent
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending | sending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    claimed_at = db.Column(db.DateTime)  # When a worker marked it 'sending'
+    sent_at = db.Column(db.DateTime)
+    send_ms = db.Column(db.Float)  # Duration of the successful SMTP exchange
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('idx_email_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} to {self.recipient} - {self.status}>"
+
+# Lightweight user records for current_user, so @login_required rarely queries the users table
+user_cache = UserCache(ttl=float(os.environ.get('USER_CACHE_TTL_SECONDS', 60)))
+
+def load_user_record(user_id):
+    row = db.session.execute(
+        select(User.id, User.username, User.is_verified).where(User.id == user_id)
+    ).first()
+    return UserRecord(*row) if row else None
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), load_user_record)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+def request_user_id():
+    """Logged-in user's id: from the session on @session_login_required routes, else Flask-Login."""
+    return g.user_id if 'user_id' in g else current_user.id
 
 # --- Helper Functions ---
-def get_latest_tray_data(tray_number):
-    """Fetches the most recent larvae data entry for a specific tray."""
-    return LarvaeData.query.filter_by(tray_number=tray_number).order_by(LarvaeData.timestamp.desc()).first()
+def get_latest_tray_data(tray_number, user_id):
+    """Fetches the summary row (latest capture, totals) for a specific tray."""
+    return db.session.get(TraySummary, (user_id, tray_number))
+
+def get_user_tray_numbers(user_id):
+    """Lists a user's tray numbers from the summary table."""
+    rows = db.session.query(TraySummary.tray_number)\
+                     .filter_by(user_id=user_id)\
+                     .order_by(TraySummary.tray_number)\
+                     .all()
+    return [row[0] for row in rows]
+
+def _dialect_insert(table):
+    """Returns an INSERT construct supporting ON CONFLICT for the active database."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def update_tray_summary(user_id, tray_number, captured_at, larvae_count, rows, avg_length, avg_width, avg_area, avg_weight):
+    """
+    Folds one capture into tray_summary with a single upsert.
+    Runs inside the caller's transaction, so the summary commits together with the larvae rows.
+    """
+    table = TraySummary.__table__
+    stmt = _dialect_insert(table).values(
+        user_id=user_id,
+        tray_number=tray_number,
+        first_timestamp=captured_at,
+        last_timestamp=captured_at,
+        total_count=larvae_count,
+        capture_count=1,
+        latest_length=avg_length,
+        latest_width=avg_width,
+        latest_area=avg_area,
+        latest_weight=avg_weight,
+        latest_count=rows,
+        # Every row of a capture shares its length, width and area; avg_weight is their mean weight
+        larvae_rows=rows,
+        sum_length=rows * avg_length,
+        sum_width=rows * avg_width,
+        sum_area=rows * avg_area,
+        sum_weight=rows * avg_weight
+    )
+    excluded = stmt.excluded
+    is_newer = excluded.last_timestamp >= table.c.last_timestamp
+
+    def _latest(column):
+        # Only replace the latest-capture fields if this capture is not older
+        return case((is_newer, excluded[column]), else_=table.c[column])
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.tray_number],
+        set_={
+            'total_count': table.c.total_count + excluded.total_count,
+            'capture_count': table.c.capture_count + 1,
+            'first_timestamp': case((excluded.first_timestamp < table.c.first_timestamp, excluded.first_timestamp),
+                                    else_=table.c.first_timestamp),
+            'last_timestamp': _latest('last_timestamp'),
+            'latest_length': _latest('latest_length'),
+            'latest_width': _latest('latest_width'),
+            'latest_area': _latest('latest_area'),
+            'latest_weight': _latest('latest_weight'),
+            'latest_count': _latest('latest_count'),
+            **{column: table.c[column] + excluded[column]
+               for column in ('larvae_rows', 'sum_length', 'sum_width', 'sum_area', 'sum_weight')},
+        }
+    )
+    db.session.execute(stmt)
+
+def rebuild_tray_summaries(user_id=None):
+    """Recomputes tray_summary from larvae_data (all users, or one user)."""
+    delete_query = TraySummary.query
+    totals_query = db.session.query(
+        LarvaeData.user_id,
+        LarvaeData.tray_number,
+        func.min(LarvaeData.timestamp).label('first_timestamp'),
+        func.sum(LarvaeData.count).label('total_count'),
+        func.count(func.distinct(LarvaeData.timestamp)).label('capture_count'),
+        func.count().label('larvae_rows'),
+        func.sum(LarvaeData.length).label('sum_length'),
+        func.sum(LarvaeData.width).label('sum_width'),
+        func.sum(LarvaeData.area).label('sum_area'),
+        func.sum(LarvaeData.weight).label('sum_weight')
+    )
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        totals_query = totals_query.filter(LarvaeData.user_id == user_id)
+
+    totals = {
+        (row.user_id, row.tray_number): row
+        for row in totals_query.group_by(LarvaeData.user_id, LarvaeData.tray_number).all()
+    }
+
+    delete_query.delete(synchronize_session=False)
+    for capture in latest_capture_per_tray(user_id):
+        total = totals[(capture.user_id, capture.tray_number)]
+        db.session.add(TraySummary(
+            user_id=capture.user_id,
+            tray_number=capture.tray_number,
+            first_timestamp=total.first_timestamp,
+            last_timestamp=capture.timestamp,
+            total_count=total.total_count or 0,
+            capture_count=total.capture_count,
+            latest_length=capture.avg_length,
+            latest_width=capture.avg_width,
+            latest_area=capture.avg_area,
+            latest_weight=capture.avg_weight,
+            latest_count=capture.rows,
+            larvae_rows=total.larvae_rows,
+            sum_length=total.sum_length or 0.0,
+            sum_width=total.sum_width or 0.0,
+            sum_area=total.sum_area or 0.0,
+            sum_weight=total.sum_weight or 0.0
+        ))
+    db.session.commit()
+    return len(totals)
+
+def naive_utc(captured_at):
+    """Capture timestamp as naive UTC, the way the DateTime columns store it."""
+    return captured_at.astimezone(timezone.utc).replace(tzinfo=None) if captured_at.tzinfo else captured_at
+
+def utc_day(captured_at):
+    """UTC calendar date of a capture timestamp."""
+    return naive_utc(captured_at).date()
+
+def update_weight_sketch(user_id, tray_number, captured_at, weights, counts=None):
+    """
+    Folds a capture's larva weights (optionally weighted by counts) into the day's t-digest.
+    Runs inside the caller's transaction; the row lock keeps concurrent uploads from losing updates.
+    """
+    capture = TDigest().add(weights, counts)
+    if not capture.weights.size:
+        return
+
+    # FOR UPDATE locks nothing while the day's row doesn't exist, so two first uploads of the
+    # day would both INSERT it; create it empty (a no-op if it's there) and then lock it
+    day = utc_day(captured_at)
+    table = WeightSketch.__table__
+    db.session.execute(
+        _dialect_insert(table).values(user_id=user_id, tray_number=tray_number, day=day,
+                                      count=0, digest=TDigest().to_bytes())
+                              .on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.tray_number, table.c.day])
+    )
+    sketch = WeightSketch.query.filter_by(user_id=user_id, tray_number=tray_number, day=day)\
+                               .with_for_update()\
+                               .populate_existing()\
+                               .one()
+
+    digest = TDigest.from_bytes(sketch.digest).merge(capture)
+    sketch.digest = digest.to_bytes()
+    sketch.count = int(round(digest.count))
+
+def rebuild_weight_sketches(user_id=None):
+    """Recomputes weight_sketch from larvae_data (all users, or one user), reading rows in chunks."""
+    delete_query = WeightSketch.query
+    rows_query = select(
+        LarvaeData.user_id, LarvaeData.tray_number, LarvaeData.timestamp, LarvaeData.weight, LarvaeData.count
+    ).order_by(LarvaeData.user_id, LarvaeData.tray_number, LarvaeData.timestamp)
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        rows_query = rows_query.where(LarvaeData.user_id == user_id)
+
+    digests = {}
+    for chunk in metrics_engine.iter_column_chunks(db.session, rows_query):
+        days = chunk['timestamp'].astype('datetime64[D]')
+        keys = np.rec.fromarrays((chunk['user_id'], chunk['tray_number'], days))
+        for start, end in metrics_engine.group_slices(keys):
+            key = (int(chunk['user_id'][start]), int(chunk['tray_number'][start]), days[start].item())
+            digest = digests.setdefault(key, TDigest())
+            digest.add(chunk['weight'][start:end], chunk['count'][start:end])
+
+    delete_query.delete(synchronize_session=False)
+    for (sketch_user_id, tray_number, day), digest in digests.items():
+        if digest.weights.size:
+            db.session.add(WeightSketch(user_id=sketch_user_id, tray_number=tray_number, day=day,
+                                        count=int(round(digest.count)), digest=digest.to_bytes()))
+    db.session.commit()
+    return len(digests)
+
+def update_growth_stats(user_id, tray_number, captured_at, weights, counts=None):
+    """Adds a capture's weights to the day's growth sums with a single additive upsert."""
+    t = metrics_engine.days_since_epoch(np.datetime64(naive_utc(captured_at), 'us'))
+    sums = metrics_engine.growth_sums(t, weights, counts)
+    if sums['n'] <= 0:
+        return
+
+    table = GrowthStats.__table__
+    stmt = _dialect_insert(table).values(user_id=user_id, tray_number=tray_number, day=utc_day(captured_at), **sums)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.tray_number, table.c.day],
+        set_={name: table.c[name] + stmt.excluded[name] for name in metrics_engine.GROWTH_SUM_NAMES}
+    )
+    db.session.execute(stmt)
+
+def rebuild_growth_stats(user_id=None):
+    """Recomputes growth_stats from larvae_data (all users, or one user), reading rows in chunks."""
+    delete_query = GrowthStats.query
+    rows_query = select(
+        LarvaeData.user_id, LarvaeData.tray_number, LarvaeData.timestamp, LarvaeData.weight, LarvaeData.count
+    ).where(LarvaeData.timestamp.isnot(None))\
+     .order_by(LarvaeData.user_id, LarvaeData.tray_number, LarvaeData.timestamp)
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        rows_query = rows_query.where(LarvaeData.user_id == user_id)
+
+    totals = {}
+    for chunk in metrics_engine.iter_column_chunks(db.session, rows_query):
+        days = chunk['timestamp'].astype('datetime64[D]')
+        t = metrics_engine.days_since_epoch(chunk['timestamp'])
+        keys = np.rec.fromarrays((chunk['user_id'], chunk['tray_number'], days))
+        for start, end in metrics_engine.group_slices(keys):
+            key = (int(chunk['user_id'][start]), int(chunk['tray_number'][start]), days[start].item())
+            sums = metrics_engine.growth_sums(t[start:end], chunk['weight'][start:end], chunk['count'][start:end])
+            total = totals.setdefault(key, dict.fromkeys(metrics_engine.GROWTH_SUM_NAMES, 0.0))
+            for name, value in sums.items():
+                total[name] += value
+
+    delete_query.delete(synchronize_session=False)
+    for (stats_user_id, tray_number, day), sums in totals.items():
+        if sums['n'] > 0:
+            db.session.add(GrowthStats(user_id=stats_user_id, tray_number=tray_number, day=day, **sums))
+    db.session.commit()
+    return len(totals)
+
+def latest_capture_per_tray(user_id=None, from_summary=False):
+    """
+    Aggregates the latest capture of every tray (for one user, or all users) in one query.
+    All larvae of a capture share the same timestamp, so the latest timestamp of each tray is
+    looked up first and only that capture's rows are read back, on idx_larvae_user_tray_ts.
+    from_summary takes those timestamps from tray_summary, so the cost doesn't grow with
+    history; rebuild_tray_summaries() leaves it False and takes max(timestamp) per tray.
+    """
+    if from_summary:
+        latest = db.session.query(
+            TraySummary.user_id,
+            TraySummary.tray_number,
+            TraySummary.last_timestamp.label('timestamp')
+        )
+        if user_id is not None:
+            latest = latest.filter(TraySummary.user_id == user_id)
+    else:
+        latest = db.session.query(
+            LarvaeData.user_id,
+            LarvaeData.tray_number,
+            func.max(LarvaeData.timestamp).label('timestamp')
+        )
+        if user_id is not None:
+            latest = latest.filter(LarvaeData.user_id == user_id)
+        latest = latest.group_by(LarvaeData.user_id, LarvaeData.tray_number)
+    latest = latest.subquery()
+
+    return db.session.query(
+        LarvaeData.user_id,
+        LarvaeData.tray_number,
+        func.max(LarvaeData.timestamp).label('timestamp'),
+        func.avg(LarvaeData.length).label('avg_length'),
+        func.avg(LarvaeData.width).label('avg_width'),
+        func.avg(LarvaeData.area).label('avg_area'),
+        func.avg(LarvaeData.weight).label('avg_weight'),
+        func.sum(LarvaeData.count).label('count'),
+        func.count().label('rows')
+    ).select_from(latest).join(LarvaeData, and_(
+        LarvaeData.user_id == latest.c.user_id,
+        LarvaeData.tray_number == latest.c.tray_number,
+        LarvaeData.timestamp == latest.c.timestamp
+    )).group_by(LarvaeData.user_id, LarvaeData.tray_number)\
+     .order_by(LarvaeData.user_id, LarvaeData.tray_number)\
+     .all()
 
 def calculate_weight_distribution_backend(weights_array):
-    """Calculates the distribution of larvae weights into predefined bins."""
-    weight_bins = {
-        "80-90": 0, "90-100": 0, "100-110": 0,
-        "110-120": 0, "120-130": 0, "130-140": 0, "140+": 0
+    """Calculates the distribution of larvae weights (mg) into predefined bins."""
+    return metrics_engine.histogram(weights_array, edges=(80, 90, 100, 110, 120, 130, 140), decimals=0)
+
+def larvae_columns_query(user_id, tray_number=None):
+    """Core select of the larvae columns the read endpoints aggregate, ordered by tray and time."""
+    stmt = select(
+        LarvaeData.tray_number,
+        LarvaeData.timestamp,
+        LarvaeData.length,
+        LarvaeData.width,
+        LarvaeData.area,
+        LarvaeData.weight,
+        LarvaeData.count
+    ).where(LarvaeData.user_id == user_id)
+    if tray_number is not None:
+        stmt = stmt.where(LarvaeData.tray_number == tray_number)
+    return stmt.order_by(LarvaeData.tray_number, LarvaeData.timestamp)
+
+def build_weight_distribution(weights):
+    """Weight distribution payload shared by the dashboard endpoints."""
+    ranges, counts = metrics_engine.histogram(weights)
+    return {"ranges": ranges, "counts": counts}
+
+def split_by_tray(columns):
+    """Splits column arrays ordered by tray into {tray_number: column arrays}."""
+    return {
+        int(columns['tray_number'][start]): {name: values[start:end] for name, values in columns.items()}
+        for start, end in metrics_engine.group_slices(columns['tray_number'])
     }
-    for weight in weights_array:
-        if 80 <= weight < 90: weight_bins["80-90"] += 1
-        elif 90 <= weight < 100: weight_bins["90-100"] += 1
-        elif 100 <= weight < 110: weight_bins["100-110"] += 1
-        elif 110 <= weight < 120: weight_bins["110-120"] += 1
-        elif 120 <= weight < 130: weight_bins["120-130"] += 1
-        elif 130 <= weight < 140: weight_bins["130-140"] += 1
-        else: weight_bins["140+"] += 1
-    return list(weight_bins.keys()), list(weight_bins.values())
+
+def wants_streamed_response(user_id):
+    """
+    Whether a per-row response should be streamed: forced with ?stream=1 / ?stream=0,
+    otherwise when the user's trays hold more than STREAM_ROW_THRESHOLD larvae.
+    """
+    stream = request.args.get('stream')
+    if stream is not None:
+        return stream.lower() in ('1', 'true', 'yes')
+    total = db.session.query(func.sum(TraySummary.total_count)).filter_by(user_id=user_id).scalar()
+    return (total or 0) > STREAM_ROW_THRESHOLD
+
+def parse_cursor(value):
+    """Parses a `since` cursor (ISO timestamp of the last capture the client has)."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def encode_page_cursor(timestamp, row_id):
+    """Opaque next-page cursor for keyset pagination on (timestamp, id)."""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode().rstrip('=')
+
+def parse_page_cursor(value):
+    """(timestamp, id) from encode_page_cursor(), or None if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        timestamp, row_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+def is_date_only(value):
+    """True for a plain ISO date like 2026-10-19 (no time part)."""
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def parse_growth_window(args):
+    """
+    Reads the growth-chart query parameters:
+      from / to   - ISO date or datetime bounds on the capture timestamp (a date-only
+                    'to' includes that whole day)
+      bucket      - capture (default), hour or day
+      max_points  - LTTB-downsample each series to at most this many points
+    Returns (window, error_message).
+    """
+    window = {'from': None, 'to': None, 'to_exclusive': False,
+              'bucket': args.get('bucket', 'capture'), 'max_points': None}
+
+    for name in ('from', 'to'):
+        if args.get(name):
+            window[name] = parse_cursor(args[name])
+            if window[name] is None:
+                return None, f"Invalid '{name}' timestamp"
+
+    if window['to'] is not None and is_date_only(args['to']):
+        # to=2026-10-19 means up to the end of that day, i.e. before the next midnight
+        window['to'] += timedelta(days=1)
+        window['to_exclusive'] = True
+
+    if window['bucket'] not in metrics_engine.GROWTH_BUCKETS:
+        return None, f"Invalid bucket. Use one of: {', '.join(metrics_engine.GROWTH_BUCKETS)}"
+
+    if args.get('max_points'):
+        try:
+            window['max_points'] = int(args['max_points'])
+        except ValueError:
+            return None, "Invalid max_points"
+        if window['max_points'] < 2:
+            return None, "max_points must be at least 2"
+
+    return window, None
+
+def delta_extends_series(window, capture_count):
+    """
+    Whether per-capture delta points can be appended to a growth series fetched with this
+    window: not onto hour/day buckets (the last one may still be filling), and not once the
+    tray has more than max_points captures, where the series was LTTB-downsampled and raw
+    points would mix resolutions and grow it past max_points. capture_count counts uploads,
+    which close uploads merge into fewer points, so this errs toward a reload.
+    """
+    return window['bucket'] == 'capture' and (not window['max_points'] or capture_count <= window['max_points'])
+
+def with_time_range(query, window):
+    """Applies the window's from/to bounds to a larvae select."""
+    if window['from'] is not None:
+        query = query.where(LarvaeData.timestamp >= window['from'])
+    if window['to'] is not None:
+        query = query.where(LarvaeData.timestamp < window['to'] if window['to_exclusive']
+                            else LarvaeData.timestamp <= window['to'])
+    return query
+
+def growth_start_time(tray_columns, first_timestamp=None):
+    """Zero of the hours axis: the tray's first capture (taken from tray_summary when the rows start later)."""
+    if first_timestamp is not None:
+        return np.datetime64(first_timestamp.replace(tzinfo=None), 'us')
+    return tray_columns['timestamp'][0]
+
+def cached_response(endpoint_name):
+    """
+    Caches a read endpoint's 200 response per (user, endpoint, tray, query params).
+    upload_image bumps the tray version on commit, which invalidates the entry.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # The negotiated format is part of the key, so JSON and binary bodies are cached separately
+            params = [*request.args.items(multi=True), ('format', negotiated_mimetype())]
+            # Tray 0 is the all-trays view, invalidated by an upload to any tray
+            tray_number = kwargs.get('tray_number') or None
+            key = response_cache.make_key(request_user_id(), endpoint_name, tray_number, params)
+            cached = response_cache.get(key)
+            if cached is not None:
+                mimetype, body = cached
+                response = Response(body, mimetype=mimetype)
+                response.vary.add('Accept')
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.put(key, response.mimetype, response.get_data())
+            return response
+        return wrapper
+    return decorator
+
+def negotiated_mimetype():
+    """Response format picked from the Accept header: JSON unless a columnar format is preferred."""
+    return request.accept_mimetypes.best_match(columnar.MIMETYPES, default=columnar.JSON_MIMETYPE)
+
+def chart_data_response(payload):
+    """
+    Chart payload as JSON, or as float32 columns (application/x-bsf-columns, or Arrow IPC
+    when pyarrow is installed) for clients whose Accept header prefers them.
+    """
+    mimetype = negotiated_mimetype()
+    if mimetype == columnar.JSON_MIMETYPE:
+        response = jsonify(payload)
+    else:
+        response = Response(columnar.encode(payload, mimetype), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
 
 # --- Flask Routes ---
 @app.route('/')
@@ -462,32 +987,14 @@ def resend_verification_code(user_id):
 
 
 def send_verification_email(email, code):
-    """Send verification code via email using SMTP."""
+    """Queue the verification code email for background delivery; False if SMTP isn't configured."""
     # Always print code to console for debugging
     print(f"\n{'='*60}")
     print(f"📧 VERIFICATION CODE for {email}: {code}")
     print(f"{'='*60}\n")
-    
-    try:
-        # Email configuration - replace with your SMTP settings
-        smtp_server = os.environ.get('SMTP_SERVER', '')
-        smtp_port = int(os.environ.get('SMTP_PORT', 587))
-        smtp_username = os.environ.get('SMTP_USERNAME', '')
-        smtp_password = os.environ.get('SMTP_PASSWORD', '')
-        from_email = os.environ.get('FROM_EMAIL', smtp_username)
-        
-        if not smtp_server or not smtp_username or not smtp_password:
-            print("⚠️ SMTP not configured. Code displayed above.")
-            return False
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = 'Email Verification - BSF Larvae Monitoring'
-        msg['From'] = from_email
-        msg['To'] = email
-        
-        # HTML email body
-        html = f"""
+
+    # HTML email body
+    html = f"""
         <html>
           <body style="font-family: Arial, sans-serif; padding: 20px;">
             <div style="max-width: 600px; margin: 0 auto; background-color: #f9f9f9; padding: 30px; border-radius: 10px;">
@@ -503,36 +1010,181 @@ def send_verification_email(email, code):
           </body>
         </html>
         """
-        
-        msg.attach(MIMEText(html, 'html'))
-        
-        # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        
-        print(f"✅ Verification email sent to {email}")
-        return True
-        
+    return queue_email(email, 'Email Verification - BSF Larvae Monitoring', html)
+
+
+def queue_email(recipient, subject, html):
+    """Add an email to the outbox and wake the worker; the SMTP exchange happens off the request."""
+    if email_worker is None:
+        print("⚠️ SMTP not configured. Code displayed above.")
+        return False
+    try:
+        db.session.add(EmailOutbox(recipient=recipient, subject=subject, html=html))
+        db.session.commit()
     except Exception as e:
-        print(f"❌ Failed to send verification email: {e}")
-        print(f"Verification code for {email}: {code}")
+        db.session.rollback()
+        print(f"❌ Failed to queue email to {recipient}: {e}")
         return False
+    email_worker.notify()
+    return True
+
+
+# Background email delivery (one worker thread per process; rows are claimed atomically)
+email_sender = SMTPSender.from_env()
+email_worker = OutboxWorker(app, db, EmailOutbox, email_sender).start() if email_sender else None
 
 
 
+def iter_image_chunks(image_id, start, stop, chunk_size=IMAGE_CHUNK_SIZE):
+    """
+    Yields bytes [start, stop) of a stored image, one substr() query per chunk, so only a
+    chunk is ever in memory. The session is closed after each chunk, so the connection goes
+    back to the pool while the client reads.
+    """
+    if db.engine.dialect.name == 'sqlite' and hasattr(sqlite3.Connection, 'blobopen'):  # Python 3.11+
+        yield from iter_sqlite_image_chunks(image_id, start, stop, chunk_size)
+        return
+
+    offset = start
+    while offset < stop:
+        try:
+            chunk = db.session.execute(
+                select(func.substr(ImageFile.image_data, offset + 1, min(chunk_size, stop - offset)))
+                .where(ImageFile.id == image_id)
+            ).scalar()
+        finally:
+            db.session.close()
+        if not chunk:
+            return
+        yield bytes(chunk)
+        offset += len(chunk)
+
+def iter_sqlite_image_chunks(image_id, start, stop, chunk_size):
+    """
+    SQLite keeps a large BLOB in a chain of overflow pages that every substr() walks from
+    the start, which makes a chunked download quadratic. Its incremental BLOB I/O reads the
+    chain once, through one handle held (with its connection) for the whole download.
+    """
+    try:
+        connection = db.session.connection().connection.driver_connection
+        with connection.blobopen(ImageFile.__tablename__, 'image_data', image_id, readonly=True) as blob:
+            blob.seek(start)
+            offset = start
+            while offset < stop:
+                chunk = blob.read(min(chunk_size, stop - offset))
+                if not chunk:
+                    return
+                yield chunk
+                offset += len(chunk)
+    finally:
+        db.session.close()
+
 @app.route('/image/<int:image_id>')
-@login_required
+@session_login_required
 def get_image(image_id):
-    return "Images are disabled", 404
+    """
+    The stored image as uploaded, streamed from the database in IMAGE_CHUNK_SIZE pieces.
+    Supports a single byte range (Range: bytes=...), If-Range and If-None-Match.
+    """
+    if not IMAGES_ENABLED:
+        return "Images are disabled", 404
+
+    try:
+        # Only the BLOB's length is read here; the bytes themselves come chunk by chunk
+        row = db.session.execute(
+            select(ImageFile.image_format, func.length(ImageFile.image_data).label('length'))
+            .where(ImageFile.id == image_id, ImageFile.user_id == request_user_id())
+        ).first()
+        if row is None or not row.length:
+            return jsonify({"error": "Image not found"}), 404
+
+        total = row.length
+        etag = f"image-{image_id}-{total}"  # Stored images never change
+        headers = {'Accept-Ranges': 'bytes', 'ETag': f'"{etag}"', 'Cache-Control': 'private, max-age=86400'}
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        start, stop, status = 0, total, 200
+        byte_range = request.range
+        # If-Range must be our exact strong ETag (werkzeug's parsed If-Range drops the W/ of a
+        # weak one); there is no Last-Modified to check a date against
+        if_range = request.headers.get('If-Range')
+        if byte_range is not None and (if_range is None or if_range.strip() == headers['ETag']):
+            span = byte_range.range_for_length(total)
+            if span is not None:
+                start, stop = span
+                status = 206
+                headers['Content-Range'] = f"bytes {start}-{stop - 1}/{total}"
+            elif byte_range.units == 'bytes' and len(byte_range.ranges) == 1:
+                return Response(status=416, headers={'Content-Range': f"bytes */{total}"})
+            # Multi-range requests get the whole image
+        headers['Content-Length'] = str(stop - start)
+
+        return Response(
+            stream_with_context(iter_image_chunks(image_id, start, stop)),
+            status=status,
+            mimetype=f"image/{(row.image_format or 'jpeg').lower()}",
+            headers=headers
+        )
+    except Exception as e:
+        app.logger.error(f"Error serving image {image_id}: {e}")
+        return jsonify({"error": str(e)}), 500
 
 
 @app.route('/image_thumbnail/<int:image_id>')
-@login_required
+@session_login_required
 def get_image_thumbnail(image_id):
-    """Image thumbnails are disabled."""
-    return jsonify({"error": "Images are disabled"}), 404
+    """The gallery thumbnail: the default overlay at THUMBNAIL_SIZE px."""
+    if not IMAGES_ENABLED:
+        return jsonify({"error": "Images are disabled"}), 404
+    return overlay_response(image_id, 'default', THUMBNAIL_SIZE)
+
+
+@app.route('/image/<int:image_id>/overlay')
+@session_login_required
+def get_image_overlay(image_id):
+    """
+    The stored image with its detection boxes and masks drawn on, as JPEG.
+    ?style= one of OVERLAY_STYLES (default), ?size= longest side in px, one of OVERLAY_SIZES (0 = stored size).
+    """
+    if not IMAGES_ENABLED:
+        return jsonify({"error": "Images are disabled"}), 404
+
+    style = request.args.get('style', 'default')
+    if style not in OVERLAY_STYLES:
+        return jsonify({"error": f"Invalid style. Use one of: {', '.join(OVERLAY_STYLES)}"}), 400
+    try:
+        size = int(request.args.get('size', 0))
+    except ValueError:
+        size = None
+    if size not in OVERLAY_SIZES:
+        return jsonify({"error": f"Invalid size. Use one of: {', '.join(map(str, OVERLAY_SIZES))}"}), 400
+    return overlay_response(image_id, style, size)
+
+def overlay_response(image_id, style, size):
+    """JPEG response with the rendered (or cached) overlay of one of the user's images."""
+    try:
+        user_id = request_user_id()
+        # Overlays are cached per image, so check ownership before serving one
+        if db.session.query(ImageFile.id).filter_by(id=image_id, user_id=user_id).first() is None:
+            return jsonify({"error": "Image not found"}), 404
+
+        def load():
+            row = image_blob(image_id, user_id, ImageFile.image_data, ImageFile.bounding_boxes, ImageFile.masks,
+                             ImageFile.detection_frame)
+            db.session.commit()  # Hand the connection back to the pool while the overlay renders
+            return tuple(row) if row is not None and row.image_data else None
+
+        body = overlays.get(image_id, style, size, load)
+        if body is None:
+            return jsonify({"error": "Image not found"}), 404
+
+        response = Response(body, mimetype='image/jpeg')
+        response.headers['Cache-Control'] = 'private, max-age=86400'
+        return response
+    except Exception as e:
+        app.logger.error(f"Error rendering overlay for image {image_id}: {e}")
+        return jsonify({"error": str(e)}), 500
 
 # # CHANGED: Updated image API to work with BLOB storage
 # @app.route('/api/images/<tray_number>')
@@ -569,10 +1221,60 @@ def get_image_thumbnail(image_id):
 
 
 @app.route('/api/images/<tray_number>')
-@login_required
+@session_login_required
 def get_images(tray_number):
-    """Images are optional/disabled; return empty list so dashboard still works."""
-    return jsonify([])
+    """
+    One page of the user's images for a tray (or 'all'), newest first, metadata only.
+    ?limit= page size (default IMAGE_PAGE_SIZE, at most IMAGE_PAGE_MAX)
+    ?cursor= the previous page's next_cursor; next_cursor is null on the last page
+    """
+    if not IMAGES_ENABLED:
+        return jsonify({"images": [], "next_cursor": None})
+
+    try:
+        limit = min(max(int(request.args.get('limit', IMAGE_PAGE_SIZE)), 1), IMAGE_PAGE_MAX)
+        tray = None if tray_number == 'all' else int(tray_number)
+    except ValueError:
+        return jsonify({"error": "Invalid tray number or limit"}), 400
+
+    after = None
+    if request.args.get('cursor'):
+        after = parse_page_cursor(request.args['cursor'])
+        if after is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    try:
+        query = select(
+            ImageFile.id, ImageFile.tray_number, ImageFile.timestamp, ImageFile.count,
+            ImageFile.avg_length, ImageFile.avg_weight, ImageFile.image_size, ImageFile.image_format
+        ).where(ImageFile.user_id == request_user_id(), ImageFile.timestamp.isnot(None))
+        if tray is not None:
+            query = query.where(ImageFile.tray_number == tray)
+        if after is not None:
+            query = query.where(tuple_(ImageFile.timestamp, ImageFile.id) < after)
+        # One extra row tells us whether there is a next page
+        rows = db.session.execute(
+            query.order_by(ImageFile.timestamp.desc(), ImageFile.id.desc()).limit(limit + 1)
+        ).all()
+
+        next_cursor = encode_page_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+        images = [{
+            "id": row.id,
+            "tray": row.tray_number,
+            "src": url_for('get_image', image_id=row.id),
+            "thumbnail": url_for('get_image_thumbnail', image_id=row.id),
+            "overlay": url_for('get_image_overlay', image_id=row.id),
+            "timestamp": row.timestamp.isoformat(),
+            "count": row.count,
+            "avgLength": row.avg_length,
+            "avgWeight": row.avg_weight,
+            "size": row.image_size,
+            "format": row.image_format
+        } for row in rows[:limit]]
+        return jsonify({"images": images, "next_cursor": next_cursor})
+    except Exception as e:
+        app.logger.error(f"Error fetching images: {e}")
+        return jsonify({"error": str(e)}), 500
 
 
 
@@ -730,7 +1432,31 @@ def upload_image():
                 return jsonify({"error": "Invalid image format"}), 400
         else:
             print(f"⚠️ No image provided for Tray {tray_number} - storing data only")
+
+        # Masks are stored encoded (RLE or polygon, see mask_codec) and only decoded for overlays
+        save_image = IMAGES_ENABLED and image_binary is not None
+        stored_masks = None
+        detection_frame = None
+        if save_image:
+            try:
+                stored_masks = mask_codec.compact_masks(masks_json)
+            except (ValueError, TypeError, KeyError):
+                return jsonify({"error": "Invalid masks"}), 400
+            if not isinstance(bounding_boxes_json, str):
+                bounding_boxes_json = json.dumps(bounding_boxes_json)
+            detection_frame = data.get('detection_frame')
+            if detection_frame is not None:
+                try:
+                    detection_frame = [int(v) for v in detection_frame]
+                except (ValueError, TypeError):
+                    detection_frame = []
+                if len(detection_frame) != 2 or min(detection_frame) <= 0:
+                    return jsonify({"error": "Invalid detection_frame. Expected [height, width]"}), 400
+                detection_frame = json.dumps(detection_frame)
         
+        # One timestamp per capture so all larvae of an upload group together
+        captured_at = datetime.now(timezone.utc)
+
         # NEW: Save individual larvae data for weight distribution
         if individual_weights and len(individual_weights) > 0:
             print(f"💾 Saving {len(individual_weights)} individual larvae entries for Tray {tray_number}")
@@ -743,7 +1469,7 @@ def upload_image():
                     area=avg_area,
                     weight=weight,  # Individual weight
                     count=1,  # Each entry is one larva
-                    timestamp=datetime.now(timezone.utc)
+                    timestamp=captured_at
                 )
                 db.session.add(larvae_entry)
         
@@ -757,29 +1483,76 @@ def upload_image():
                 area=avg_area,
                 weight=avg_weight,
                 count=count if count else 0,
-                timestamp=datetime.now(timezone.utc)
+                timestamp=captured_at
             )
             db.session.add(larvae_entry)
 
         try:
+            image_id = None
+            if save_image:
+                image_file = ImageFile(
+                    tray_number=tray_number,
+                    user_id=user.id,
+                    image_data=image_binary,
+                    image_format=image_format,
+                    image_size=image_size,
+                    timestamp=captured_at,
+                    avg_length=avg_length,
+                    avg_weight=avg_weight,
+                    count=count,
+                    bounding_boxes=bounding_boxes_json if bounding_boxes_json not in ('', '[]') else None,
+                    masks=stored_masks,
+                    detection_frame=detection_frame
+                )
+                db.session.add(image_file)
+                db.session.flush()
+                image_id = image_file.id
+
+            # Keep the per-tray rollup and weight sketch in the same transaction as the larvae rows
+            if individual_weights:
+                update_weight_sketch(user.id, tray_number, captured_at, individual_weights)
+                update_growth_stats(user.id, tray_number, captured_at, individual_weights)
+                update_tray_summary(user.id, tray_number, captured_at,
+                                    larvae_count=len(individual_weights),
+                                    rows=len(individual_weights),
+                                    avg_length=avg_length,
+                                    avg_width=avg_width,
+                                    avg_area=avg_area,
+                                    avg_weight=sum(individual_weights) / len(individual_weights))
+            else:
+                # Only the average is known: it stands in for all `count` larvae of the capture
+                update_weight_sketch(user.id, tray_number, captured_at, [avg_weight], [count])
+                update_growth_stats(user.id, tray_number, captured_at, [avg_weight], [count])
+                update_tray_summary(user.id, tray_number, captured_at,
+                                    larvae_count=count if count else 0,
+                                    rows=1,
+                                    avg_length=avg_length,
+                                    avg_width=avg_width,
+                                    avg_area=avg_area,
+                                    avg_weight=avg_weight)
             db.session.commit()
 
-            update_data = {
-                'type': 'new_data',
+            # New data for this tray: drop its cached dashboard responses
+            response_cache.bump(user.id, tray_number)
+
+            # Dashboards get this capture's chart increments over SSE, merged with any burst on the tray
+            live_updates.add((user.id, tray_number), {
                 'tray_number': tray_number,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'image_id': None,
+                'timestamp': captured_at,
+                'length': avg_length,
+                'width': avg_width,
+                'area': avg_area,
+                'weights': individual_weights or [avg_weight],
+                'counts': [1] * len(individual_weights) if individual_weights else [count],
+                'image_id': image_id,
                 'count': count,
-                'avg_length': avg_length,
                 'avg_weight': avg_weight
-            }
-
-            broadcast_to_clients(update_data)
+            })
 
             return jsonify({
                 "message": "Data saved successfully",
                 "tray_number": tray_number,
-                "image_saved": False
+                "image_saved": image_id is not None
             }), 200
 
         except Exception as e:
@@ -791,7 +1564,7 @@ def upload_image():
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/get_upload_data/<int:image_id>')
-@login_required
+@session_login_required
 def get_upload_data(image_id):
     """
     Fetches data for a specific upload/image (by image_id) for current user.
@@ -799,68 +1572,41 @@ def get_upload_data(image_id):
     """
     try:
         # Get the image to verify ownership and get tray number
-        image = ImageFile.query.filter_by(id=image_id, user_id=current_user.id).first()
+        image = ImageFile.query.options(load_only(ImageFile.tray_number, ImageFile.timestamp))\
+                               .filter_by(id=image_id, user_id=request_user_id()).first()
         if not image:
             return jsonify({"error": "Image not found or access denied"}), 404
         
         # Get larvae data for this specific upload (same tray, same timestamp window)
         # We'll get data within 1 minute of the image upload time
-        from datetime import timedelta
         time_window_start = image.timestamp - timedelta(minutes=1)
         time_window_end = image.timestamp + timedelta(minutes=1)
-        
-        upload_data = LarvaeData.query.filter_by(
-            tray_number=image.tray_number,
-            user_id=current_user.id
-        ).filter(
+
+        columns = metrics_engine.load_columns(db.session, larvae_columns_query(request_user_id(), image.tray_number).where(
             LarvaeData.timestamp >= time_window_start,
             LarvaeData.timestamp <= time_window_end
-        ).order_by(LarvaeData.timestamp.asc()).all()
+        ))
 
-        if not upload_data:
+        if not len(columns['weight']):
             return jsonify({"error": f"No data found for upload {image_id}"}), 404
 
-        # Process growth data (for single upload, just one data point)
-        growth_data = {"days": [1], "length": [], "weight": []}
-        
-        # Calculate averages for this upload
-        avg_length = sum(e.length for e in upload_data) / len(upload_data)
-        avg_weight = sum(e.weight for e in upload_data) / len(upload_data)
-        growth_data["length"].append(round(avg_length, 1))
-        growth_data["weight"].append(round(avg_weight, 3))
-
-        # Get metrics
-        total_count = len(upload_data)  # Each entry is 1 larva
-
-        # Calculate weight distribution
-        weight_bins = {
-            "0.08-0.10": 0, "0.10-0.12": 0, "0.12-0.14": 0,
-            "0.14-0.16": 0, "0.16-0.18": 0, "0.18-0.20": 0, "0.20+": 0
-        }
-
-        for entry in upload_data:
-            weight = entry.weight
-            if 0.08 <= weight < 0.10: weight_bins["0.08-0.10"] += 1
-            elif 0.10 <= weight < 0.12: weight_bins["0.10-0.12"] += 1
-            elif 0.12 <= weight < 0.14: weight_bins["0.12-0.14"] += 1
-            elif 0.14 <= weight < 0.16: weight_bins["0.14-0.16"] += 1
-            elif 0.16 <= weight < 0.18: weight_bins["0.16-0.18"] += 1
-            elif 0.18 <= weight < 0.20: weight_bins["0.18-0.20"] += 1
-            elif weight >= 0.20: weight_bins["0.20+"] += 1
+        # Calculate averages for this upload (for single upload, just one data point)
+        means = metrics_engine.column_means(columns)
 
         return jsonify({
             "metrics": {
-                "length": round(avg_length, 1),
-                "width": round(sum(e.width for e in upload_data) / len(upload_data), 1),
-                "area": round(sum(e.area for e in upload_data) / len(upload_data), 1),
-                "weight": round(avg_weight, 3),
-                "count": total_count
+                "length": round(means['length'], 1),
+                "width": round(means['width'], 1),
+                "area": round(means['area'], 1),
+                "weight": round(means['weight'], 3),
+                "count": len(columns['weight'])  # Each entry is 1 larva
             },
-            "growthData": growth_data,
-            "weightDistribution": {
-                "ranges": list(weight_bins.keys()),
-                "counts": list(weight_bins.values())
+            "growthData": {
+                "days": [1],
+                "length": [round(means['length'], 1)],
+                "weight": [round(means['weight'], 3)]
             },
+            "weightDistribution": build_weight_distribution(columns['weight']),
             "timestamp": image.timestamp.isoformat()
         })
     except Exception as e:
@@ -869,83 +1615,120 @@ def get_upload_data(image_id):
 
 
 @app.route('/get_tray_data/<int:tray_number>')
-@login_required
+@session_login_required
+@cached_response('tray_data')
 def get_tray_data(tray_number):
     """
     Fetches and processes historical data for a specific tray ID using
     larvae measurements only.
+    With ?since=<cursor> only the captures after the cursor are returned (see tray_data_delta).
     """
     try:
-        # Get all larvae measurements for this tray
-        tray_entries = LarvaeData.query.filter_by(tray_number=tray_number, user_id=current_user.id)\
-                                      .order_by(LarvaeData.timestamp.asc())\
-                                      .all()
+        if 'since' in request.args:
+            return tray_data_delta(tray_number, request.args['since'])
 
-        if not tray_entries:
-            return jsonify({"error": f"No data found for tray {tray_number}"}), 404
-
-        # Build growth data - one point per timestamp group
-        growth_data = {"days": [], "length": [], "weight": []}
-        all_larvae_data = []
-        
-        start_time = tray_entries[0].timestamp
-        
-        # Group by exact timestamp so multiple larvae from the same capture stay together
-        grouped_data = {}
-        for entry in tray_entries:
-            grouped_data.setdefault(entry.timestamp, []).append(entry)
-            all_larvae_data.append(entry)
-
-        for timestamp in sorted(grouped_data.keys()):
-            entries = grouped_data[timestamp]
-            hours_elapsed = (timestamp - start_time).total_seconds() / 3600
-            avg_length = sum(l.length for l in entries) / len(entries)
-            avg_weight = sum(l.weight for l in entries) / len(entries)
-
-            growth_data["days"].append(round(hours_elapsed, 1))
-            growth_data["length"].append(round(avg_length, 1))
-            growth_data["weight"].append(round(avg_weight, 3))
-
-        latest_entries = grouped_data[sorted(grouped_data.keys())[-1]]
-        if latest_entries:
-            latest_metrics = {
-                "length": round(sum(l.length for l in latest_entries) / len(latest_entries), 1),
-                "width": round(sum(l.width for l in latest_entries) / len(latest_entries), 1),
-                "area": round(sum(l.area for l in latest_entries) / len(latest_entries), 1),
-                "weight": round(sum(l.weight for l in latest_entries) / len(latest_entries), 3),
-                "count": sum(l.count for l in latest_entries)
-            }
-        else:
-            latest_metrics = {"length": 0, "width": 0, "area": 0, "weight": 0, "count": 0}
+        window, error = parse_growth_window(request.args)
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Calculate weight distribution across ALL uploads
-        weight_bins = {
-            "0.08-0.10": 0, "0.10-0.12": 0, "0.12-0.14": 0,
-            "0.14-0.16": 0, "0.16-0.18": 0, "0.18-0.20": 0, "0.20+": 0
-        }
+        # Get the tray's larvae measurements (within the requested range) as column arrays
+        columns = metrics_engine.load_columns(
+            db.session,
+            with_time_range(larvae_columns_query(request_user_id(), tray_number), window)
+        )
 
-        for larva in all_larvae_data:
-            weight = larva.weight
-            if 0.08 <= weight < 0.10: weight_bins["0.08-0.10"] += 1
-            elif 0.10 <= weight < 0.12: weight_bins["0.10-0.12"] += 1
-            elif 0.12 <= weight < 0.14: weight_bins["0.12-0.14"] += 1
-            elif 0.14 <= weight < 0.16: weight_bins["0.14-0.16"] += 1
-            elif 0.16 <= weight < 0.18: weight_bins["0.16-0.18"] += 1
-            elif 0.18 <= weight < 0.20: weight_bins["0.18-0.20"] += 1
-            elif weight >= 0.20: weight_bins["0.20+"] += 1
+        if not len(columns['timestamp']):
+            return jsonify({"error": f"No data found for tray {tray_number}"}), 404
 
-        return jsonify({
-            "metrics": latest_metrics,
-            "growthData": growth_data,
-            "weightDistribution": {
-                "ranges": list(weight_bins.keys()),
-                "counts": list(weight_bins.values())
+        # Keep the hours axis anchored at the tray's first capture when the range starts later
+        first_timestamp = None
+        if window['from'] is not None:
+            summary = get_latest_tray_data(tray_number, request_user_id())
+            first_timestamp = summary.first_timestamp if summary else None
+
+        # One point per capture (or hour/day bucket) so larvae from the same capture stay together
+        hours_elapsed, series = metrics_engine.growth_series(
+            columns, growth_start_time(columns, first_timestamp), ('length', 'weight'),
+            bucket=window['bucket'], max_points=window['max_points']
+        )
+        latest_timestamp = metrics_engine.to_datetime(columns['timestamp'][-1]).isoformat()
+
+        return chart_data_response({
+            "metrics": latest_capture_metrics(columns),
+            "growthData": {
+                "days": fast_json.Rounded(hours_elapsed, 1),
+                "length": fast_json.Rounded(series['length'], 1),
+                "weight": fast_json.Rounded(series['weight'], 3)
             },
-            "timestamp": latest_entries[0].timestamp.isoformat()
+            # Weight distribution across ALL uploads
+            "weightDistribution": build_weight_distribution(columns['weight']),
+            "timestamp": latest_timestamp,
+            "cursor": latest_timestamp
         })
     except Exception as e:
         app.logger.error(f"Error fetching tray data for tray {tray_number}: {e}")
         return jsonify({"error": str(e)}), 500
+
+def latest_capture_metrics(columns):
+    """Rounded metrics of the most recent capture in a tray's columns."""
+    latest = metrics_engine.latest_capture(columns)
+    return {
+        "length": round(latest['length'], 1),
+        "width": round(latest['width'], 1),
+        "area": round(latest['area'], 1),
+        "weight": round(latest['weight'], 3),
+        "count": latest['count']
+    }
+
+def tray_data_delta(tray_number, cursor):
+    """
+    Incremental get_tray_data: growth points, latest metrics and histogram counts
+    for captures newer than the cursor. Clients add these to their existing charts, so pass
+    the bucket and max_points the charts were fetched with; `reset` asks for a full reload.
+    """
+    since = parse_cursor(cursor)
+    if since is None:
+        return jsonify({"error": "Invalid since cursor"}), 400
+    window, error = parse_growth_window(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    # The tray's first timestamp anchors the hours axis without re-reading its history
+    summary = get_latest_tray_data(tray_number, request_user_id())
+    if not summary or not delta_extends_series(window, summary.capture_count):
+        return jsonify({"delta": True, "reset": True})
+
+    columns = metrics_engine.load_columns(
+        db.session,
+        larvae_columns_query(request_user_id(), tray_number).where(LarvaeData.timestamp > since)
+    )
+    if not len(columns['timestamp']):
+        return jsonify({
+            "delta": True,
+            "cursor": cursor,
+            "growthData": {"days": [], "length": [], "weight": []},
+            "metrics": None,
+            "weightDistribution": build_weight_distribution(columns['weight'])
+        })
+
+    hours_elapsed, series = metrics_engine.growth_series(
+        columns, growth_start_time(columns, summary.first_timestamp), ('length', 'weight')
+    )
+    latest_timestamp = metrics_engine.to_datetime(columns['timestamp'][-1]).isoformat()
+
+    return jsonify({
+        "delta": True,
+        "cursor": latest_timestamp,
+        "growthData": {
+            "days": fast_json.Rounded(hours_elapsed, 1),
+            "length": fast_json.Rounded(series['length'], 1),
+            "weight": fast_json.Rounded(series['weight'], 3)
+        },
+        "metrics": latest_capture_metrics(columns),
+        # Counts of the new larvae only; add them to the existing bins
+        "weightDistribution": build_weight_distribution(columns['weight']),
+        "timestamp": latest_timestamp
+    })
     
 
 @app.route('/health')
@@ -960,122 +1743,265 @@ def health_check():
 # Add this route to debug stream clients
 @app.route('/debug/stream_clients')
 def debug_stream_clients():
-    """Debug endpoint to monitor SSE clients"""
-    client_info = {}
-    
-    with client_manager.lock:
-        for client_id, info in client_manager.clients.items():
-            client_info[client_id] = {
-                'queue_size': info['queue'].qsize(),
-                'created': info['created'],
-                'last_active': info['last_active'],
-                'age_seconds': time.time() - info['created']
-            }
+    """Debug endpoint to monitor SSE clients, the event ring buffer and the event bus"""
+    return {**event_broadcaster.stats(), 'event_bus': event_bus.stats(), 'coalescer': live_updates.stats()}
     
+
+@app.route('/debug/email_outbox')
+def debug_email_outbox():
+    """Debug endpoint to monitor queued emails and recent delivery times"""
+    counts = dict(db.session.query(EmailOutbox.status, func.count()).group_by(EmailOutbox.status).all())
+    recent = (EmailOutbox.query
+              .options(load_only(EmailOutbox.created_at, EmailOutbox.sent_at, EmailOutbox.send_ms, EmailOutbox.attempts))
+              .filter(EmailOutbox.status == 'sent')
+              .order_by(EmailOutbox.sent_at.desc())
+              .limit(100).all())
     return {
-        'total_clients': len(client_manager.clients),
-        'max_clients': client_manager.max_clients,
-        'clients': client_info
+        'smtp_configured': email_worker is not None,
+        'counts': counts,
+        'recent_sent': len(recent),
+        'avg_send_ms': round(sum(m.send_ms for m in recent) / len(recent), 1) if recent else None,
+        'avg_queue_to_sent_seconds': round(sum((m.sent_at - m.created_at).total_seconds() for m in recent) / len(recent), 2) if recent else None,
+        'avg_attempts': round(sum(m.attempts for m in recent) / len(recent), 2) if recent else None
     }
-    
+
+
+@app.route('/debug/response_cache')
+def debug_response_cache():
+    """Debug endpoint to monitor response cache hits, misses and size"""
+    return {**response_cache.stats(), 'user_cache': user_cache.stats(), 'overlays': overlays.stats()}
+
 
 @app.route('/get_combined_tray_data')
-@login_required
+@session_login_required
+@cached_response('combined_tray_data')
 def get_combined_tray_data():
     """
     Fetches and processes combined data from all trays for the current user.
     Works with or without images - groups data by timestamp.
+    With ?since=<cursor> only the captures after the cursor are returned (see combined_tray_data_delta).
     """
     try:
-        # Get all unique tray numbers
-        tray_numbers = db.session.query(LarvaeData.tray_number)\
-                                 .filter_by(user_id=current_user.id)\
-                                 .distinct().all()
-        tray_numbers = [t[0] for t in tray_numbers]
+        if 'since' in request.args:
+            return combined_tray_data_delta(request.args['since'])
+
+        window, error = parse_growth_window(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+
+        # Get all tray numbers from the summary table
+        tray_numbers = get_user_tray_numbers(request_user_id())
         
         if not tray_numbers:
             return jsonify({"error": "No data available"}), 404
 
+        # All of the user's larvae (within the requested range) in one query, ordered by tray then time
+        columns = metrics_engine.load_columns(
+            db.session,
+            with_time_range(larvae_columns_query(request_user_id()), window)
+        )
+
+        # Anchor each tray's hours axis at its first capture when the range starts later
+        first_timestamps = {}
+        if window['from'] is not None:
+            first_timestamps = dict(
+                db.session.query(TraySummary.tray_number, TraySummary.first_timestamp)
+                          .filter_by(user_id=request_user_id())
+                          .all()
+            )
+
         # Build growth data for each tray separately
         trays_growth_data = {}
-        all_larvae = []
-        
-        for tray_num in tray_numbers:
-            # Get all larvae data for this tray (ordered by timestamp)
-            larvae_data = LarvaeData.query.filter_by(tray_number=tray_num, user_id=current_user.id)\
-                                         .order_by(LarvaeData.timestamp.asc())\
-                                         .all()
-            
-            if not larvae_data:
-                continue
-            
-            all_larvae.extend(larvae_data)
-            
-            # Group larvae data by time (every measurement point is one data point)
-            tray_growth = {"days": [], "weight": []}
-            start_time = larvae_data[0].timestamp
-            
-            # Group by timestamp to avoid duplicates
-            grouped_data = {}
-            for larva in larvae_data:
-                ts = larva.timestamp
-                if ts not in grouped_data:
-                    grouped_data[ts] = []
-                grouped_data[ts].append(larva)
-            
-            for timestamp in sorted(grouped_data.keys()):
-                larvae_at_time = grouped_data[timestamp]
-                hours_elapsed = (timestamp - start_time).total_seconds() / 3600
-                avg_weight = sum(l.weight for l in larvae_at_time) / len(larvae_at_time)
-                
-                tray_growth["days"].append(round(hours_elapsed, 1))
-                tray_growth["weight"].append(round(avg_weight, 3))
-            
+        for tray_num, tray_columns in split_by_tray(columns).items():
+            # One point per capture (or hour/day bucket) to avoid duplicates
+            hours_elapsed, series = metrics_engine.growth_series(
+                tray_columns, growth_start_time(tray_columns, first_timestamps.get(tray_num)), ('weight',),
+                bucket=window['bucket'], max_points=window['max_points']
+            )
+
             # Only include trays with at least 2 data points for growth trend
-            if len(tray_growth["days"]) >= 2:
-                trays_growth_data[str(tray_num)] = tray_growth
+            if len(hours_elapsed) >= 2:
+                trays_growth_data[str(tray_num)] = {
+                    "days": fast_json.Rounded(hours_elapsed, 1),
+                    "weight": fast_json.Rounded(series['weight'], 3)
+                }
 
         # Calculate combined metrics from ALL larvae
-        if all_larvae:
-            combined_metrics = {
-                "length": round(sum(l.length for l in all_larvae) / len(all_larvae), 1),
-                "width": round(sum(l.width for l in all_larvae) / len(all_larvae), 1),
-                "area": round(sum(l.area for l in all_larvae) / len(all_larvae), 1),
-                "weight": round(sum(l.weight for l in all_larvae) / len(all_larvae), 3),
-                "count": len(all_larvae)
-            }
-        else:
-            combined_metrics = {"length": 0, "width": 0, "area": 0, "weight": 0, "count": 0}
-
-        # Calculate weight distribution from all larvae
-        weight_bins = {
-            "0.08-0.10": 0, "0.10-0.12": 0, "0.12-0.14": 0,
-            "0.14-0.16": 0, "0.16-0.18": 0, "0.18-0.20": 0, "0.20+": 0
+        means = metrics_engine.column_means(columns)
+        combined_metrics = {
+            "length": round(means['length'], 1),
+            "width": round(means['width'], 1),
+            "area": round(means['area'], 1),
+            "weight": round(means['weight'], 3),
+            "count": len(columns['weight'])
         }
 
-        for larva in all_larvae:
-            weight = larva.weight
-            if 0.08 <= weight < 0.10: weight_bins["0.08-0.10"] += 1
-            elif 0.10 <= weight < 0.12: weight_bins["0.10-0.12"] += 1
-            elif 0.12 <= weight < 0.14: weight_bins["0.12-0.14"] += 1
-            elif 0.14 <= weight < 0.16: weight_bins["0.14-0.16"] += 1
-            elif 0.16 <= weight < 0.18: weight_bins["0.16-0.18"] += 1
-            elif 0.18 <= weight < 0.20: weight_bins["0.18-0.20"] += 1
-            elif weight >= 0.20: weight_bins["0.20+"] += 1
-
-        return jsonify({
+        return chart_data_response({
             "metrics": combined_metrics,
             "traysGrowthData": trays_growth_data,  # New: per-tray growth data
-            "weightDistribution": {
-                "ranges": list(weight_bins.keys()),
-                "counts": list(weight_bins.values())
-            },
-            "timestamp": datetime.utcnow().isoformat()
+            # Weight distribution from all larvae
+            "weightDistribution": build_weight_distribution(columns['weight']),
+            "timestamp": datetime.utcnow().isoformat(),
+            "cursor": latest_cursor(columns)
         })
     except Exception as e:
         app.logger.error(f"Error fetching combined tray data: {e}")
         return jsonify({"error": str(e)}), 500
 
+def latest_cursor(columns):
+    """Cursor for the newest timestamp in a column set (None when empty)."""
+    if not len(columns['timestamp']):
+        return None
+    return metrics_engine.to_datetime(columns['timestamp'].max()).isoformat()
+
+def summary_metrics(summaries):
+    """Combined metrics over all larvae of a user's trays, from the sums on their tray_summary rows."""
+    rows = sum(summary.larvae_rows for summary in summaries)
+    length, width, area, weight = (
+        sum(getattr(summary, column) for summary in summaries) / rows if rows else 0.0
+        for column in ('sum_length', 'sum_width', 'sum_area', 'sum_weight')
+    )
+    return {
+        "length": round(length, 1),
+        "width": round(width, 1),
+        "area": round(area, 1),
+        "weight": round(weight, 3),
+        "count": rows
+    }
+
+def aggregate_metrics(user_id):
+    """Combined metrics over all of a user's larvae (one tray_summary row per tray, no larvae rows read)."""
+    return summary_metrics(TraySummary.query.filter_by(user_id=user_id).all())
+
+def combined_tray_data_delta(cursor):
+    """
+    Incremental get_combined_tray_data: new per-tray growth points and histogram counts
+    after the cursor, plus the combined metrics (from tray_summary, see aggregate_metrics).
+    Takes the same bucket and max_points as tray_data_delta.
+    """
+    since = parse_cursor(cursor)
+    if since is None:
+        return jsonify({"error": "Invalid since cursor"}), 400
+    window, error = parse_growth_window(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    columns = metrics_engine.load_columns(
+        db.session,
+        larvae_columns_query(request_user_id()).where(LarvaeData.timestamp > since)
+    )
+
+    trays_growth_data = {}
+    combined_metrics = None
+    if len(columns['timestamp']):
+        summaries = {
+            summary.tray_number: summary
+            for summary in db.session.query(TraySummary.tray_number, TraySummary.first_timestamp,
+                                            TraySummary.capture_count)
+                                     .filter_by(user_id=request_user_id())
+        }
+        for tray_num, tray_columns in split_by_tray(columns).items():
+            summary = summaries.get(tray_num)
+            if summary is None or not delta_extends_series(window, summary.capture_count):
+                # Summary not built for this tray yet, or its line can't just be extended;
+                # let the client reload everything
+                return jsonify({"delta": True, "reset": True})
+            hours_elapsed, series = metrics_engine.growth_series(
+                tray_columns, growth_start_time(tray_columns, summary.first_timestamp), ('weight',)
+            )
+            trays_growth_data[str(tray_num)] = {
+                "days": fast_json.Rounded(hours_elapsed, 1),
+                "weight": fast_json.Rounded(series['weight'], 3)
+            }
+
+        combined_metrics = aggregate_metrics(request_user_id())
+
+    return jsonify({
+        "delta": True,
+        "cursor": latest_cursor(columns) or cursor,
+        "metrics": combined_metrics,
+        "traysGrowthData": trays_growth_data,
+        # Counts of the new larvae only; add them to the existing bins
+        "weightDistribution": build_weight_distribution(columns['weight']),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+
+LARVAE_COLUMN_KEYS = ('tray_number', 'timestamp', 'length', 'width', 'area', 'weight', 'count')
+
+def capture_columns(captures):
+    """Column arrays, as larvae_columns_query returns them, for captures queued by upload_image."""
+    rows = [
+        (capture['tray_number'], capture['timestamp'], capture['length'], capture['width'], capture['area'], weight, count)
+        for capture in captures
+        for weight, count in zip(capture['weights'], capture['counts'])
+    ]
+    return metrics_engine.rows_to_columns(LARVAE_COLUMN_KEYS, rows)
+
+def publish_live_updates(batches):
+    """
+    Coalescer flush: one `new_data` event per (user, tray) carrying the same increments as
+    /get_tray_data/<tray>?since= (`delta`) and /get_combined_tray_data?since= (`combinedDelta`),
+    so dashboards extend their charts without a request. `since` is the batch's first capture.
+    The points are per capture; dashboards whose series would grow past their max_points
+    reload instead of appending them (see delta_extends_series).
+    """
+    user_ids = {user_id for user_id, _ in batches}
+    with app.app_context():
+        try:
+            summaries = TraySummary.query.filter(TraySummary.user_id.in_(user_ids)).all()
+            first_timestamps = {(summary.user_id, summary.tray_number): summary.first_timestamp
+                                for summary in summaries}
+            combined_metrics = {
+                user_id: summary_metrics([summary for summary in summaries if summary.user_id == user_id])
+                for user_id in user_ids
+            }
+        finally:
+            db.session.remove()
+
+    for (user_id, tray_number), captures in sorted(batches.items(), key=lambda item: item[1][0]['timestamp']):
+        columns = capture_columns(captures)
+        hours_elapsed, series = metrics_engine.growth_series(
+            columns, growth_start_time(columns, first_timestamps.get((user_id, tray_number))), ('length', 'weight')
+        )
+        since = metrics_engine.to_datetime(columns['timestamp'][0]).isoformat()
+        cursor = metrics_engine.to_datetime(columns['timestamp'][-1]).isoformat()
+        days = fast_json.Rounded(hours_elapsed, 1)
+        weight = fast_json.Rounded(series['weight'], 3)
+        distribution = build_weight_distribution(columns['weight'])
+        latest = captures[-1]
+
+        broadcast_to_clients({
+            'type': 'new_data',
+            'tray_number': tray_number,
+            'timestamp': latest['timestamp'].isoformat(),
+            'image_id': latest['image_id'],
+            'count': latest['count'],
+            'avg_length': latest['length'],
+            'avg_weight': latest['avg_weight'],
+            'captures': len(captures),
+            'delta': {
+                "delta": True,
+                "since": since,
+                "cursor": cursor,
+                "growthData": {"days": days, "length": fast_json.Rounded(series['length'], 1), "weight": weight},
+                "metrics": latest_capture_metrics(columns),
+                "weightDistribution": distribution,
+                "timestamp": cursor
+            },
+            'combinedDelta': {
+                "delta": True,
+                "since": since,
+                "cursor": cursor,
+                "metrics": combined_metrics[user_id],
+                "traysGrowthData": {str(tray_number): {"days": days, "weight": weight}},
+                "weightDistribution": distribution,
+                "timestamp": cursor
+            }
+        }, user_id)
+
+live_updates = EventCoalescer(publish_live_updates, window=SSE_COALESCE_SECONDS)
+
 
 @app.route('/compare')
 @login_required
@@ -1084,92 +2010,276 @@ def compare_page():
     return render_template('compare.html', username=current_user.username)
 
 
+@app.route('/api/weight_quantiles/<int:tray_number>')
+@session_login_required
+@cached_response('weight_quantiles')
+def get_weight_quantiles(tray_number):
+    """
+    Weight quantiles and CDF for one tray (0 = all trays) over a range of capture days,
+    answered by merging the per-day t-digests instead of scanning larvae rows.
+    Query params: from / to (YYYY-MM-DD, inclusive), q (quantiles, default 0.1,0.25,0.5,0.75,0.9),
+    x (weights to evaluate the CDF at).
+    """
+    try:
+        try:
+            from_day = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+            to_day = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+            quantiles = [float(q) for q in request.args.get('q', '0.1,0.25,0.5,0.75,0.9').split(',') if q]
+            cdf_points = [float(x) for x in request.args.get('x', '').split(',') if x]
+        except ValueError:
+            return jsonify({"error": "Invalid query parameters"}), 400
+
+        if any(q < 0 or q > 1 for q in quantiles):
+            return jsonify({"error": "Quantiles must be between 0 and 1"}), 400
+
+        query = WeightSketch.query.filter_by(user_id=request_user_id())
+        if tray_number != 0:
+            query = query.filter_by(tray_number=tray_number)
+        if from_day is not None:
+            query = query.filter(WeightSketch.day >= from_day)
+        if to_day is not None:
+            query = query.filter(WeightSketch.day <= to_day)
+        sketches = query.order_by(WeightSketch.day).all()
+
+        if not sketches:
+            return jsonify({"error": f"No weight data found for tray {tray_number}"}), 404
+
+        digest = merge_all(TDigest.from_bytes(sketch.digest) for sketch in sketches)
+
+        return jsonify({
+            "tray_number": tray_number,
+            "from": sketches[0].day.isoformat(),
+            "to": sketches[-1].day.isoformat(),
+            "days": len({sketch.day for sketch in sketches}),
+            "count": int(round(digest.count)),
+            "min": round(digest.min, 4),
+            "max": round(digest.max, 4),
+            "quantiles": {str(q): round(float(v), 4) for q, v in zip(quantiles, digest.quantile(quantiles))},
+            "cdf": {str(x): round(float(p), 4) for x, p in zip(cdf_points, digest.cdf(cdf_points))}
+        })
+    except Exception as e:
+        app.logger.error(f"Error computing weight quantiles for tray {tray_number}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def growth_fit_payload(sums, today_t, target_weight):
+    """Growth rate, fitted weight today and harvest projection from one window's sums."""
+    fit = metrics_engine.linear_fit(sums)
+    payload = {
+        "samples": int(round(sums['n'])),
+        "growth_rate_per_day": None,
+        "intercept": None,
+        "weight_today": None,
+        "r2": None,
+        "projected_harvest_date": None,
+        "days_to_harvest": None
+    }
+    if fit is None:
+        return payload
+
+    payload.update({
+        "growth_rate_per_day": round(fit['slope'], 5),
+        "intercept": round(fit['intercept'], 5),
+        "weight_today": round(fit['intercept'] + fit['slope'] * today_t, 5),
+        "r2": round(fit['r2'], 4)
+    })
+    if fit['slope'] > 0:
+        harvest_t = (target_weight - fit['intercept']) / fit['slope']
+        harvest_at = metrics_engine.GROWTH_EPOCH + np.timedelta64(int(harvest_t * 86400), 's')
+        payload["projected_harvest_date"] = metrics_engine.to_datetime(harvest_at).date().isoformat()
+        payload["days_to_harvest"] = round(max(harvest_t - today_t, 0.0), 1)
+    return payload
+
+@app.route('/api/growth_analytics')
+@session_login_required
+def get_growth_analytics():
+    """
+    Growth rate (weight per day), fitted current weight and projected harvest date for every
+    tray, over the whole history and rolling windows of the last N days. Computed from the
+    per-day sums in growth_stats (one aggregate query), never from larvae rows.
+    Query params: windows (days, default 7,14), target_weight (default HARVEST_TARGET_WEIGHT).
+    """
+    try:
+        try:
+            windows = sorted({int(days) for days in request.args.get('windows', '7,14').split(',') if days})
+            target_weight = float(request.args.get('target_weight', HARVEST_TARGET_WEIGHT))
+        except ValueError:
+            return jsonify({"error": "Invalid query parameters"}), 400
+        if any(days < 1 for days in windows):
+            return jsonify({"error": "Windows must be at least 1 day"}), 400
+
+        now = datetime.now(timezone.utc)
+        today_t = float(metrics_engine.days_since_epoch(np.datetime64(naive_utc(now), 'us')))
+
+        # One conditional sum per (window, statistic); the all-time window has no cutoff
+        cutoffs = [('all', None)] + [(f"{days}d", now.date() - timedelta(days=days - 1)) for days in windows]
+        aggregates = []
+        for label, cutoff in cutoffs:
+            for name in metrics_engine.GROWTH_SUM_NAMES:
+                column = getattr(GrowthStats, name)
+                if cutoff is not None:
+                    column = case((GrowthStats.day >= cutoff, column), else_=0.0)
+                aggregates.append(func.sum(column).label(f"{label}_{name}"))
+
+        rows = db.session.query(GrowthStats.tray_number, *aggregates)\
+                         .filter(GrowthStats.user_id == request_user_id())\
+                         .group_by(GrowthStats.tray_number)\
+                         .order_by(GrowthStats.tray_number)\
+                         .all()
+
+        trays = {}
+        for row in rows:
+            values = row._asdict()
+            trays[str(row.tray_number)] = {
+                label: growth_fit_payload(
+                    {name: values[f"{label}_{name}"] or 0.0 for name in metrics_engine.GROWTH_SUM_NAMES},
+                    today_t, target_weight
+                )
+                for label, _ in cutoffs
+            }
+
+        return jsonify({
+            "trays": trays,
+            "windows": windows,
+            "target_weight": target_weight,
+            "epoch": metrics_engine.to_datetime(metrics_engine.GROWTH_EPOCH).date().isoformat(),
+            "timestamp": now.isoformat()
+        })
+    except Exception as e:
+        app.logger.error(f"Error computing growth analytics: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def iter_export_pages(user_id, tray_numbers, window, page_size=EXPORT_PAGE_SIZE):
+    """
+    Yields a user's larvae rows in (timestamp, id) order, one keyset page at a time.
+    Each page is a short query read through a server-side cursor; the session is closed
+    after the page, so the connection goes back to the pool while the client reads.
+    """
+    columns = [getattr(LarvaeData, name) for name in EXPORT_COLUMNS]
+    base_query = with_time_range(
+        select(*columns).where(LarvaeData.user_id == user_id, LarvaeData.timestamp.isnot(None)),
+        window
+    )
+    if tray_numbers:
+        base_query = base_query.where(LarvaeData.tray_number.in_(tray_numbers))
+    base_query = base_query.order_by(LarvaeData.timestamp, LarvaeData.id).limit(page_size)
+
+    last_key = None
+    while True:
+        query = base_query
+        if last_key is not None:
+            query = query.where(tuple_(LarvaeData.timestamp, LarvaeData.id) > last_key)
+
+        try:
+            result = db.session.execute(query.execution_options(yield_per=1000))
+            rows = 0
+            for partition in result.partitions():
+                rows += len(partition)
+                last_key = (partition[-1].timestamp, partition[-1].id)
+                yield partition
+        finally:
+            db.session.close()
+
+        if rows < page_size:
+            return
+
+def export_csv(pages):
+    """CSV text chunks: a header row, then one chunk per partition of rows."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((*row[:2], row.timestamp.isoformat(), *row[3:]) for row in rows)
+        yield buffer.getvalue()
+
+def export_ndjson(pages):
+    """NDJSON text chunks: one JSON object per row."""
+    for rows in pages:
+        yield ''.join(
+            fast_json.dumps({**row._asdict(), 'timestamp': row.timestamp.isoformat()}) + '\n'
+            for row in rows
+        )
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+}
+
+@app.route('/api/export')
+@session_login_required
+def export_data():
+    """
+    Streams the user's raw larvae measurements as CSV or NDJSON (chunked transfer encoding).
+    Query params: format (csv | ndjson), trays (e.g. 1,3; default all), from / to (ISO timestamps).
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    window, error = parse_growth_window(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        tray_numbers = [int(tray) for tray in request.args.get('trays', '').split(',') if tray.strip()]
+    except ValueError:
+        return jsonify({"error": "Invalid trays. Use comma-separated tray numbers"}), 400
+
+    user_id = request_user_id()
+    writer, mimetype = EXPORT_FORMATS[export_format]
+    filename = f"larvae_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+
+    def generate():
+        try:
+            yield from writer(iter_export_pages(user_id, tray_numbers, window))
+        except Exception as e:
+            # Headers are already sent, so the error can only be logged
+            app.logger.error(f"Error streaming export for user {user_id}: {e}")
+            raise
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/compare_trays')
-@login_required
+@session_login_required
+@cached_response('compare_trays')
 def compare_trays():
     """
     Get comparison data: latest average weight for each unique tray.
     Returns data for scatter plot.
     """
     try:
-        # Get all unique tray numbers
-        tray_numbers = db.session.query(ImageFile.tray_number)\
-                                 .filter_by(user_id=current_user.id)\
-                                 .distinct().all()
-        tray_numbers = [t[0] for t in tray_numbers]
-        
-        if not tray_numbers:
+        # One query over the latest capture of every tray (see latest_capture_per_tray)
+        latest_captures = latest_capture_per_tray(request_user_id(), from_summary=True)
+
+        if not latest_captures:
             return jsonify({"error": "No data available"}), 404
-        
+
         comparison_data = []
-        
-        for tray_num in tray_numbers:
-            # Get the LATEST image upload for this tray
-            latest_image = ImageFile.query.filter_by(
-                tray_number=tray_num,
-                user_id=current_user.id
-            ).order_by(ImageFile.timestamp.desc()).first()
-            
-            if not latest_image:
-                continue
-            
-            # Get larvae data for this latest upload
-            from datetime import timedelta
-            time_window_start = latest_image.timestamp - timedelta(minutes=1)
-            time_window_end = latest_image.timestamp + timedelta(minutes=1)
-            
-            larvae = LarvaeData.query.filter_by(
-                tray_number=tray_num,
-                user_id=current_user.id
-            ).filter(
-                LarvaeData.timestamp >= time_window_start,
-                LarvaeData.timestamp <= time_window_end
-            ).all()
-            
-            if larvae:
-                avg_weight = sum(l.weight for l in larvae) / len(larvae)
-                avg_length = sum(l.length for l in larvae) / len(larvae)
-                count = len(larvae)
-                
-                comparison_data.append({
-                    "tray_number": tray_num,
-                    "avg_weight": round(avg_weight, 3),
-                    "avg_length": round(avg_length, 1),
-                    "count": count,
-                    "timestamp": latest_image.timestamp.isoformat()
-                })
-        
-        return jsonify({"trays": comparison_data})
-        
-    except Exception as e:
-        app.logger.error(f"Error in compare_trays: {e}")
-        return jsonify({"error": str(e)}), 500
+        for capture in latest_captures:
+            comparison_data.append({
+                "tray_number": capture.tray_number,
+                "avg_weight": round(capture.avg_weight, 3),
+                "avg_length": round(capture.avg_length, 1),
+                "count": capture.rows,  # Each entry is 1 larva
+                "timestamp": capture.timestamp.isoformat()
+            })
 
-        for entry in all_larvae:
-            weight = entry.weight
-            if 0.08 <= weight < 0.10: weight_bins["0.08-0.10"] += 1
-            elif 0.10 <= weight < 0.12: weight_bins["0.10-0.12"] += 1
-            elif 0.12 <= weight < 0.14: weight_bins["0.12-0.14"] += 1
-            elif 0.14 <= weight < 0.16: weight_bins["0.14-0.16"] += 1
-            elif 0.16 <= weight < 0.18: weight_bins["0.16-0.18"] += 1
-            elif 0.18 <= weight < 0.20: weight_bins["0.18-0.20"] += 1
-            elif weight >= 0.20: weight_bins["0.20+"] += 1
+        return jsonify({"trays": comparison_data})
 
-        return jsonify({
-            "metrics": combined_metrics,
-            "growthData": growth_data,
-            "weightDistribution": {
-                "ranges": list(weight_bins.keys()),
-                "counts": list(weight_bins.values())
-            },
-            "timestamp": datetime.utcnow().isoformat()
-        })
     except Exception as e:
-        app.logger.error(f"Error fetching combined tray data: {e}")
+        app.logger.error(f"Error in compare_trays: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/get_comparison_data')
-@login_required
+@session_login_required
+@cached_response('comparison_data')
 def get_comparison_data():
     """
     Fetches data for all trays belonging to the current user to allow comparison on the dashboard.
@@ -1178,18 +2288,19 @@ def get_comparison_data():
     try:
         trays_data_for_comparison = {}
 
-        # Dynamically get all unique tray numbers from the database for the current user
-        unique_trays = LarvaeData.query.with_entities(LarvaeData.tray_number)\
-                                       .filter_by(user_id=current_user.id).distinct().all()
+        # Get all tray numbers for the current user from the summary table
+        unique_trays = get_user_tray_numbers(request_user_id())
 
-        # Iterate through each unique tray number found
-        for (tray_num,) in unique_trays:
-            # Fetch all historical data for the current tray and user, ordered by timestamp
-            all_tray_data = LarvaeData.query.filter_by(tray_number=tray_num, user_id=current_user.id)\
-                                          .order_by(LarvaeData.timestamp.asc())\
-                                          .all()
+        if wants_streamed_response(request_user_id()):
+            return json_stream.streamed_json(stream_comparison_data(request_user_id(), unique_trays))
+
+        # Fetch all historical data for the user in one query, ordered by tray and timestamp
+        columns = metrics_engine.load_columns(db.session, larvae_columns_query(request_user_id()))
+        columns_by_tray = split_by_tray(columns)
 
-            if not all_tray_data:
+        # Iterate through each unique tray number found
+        for tray_num in unique_trays:
+            if tray_num not in columns_by_tray:
                 # If a tray has no data, include empty data for it so the frontend can handle it
                 trays_data_for_comparison[str(tray_num)] = {
                     'latest': {'length': 0.0, 'width': 0.0, 'area': 0.0, 'weight': 0.0, 'count': 0},
@@ -1198,48 +2309,28 @@ def get_comparison_data():
                 }
                 continue # Move to the next tray
 
+            tray_columns = columns_by_tray[tray_num]
+
             # --- Process Growth Data for this Tray: Get latest measurement per day ---
+            days = metrics_engine.day_numbers(tray_columns['timestamp'])
+            daily_latest = metrics_engine.last_per_group(days)
+
             growth_data_for_tray = {
-                "days": [],
-                "length": [],
-                "weight": []
+                "days": days[daily_latest],
+                "length": fast_json.Rounded(tray_columns['length'][daily_latest], 1),
+                "weight": fast_json.Rounded(tray_columns['weight'][daily_latest], 1)
             }
-            daily_latest_data = {} # Key: day_number, Value: LarvaeData entry (the latest for that day)
-
-            start_date = all_tray_data[0].timestamp.date() # Start date for this specific tray
-
-            for entry in all_tray_data:
-                day_number = (entry.timestamp.date() - start_date).days + 1
-                # Overwrite with the current entry; since data is sorted ascending,
-                # the last entry for a specific day will be the latest.
-                daily_latest_data[day_number] = entry
-
-            # Populate growth_data lists from the processed daily data
-            for day in sorted(daily_latest_data.keys()):
-                entry = daily_latest_data[day]
-                growth_data_for_tray["days"].append(round(day, 1))
-                growth_data_for_tray["length"].append(round(entry.length, 1))
-                growth_data_for_tray["weight"].append(round(entry.weight, 1))
-
-            # --- Process All Individual Weights for this Tray's Distribution ---
-            all_individual_weights = [entry.weight for entry in all_tray_data]
-
-            # --- Get Latest Metrics for this Tray ---
-            latest_entry = all_tray_data[-1]
-            
-            # --- Calculate Total Count (sum of all individual entries) ---
-            total_count = sum(entry.count for entry in all_tray_data)
 
             trays_data_for_comparison[str(tray_num)] = {
                 'latest': {
-                    'length': round(latest_entry.length, 1),
-                    'width': round(latest_entry.width, 1),
-                    'area': round(latest_entry.area, 1),
-                    'weight': round(latest_entry.weight, 3),  # Show 3 decimals
-                    'count': total_count  # Use sum instead of latest_entry.count
+                    'length': round(float(tray_columns['length'][-1]), 1),
+                    'width': round(float(tray_columns['width'][-1]), 1),
+                    'area': round(float(tray_columns['area'][-1]), 1),
+                    'weight': round(float(tray_columns['weight'][-1]), 3),  # Show 3 decimals
+                    'count': int(tray_columns['count'].sum())  # Sum of all individual entries
                 },
                 'growthData': growth_data_for_tray,
-                'allWeights': all_individual_weights # This is the key for comparison weight distribution
+                'allWeights': tray_columns['weight'] # This is the key for comparison weight distribution
             }
 
         return jsonify({
@@ -1251,34 +2342,95 @@ def get_comparison_data():
         app.logger.error(f"Error in get_comparison_data: {e}")
         return jsonify({"error": str(e)}), 500
 
+def stream_comparison_data(user_id, tray_numbers):
+    """
+    Writes the get_comparison_data document incrementally from a server-side cursor.
+    allWeights is written chunk by chunk; latest values and the per-day growth points
+    are kept as running state and written when the tray's rows end.
+    """
+    empty_tray = {
+        'latest': {'length': 0.0, 'width': 0.0, 'area': 0.0, 'weight': 0.0, 'count': 0},
+        'growthData': {'days': [], 'length': [], 'weight': []},
+        'allWeights': []
+    }
+
+    def close_tray(tray):
+        days = sorted(tray['daily'])
+        lengths = np.array([tray['daily'][day][0] for day in days])
+        weights = np.array([tray['daily'][day][1] for day in days])
+        return '],' + json_stream.key('growthData') + json_stream.dumps({
+            "days": [int((day - tray['first_day']).astype(np.int64)) + 1 for day in days],
+            "length": fast_json.Rounded(lengths, 1),
+            "weight": fast_json.Rounded(weights, 1)
+        }) + ',' + json_stream.key('latest') + json_stream.dumps({
+            'length': round(tray['latest'][0], 1),
+            'width': round(tray['latest'][1], 1),
+            'area': round(tray['latest'][2], 1),
+            'weight': round(tray['latest'][3], 3),
+            'count': int(tray['count'])
+        }) + '}'
+
+    try:
+        yield '{' + json_stream.key('trays') + '{'
+        written = set()
+        tray = None
+
+        for chunk in metrics_engine.iter_column_chunks(db.session, larvae_columns_query(user_id)):
+            for tray_num, tray_columns in split_by_tray(chunk).items():
+                if tray is None or tray['number'] != tray_num:
+                    if tray is not None:
+                        yield close_tray(tray)
+                    days = tray_columns['timestamp'].astype('datetime64[D]')
+                    tray = {'number': tray_num, 'weights': json_stream.ArrayWriter(),
+                            'first_day': days[0], 'daily': {}, 'count': 0}
+                    yield (',' if written else '') + json_stream.key(tray_num) + '{' + json_stream.key('allWeights') + '['
+                    written.add(tray_num)
+
+                yield tray['weights'].items(tray_columns['weight'])
+
+                # Latest measurement per day; later chunks overwrite earlier rows of the same day
+                days = tray_columns['timestamp'].astype('datetime64[D]')
+                for i in metrics_engine.last_per_group(days):
+                    tray['daily'][days[i]] = (tray_columns['length'][i], tray_columns['weight'][i])
+                tray['latest'] = tuple(float(tray_columns[name][-1]) for name in metrics_engine.METRIC_NAMES)
+                tray['count'] += tray_columns['count'].sum()
+
+        if tray is not None:
+            yield close_tray(tray)
+
+        # Trays in the summary without larvae rows get the same empty entry as the buffered response
+        for tray_num in tray_numbers:
+            if tray_num not in written:
+                yield (',' if written else '') + json_stream.key(tray_num) + json_stream.dumps(empty_tray)
+                written.add(tray_num)
+
+        yield '},' + json_stream.key('timestamp') + json_stream.dumps(datetime.utcnow().isoformat()) + '}'
+    except Exception as e:
+        # Headers are already sent, so the error can only be logged
+        app.logger.error(f"Error streaming comparison data: {e}")
+        raise
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     """Renders the main dashboard page."""
-    # Build tray list from larvae measurements so the dashboard works without images
-    tray_numbers = db.session.query(LarvaeData.tray_number)\
-                             .filter_by(user_id=current_user.id)\
-                             .distinct()\
-                             .all()
-    tray_numbers = [t[0] for t in tray_numbers]
+    # Tray list, last timestamp and totals come straight from the per-tray summary
+    summaries = TraySummary.query.filter_by(user_id=current_user.id)\
+                                 .order_by(TraySummary.tray_number)\
+                                 .all()
 
     tray_data_for_template = {}
-    for tray_number in tray_numbers:
-        tray_entries = LarvaeData.query.filter_by(tray_number=tray_number, user_id=current_user.id)\
-                                       .order_by(LarvaeData.timestamp.asc())\
-                                       .all()
-        if not tray_entries:
-            continue
-
-        latest_entry = tray_entries[-1]
-        tray_data_for_template[str(tray_number)] = {
-            'tray_number': tray_number,
+    for summary in summaries:
+        tray_data_for_template[str(summary.tray_number)] = {
+            'tray_number': summary.tray_number,
             'image_id': None,
-            'timestamp': latest_entry.timestamp.isoformat(),
-            'count': sum(entry.count for entry in tray_entries)
+            'timestamp': summary.last_timestamp.isoformat(),
+            'count': summary.total_count
         }
 
-    return render_template('dashboard.html', tray_data=tray_data_for_template)
+    return render_template('dashboard.html', tray_data=tray_data_for_template,
+                           sse_stream_url=SSE_STREAM_URL or url_for('event_stream'),
+                           images_enabled=IMAGES_ENABLED)
 
 
 
@@ -1342,48 +2494,63 @@ def dashboard():
 
 
 @app.route('/stream')
+@session_login_required
 def event_stream():
-    """Memory-safe SSE with aggressive timeout for Render"""
+    """
+    Memory-safe SSE with aggressive timeout for Render.
+    Streams only the current user's events, optionally for some trays (?trays=1,3).
+    Events carry `id:` fields; a reconnect with Last-Event-ID (header, or ?last_event_id= for
+    a new EventSource) replays what was missed, or sends a reset when that is no longer buffered.
+    """
     client_id = request.args.get('client_id', f"client_{uuid.uuid4().hex[:8]}_{int(time.time())}")
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    try:
+        tray_numbers = [int(tray) for tray in request.args.get('trays', '').split(',') if tray.strip()]
+    except ValueError:
+        return jsonify({"error": "Invalid trays. Use comma-separated tray numbers"}), 400
+    user_id = request_user_id()
     
     def generate():
-        client_queue = client_manager.add_client(client_id)
+        cursor, reset = event_broadcaster.resume_cursor(last_event_id, user_id, tray_numbers)
+        subscriber = event_broadcaster.subscribe(client_id, user_id, tray_numbers, cursor)
         
         try:
             # Send initial connection
-            yield f"data: {json.dumps({'type': 'connected', 'message': 'Stream started', 'client_id': client_id})}\n\n"
+            yield f"data: {fast_json.dumps({'type': 'connected', 'message': 'Stream started', 'client_id': client_id})}\n\n"
+            
+            if reset:
+                # Missed events are gone: move the client's cursor to now and have it reload
+                yield f"id: {event_broadcaster.event_id(cursor)}\ndata: {fast_json.dumps({'type': 'reset'})}\n\n"
             
             # CRITICAL: Use shorter timeout for Render's 512MB limit
             heartbeat_interval = 20  # Reduced from 25
             max_connection_time = 300  # 5 minutes max connection time
             connection_start = time.time()
-            last_heartbeat = time.time()
             
-            while True:
+            while not subscriber.closed:
                 # CRITICAL: Force disconnect after max_connection_time
-                if time.time() - connection_start > max_connection_time:
+                remaining = max_connection_time - (time.time() - connection_start)
+                if remaining <= 0:
                     print(f"⏰ Force disconnecting client {client_id} after {max_connection_time}s")
                     break
                 
-                try:
-                    # Use shorter timeout
-                    data = client_queue.get(timeout=0.5)  # Changed from 60 to 0.5
-                    yield f"data: {json.dumps(data)}\n\n"
-                    last_heartbeat = time.time()
-                    continue
-                except queue.Empty:
-                    pass
-                
-                # Send heartbeat
-                current_time = time.time()
-                if current_time - last_heartbeat > heartbeat_interval:
-                    yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': current_time})}\n\n"
-                    last_heartbeat = current_time
+                # Sleeps until an event is published (no polling); wakes for heartbeats otherwise
+                events, missed = event_broadcaster.wait(subscriber, cursor, timeout=min(heartbeat_interval, remaining))
+                cursor = subscriber.last_sequence
+                if missed:
+                    # This client fell behind the ring buffer: tell it to reload instead of replaying
+                    yield f"id: {event_broadcaster.event_id(cursor)}\ndata: {fast_json.dumps({'type': 'reset'})}\n\n"
+                elif events:
+                    for sequence, payload in events:
+                        yield f"id: {event_broadcaster.event_id(sequence)}\ndata: {payload}\n\n"
+                elif not subscriber.closed and time.time() - connection_start < max_connection_time:
+                    yield f"data: {fast_json.dumps({'type': 'heartbeat', 'timestamp': time.time()})}\n\n"
                 
         except (GeneratorExit, BrokenPipeError, ConnectionResetError):
             pass
         finally:
-            client_manager.remove_client(client_id)
+            event_broadcaster.unsubscribe(subscriber)
     
     return Response(
         generate(),
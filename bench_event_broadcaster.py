@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SSE fan-out through EventBroadcaster with many blocked client threads spread
+over several users. Counts wake-ups while idle (should be zero), wake-ups per published
+event (only that user's streams), the cost of one publish() call, and the time until
+every client has read the last of a burst of events.
+    python bench_event_broadcaster.py [clients clients ...]
+"""
+import io
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+from event_broadcaster import EventBroadcaster
+
+CLIENTS = [int(arg) for arg in sys.argv[1:]] or [10, 100, 500]
+EVENTS = 100
+USERS = 10
+
+
+def run(client_count):
+    broadcaster = EventBroadcaster(capacity=256, max_clients=client_count)
+    wakeups = [0] * client_count
+    done = threading.Barrier(client_count + 1)
+
+    def client(index):
+        subscriber = broadcaster.subscribe(f"bench_{index}", user_id=index % USERS)
+        cursor, received = subscriber.last_sequence, 0
+        while received < EVENTS // USERS:
+            events, _ = broadcaster.wait(subscriber, cursor, timeout=60)
+            wakeups[index] += 1
+            received += len(events)
+            cursor = subscriber.last_sequence
+        broadcaster.unsubscribe(subscriber)
+        done.wait()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(client_count)]
+    for thread in threads:
+        thread.start()
+    while len(broadcaster.subscribers) < client_count:
+        time.sleep(0.01)
+
+    time.sleep(1.0)
+    idle_wakeups = sum(wakeups)
+
+    payload = {'type': 'new_data', 'tray_number': 1, 'weights': [0.1] * 50}
+    publish_time = 0.0
+    start = time.perf_counter()
+    for event in range(EVENTS):
+        before = time.perf_counter()
+        broadcaster.publish(payload, user_id=event % USERS, tray_number=1)
+        publish_time += time.perf_counter() - before
+    done.wait()
+    fan_out = time.perf_counter() - start
+
+    return idle_wakeups, (sum(wakeups) - idle_wakeups) / EVENTS, publish_time / EVENTS, fan_out
+
+
+if __name__ == '__main__':
+    print(f"{USERS} users, {EVENTS} events published round-robin across them")
+    print(f"{'clients':>8} {'idle wake-ups/s':>16} {'wake-ups/event':>15} {'publish() µs':>13} {'all clients read their events':>30}")
+    for client_count in CLIENTS:
+        with redirect_stdout(io.StringIO()):  # Silence the per-client subscribe/unsubscribe logs
+            idle_wakeups, wakeups_per_event, publish_cost, fan_out = run(client_count)
+        print(f"{client_count:>8} {idle_wakeups:>16} {wakeups_per_event:>15.1f} {publish_cost * 1e6:>13.1f} {fan_out * 1000:>27.1f} ms")
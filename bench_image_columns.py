@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak Python memory of ImageFile queries with the heavy columns (image_data,
+bounding_boxes, masks) loaded, as every query did before they were deferred, vs the
+deferred default and load_only. Also serves /get_upload_data for one image. Uses a
+throwaway SQLite database, so it never touches the configured DATABASE_URL:
+    python bench_image_columns.py [images images ...]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), 'bench_image_columns.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{BENCH_DB}'
+
+from sqlalchemy.orm import load_only, undefer
+
+from BSFwebdashboard import app, db, User, ImageFile, LarvaeData, image_blob
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [25, 100]
+IMAGE_BYTES = 400 * 1024   # A compressed phone photo
+LARVAE_PER_IMAGE = 60
+
+
+def detections():
+    """Bounding boxes and polygon masks as the edge device sends them."""
+    boxes = [[random.uniform(0, 1280) for _ in range(4)] for _ in range(LARVAE_PER_IMAGE)]
+    masks = [[[random.uniform(0, 1280), random.uniform(0, 960)] for _ in range(150)] for _ in range(LARVAE_PER_IMAGE)]
+    return json.dumps(boxes), json.dumps(masks)
+
+
+def seed_database(images):
+    db.drop_all()
+    db.create_all()
+    user = User(username='bench', is_verified=True)
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    start = datetime(2025, 1, 1)
+    boxes, masks = detections()
+    for i in range(images):
+        timestamp = start + timedelta(hours=i)
+        db.session.add(ImageFile(
+            tray_number=1, user_id=user.id, image_data=os.urandom(IMAGE_BYTES), image_format='jpeg',
+            image_size=IMAGE_BYTES, avg_length=15.0, avg_weight=0.15, count=LARVAE_PER_IMAGE,
+            bounding_boxes=boxes, masks=masks, timestamp=timestamp
+        ))
+        db.session.bulk_insert_mappings(LarvaeData, [{
+            'tray_number': 1, 'user_id': user.id, 'length': random.uniform(5, 25), 'width': random.uniform(1, 4),
+            'area': random.uniform(5, 80), 'weight': random.uniform(0.05, 0.25), 'count': 1, 'timestamp': timestamp
+        } for _ in range(LARVAE_PER_IMAGE)])
+    db.session.commit()
+    return user.id
+
+
+def peak_memory(run):
+    """Peak traced allocation (bytes) while running run()."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.expunge_all()
+    return peak
+
+
+def listing(*options):
+    """A tray's images, newest first, as the image listing reads them."""
+    return lambda: ImageFile.query.options(*options).filter_by(tray_number=1)\
+                                  .order_by(ImageFile.timestamp.desc()).all()
+
+
+if __name__ == '__main__':
+    heavy = undefer(ImageFile.image_data), undefer(ImageFile.bounding_boxes), undefer(ImageFile.masks)
+    metadata = load_only(ImageFile.id, ImageFile.tray_number, ImageFile.timestamp, ImageFile.count,
+                         ImageFile.avg_length, ImageFile.avg_weight, ImageFile.image_size)
+
+    print(f"{'images':>7} {'listing: all columns':>21} {'deferred':>9} {'load_only':>10} "
+          f"{'upload lookup: before':>22} {'after':>6} {'/get_upload_data':>17} {'image_blob':>11}   (peak MB)")
+    for images in SIZES:
+        with app.app_context():
+            user_id = seed_database(images)
+            image_id = ImageFile.query.options(load_only(ImageFile.id)).first().id
+            client = app.test_client()
+            client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+            listing_before = peak_memory(listing(*heavy))
+            listing_deferred = peak_memory(listing())
+            listing_only = peak_memory(listing(metadata))
+            lookup_before = peak_memory(lambda: ImageFile.query.options(*heavy).filter_by(id=image_id).first())
+            lookup_after = peak_memory(lambda: ImageFile.query.options(
+                load_only(ImageFile.tray_number, ImageFile.timestamp)).filter_by(id=image_id).first())
+            upload = peak_memory(lambda: client.get(f'/get_upload_data/{image_id}'))
+            blob = peak_memory(lambda: image_blob(image_id, user_id, ImageFile.image_data))
+
+        print(f"{images:>7} {listing_before / 1e6:>21.1f} {listing_deferred / 1e6:>9.2f} {listing_only / 1e6:>10.2f} "
+              f"{lookup_before / 1e6:>22.2f} {lookup_after / 1e6:>6.3f} {upload / 1e6:>17.2f} {blob / 1e6:>11.2f}")
+
+    os.remove(BENCH_DB)
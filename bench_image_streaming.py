@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak Python memory of downloading one stored image from /image/<id>, whole and
+as a 64 KB range, against the old way of reading the whole BLOB and returning it in one
+Response. Uses a throwaway SQLite database, so it never touches the configured DATABASE_URL:
+    python bench_image_streaming.py [MB MB ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), 'bench_image_streaming.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{BENCH_DB}'
+os.environ['IMAGES_ENABLED'] = 'true'
+
+from flask import Response
+
+from BSFwebdashboard import app, db, User, ImageFile, image_blob, IMAGE_CHUNK_SIZE
+
+SIZES_MB = [int(arg) for arg in sys.argv[1:]] or [4, 16, 64]
+
+
+def seed_database(megabytes):
+    db.drop_all()
+    db.create_all()
+    user = User(username='bench', is_verified=True)
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+    image = ImageFile(tray_number=1, user_id=user.id, image_data=os.urandom(megabytes * 1024 * 1024),
+                      image_format='jpeg', image_size=megabytes * 1024 * 1024)
+    db.session.add(image)
+    db.session.commit()
+    image_id, user_id = image.id, user.id
+    db.session.expunge_all()
+    return image_id, user_id
+
+
+def download(client, url, headers=None):
+    """Reads the response body the way a WSGI server does, one piece at a time."""
+    response = client.get(url, headers=headers, buffered=False)
+    received = sum(len(piece) for piece in response.response)
+    response.close()
+    return received
+
+
+def measure(run):
+    """(peak traced MB, seconds) while running run()."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, elapsed
+
+
+if __name__ == '__main__':
+    print(f"chunk size {IMAGE_CHUNK_SIZE // 1024} KB")
+    print(f"{'image MB':>9} {'whole BLOB':>11} {'streamed':>9} {'64 KB range':>12}   (peak MB / ms)")
+    for megabytes in SIZES_MB:
+        with app.app_context():
+            image_id, user_id = seed_database(megabytes)
+
+            def whole_blob():
+                # What get_image did: the BLOB in one piece, returned as one Response body
+                row = image_blob(image_id, user_id, ImageFile.image_data)
+                db.session.close()
+                return sum(len(piece) for piece in Response(row.image_data, mimetype='image/jpeg').response)
+
+            client = app.test_client()
+            client.post('/login', data={'username': 'bench', 'password': 'bench'})
+            results = [
+                measure(whole_blob),
+                measure(lambda: download(client, f'/image/{image_id}')),
+                measure(lambda: download(client, f'/image/{image_id}', {'Range': 'bytes=1000000-1065535'})),
+            ]
+        print(f"{megabytes:>9} " + ' '.join(f"{f'{peak:.2f} / {seconds * 1000:.0f}':>{width}}"
+                                            for (peak, seconds), width in zip(results, (11, 9, 12))))
+
+    os.remove(BENCH_DB)
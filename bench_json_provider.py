@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: response serialization time for realistic tray payloads with Flask's default
+JSON provider (lists rounded value by value) vs fast_json (stdlib fallback and orjson).
+    python bench_json_provider.py [captures] [weights_per_tray]
+"""
+import sys
+import json
+import timeit
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import fast_json
+
+CAPTURES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+WEIGHTS_PER_TRAY = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+TRAYS = 4
+
+rng = np.random.default_rng(0)
+
+
+def tray_arrays():
+    """Column arrays shaped like one tray's growth series and raw weights."""
+    return {
+        'hours': np.cumsum(rng.uniform(0.5, 2.0, CAPTURES)),
+        'length': rng.uniform(5, 25, CAPTURES),
+        'weight': rng.uniform(0.05, 0.25, CAPTURES),
+        'all_weights': rng.uniform(0.05, 0.25, WEIGHTS_PER_TRAY),
+    }
+
+
+TRAY_DATA = {tray: tray_arrays() for tray in range(1, TRAYS + 1)}
+
+
+def list_payload():
+    """Payload as the endpoints built it before: Python lists of round()ed floats."""
+    return {
+        'trays': {
+            str(tray): {
+                'growthData': {
+                    'days': [round(x, 1) for x in data['hours'].tolist()],
+                    'length': [round(x, 1) for x in data['length'].tolist()],
+                    'weight': [round(x, 3) for x in data['weight'].tolist()],
+                },
+                'allWeights': data['all_weights'].tolist(),
+            }
+            for tray, data in TRAY_DATA.items()
+        }
+    }
+
+
+def array_payload():
+    """The same payload with NumPy arrays and serialization-time rounding."""
+    return {
+        'trays': {
+            str(tray): {
+                'growthData': {
+                    'days': fast_json.Rounded(data['hours'], 1),
+                    'length': fast_json.Rounded(data['length'], 1),
+                    'weight': fast_json.Rounded(data['weight'], 3),
+                },
+                'allWeights': data['all_weights'],
+            }
+            for tray, data in TRAY_DATA.items()
+        }
+    }
+
+
+default_provider = DefaultJSONProvider(Flask(__name__))
+default_provider.compact = True
+
+CANDIDATES = {
+    'Flask default provider (lists)': lambda: default_provider.dumps(list_payload()).encode('utf-8'),
+    'fast_json stdlib fallback':      lambda: fast_json.dumps_stdlib(array_payload()),
+}
+if fast_json.ORJSON_AVAILABLE:
+    CANDIDATES['fast_json orjson'] = lambda: fast_json.dumps_orjson(array_payload())
+
+
+if __name__ == '__main__':
+    outputs = {name: func() for name, func in CANDIDATES.items()}
+    reference = json.loads(next(iter(outputs.values())))
+    for name, body in outputs.items():
+        assert json.loads(body) == reference, f"{name} produced a different document"
+    print(f"✅ All providers produce the same document ({len(body) / 1e6:.1f} MB, "
+          f"{TRAYS} trays x {CAPTURES} captures + {WEIGHTS_PER_TRAY} weights)")
+
+    baseline = None
+    for name, func in CANDIDATES.items():
+        elapsed = min(timeit.repeat(func, number=1, repeat=5))
+        baseline = baseline or elapsed
+        print(f"{name:<32} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: upload size, encode time and decode time of one capture's detection masks as
+JSON lists (mask.tolist(), the old upload format) vs mask_codec's RLE and polygon
+encodings. Masks are full-frame like the model's: elongated larva-shaped ellipses.
+The polygon encoding needs OpenCV, as on the edge.
+    python bench_mask_codec.py [masks masks ...]
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+import mask_codec
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [10, 50]
+HEIGHT, WIDTH = 900, 1200
+REPEAT = 3
+
+
+def larva_masks(count, seed=0):
+    """count full-frame (1, H, W) uint8 masks, each one rotated ellipse about 60x12 px."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    masks = []
+    for _ in range(count):
+        cx, cy = rng.uniform(50, WIDTH - 50), rng.uniform(50, HEIGHT - 50)
+        a, b, angle = rng.uniform(20, 40), rng.uniform(5, 8), rng.uniform(0, np.pi)
+        u = (x - cx) * np.cos(angle) + (y - cy) * np.sin(angle)
+        v = -(x - cx) * np.sin(angle) + (y - cy) * np.cos(angle)
+        masks.append(((u / a) ** 2 + (v / b) ** 2 <= 1).astype(np.uint8)[None])
+    return masks
+
+
+def timed(run):
+    """Best of REPEAT runs, in ms, and the last result."""
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def measure(masks, encode, decode):
+    encode_ms, payload = timed(lambda: json.dumps([encode(mask) for mask in masks]))
+    decode_ms, decoded = timed(lambda: [decode(encoded) for encoded in json.loads(payload)])
+    inter = sum(int((d & m[0]).sum()) for d, m in zip(decoded, masks))
+    union = sum(int((d | m[0]).sum()) for d, m in zip(decoded, masks))
+    return len(payload), encode_ms, decode_ms, inter / union
+
+
+if __name__ == '__main__':
+    formats = [
+        ('json lists', lambda mask: mask.tolist(), mask_codec.decode_mask),
+        ('rle', mask_codec.encode_rle, mask_codec.decode_mask),
+        ('polygon', mask_codec.encode_polygon, mask_codec.decode_mask),
+    ]
+    print(f"{HEIGHT}x{WIDTH} masks, best of {REPEAT}")
+    print(f"{'masks':>6} {'format':>11} {'payload':>12} {'encode ms':>10} {'decode ms':>10} {'IoU':>7}")
+    for count in SIZES:
+        masks = larva_masks(count)
+        for name, encode, decode in formats:
+            size, encode_ms, decode_ms, iou = measure(masks, encode, decode)
+            print(f"{count:>6} {name:>11} {size / 1024:>9.1f} KB {encode_ms:>10.1f} {decode_ms:>10.1f} {iou:>7.4f}")
+
+        legacy = json.dumps([mask.tolist() for mask in masks])
+        compact_ms, stored = timed(lambda: mask_codec.compact_masks(legacy))
+        print(f"{count:>6} {'server: json lists -> rle for storage':>38} {compact_ms:.1f} ms, "
+              f"{len(legacy) / 1024:.0f} KB -> {len(stored) / 1024:.1f} KB")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: metrics_engine (NumPy over Core row tuples) vs the previous Python loops over ORM objects.
+Uses a throwaway SQLite database, so it never touches the configured DATABASE_URL:
+    python bench_metrics_engine.py [rows]
+"""
+import os
+import sys
+import random
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), 'bench_metrics_engine.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{BENCH_DB}'
+
+from BSFwebdashboard import app, db, User, LarvaeData, larvae_columns_query
+import metrics_engine
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+LARVAE_PER_CAPTURE = 50
+
+
+def seed_database():
+    """Creates one tray with ROWS larvae spread over captures every hour."""
+    if os.path.exists(BENCH_DB):
+        os.remove(BENCH_DB)
+    db.create_all()
+    user = User(username='bench', is_verified=True)
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    start = datetime(2025, 1, 1)
+    mappings = []
+    for i in range(ROWS):
+        mappings.append({
+            'tray_number': 1,
+            'user_id': user.id,
+            'length': random.uniform(5, 25),
+            'width': random.uniform(1, 4),
+            'area': random.uniform(5, 80),
+            'weight': random.uniform(0.05, 0.25),
+            'count': 1,
+            'timestamp': start + timedelta(hours=i // LARVAE_PER_CAPTURE)
+        })
+    db.session.bulk_insert_mappings(LarvaeData, mappings)
+    db.session.commit()
+    return user.id
+
+
+def python_loops(user_id):
+    """The per-endpoint code as it was: ORM entities, dict grouping, if/elif binning."""
+    tray_entries = LarvaeData.query.filter_by(tray_number=1, user_id=user_id)\
+                                  .order_by(LarvaeData.timestamp.asc())\
+                                  .all()
+    growth_data = {"days": [], "length": [], "weight": []}
+    start_time = tray_entries[0].timestamp
+    grouped_data = {}
+    for entry in tray_entries:
+        grouped_data.setdefault(entry.timestamp, []).append(entry)
+    for timestamp in sorted(grouped_data.keys()):
+        entries = grouped_data[timestamp]
+        growth_data["days"].append(round((timestamp - start_time).total_seconds() / 3600, 1))
+        growth_data["length"].append(round(sum(l.length for l in entries) / len(entries), 1))
+        growth_data["weight"].append(round(sum(l.weight for l in entries) / len(entries), 3))
+
+    weight_bins = {
+        "0.08-0.10": 0, "0.10-0.12": 0, "0.12-0.14": 0,
+        "0.14-0.16": 0, "0.16-0.18": 0, "0.18-0.20": 0, "0.20+": 0
+    }
+    for larva in tray_entries:
+        weight = larva.weight
+        if 0.08 <= weight < 0.10: weight_bins["0.08-0.10"] += 1
+        elif 0.10 <= weight < 0.12: weight_bins["0.10-0.12"] += 1
+        elif 0.12 <= weight < 0.14: weight_bins["0.12-0.14"] += 1
+        elif 0.14 <= weight < 0.16: weight_bins["0.14-0.16"] += 1
+        elif 0.16 <= weight < 0.18: weight_bins["0.16-0.18"] += 1
+        elif 0.18 <= weight < 0.20: weight_bins["0.18-0.20"] += 1
+        elif weight >= 0.20: weight_bins["0.20+"] += 1
+    averages = {
+        name: sum(getattr(l, name) for l in tray_entries) / len(tray_entries)
+        for name in metrics_engine.METRIC_NAMES
+    }
+    db.session.expunge_all()
+    return growth_data, list(weight_bins.values()), averages
+
+
+def vectorized(user_id):
+    """The same results through metrics_engine."""
+    columns = metrics_engine.load_columns(db.session, larvae_columns_query(user_id, 1))
+    captures = metrics_engine.group_by_key(columns['timestamp'], columns, mean_names=('length', 'weight'))
+    growth_data = {
+        "days": metrics_engine.rounded(metrics_engine.hours_since(captures['key'], captures['key'][0]), 1),
+        "length": metrics_engine.rounded(captures['length'], 1),
+        "weight": metrics_engine.rounded(captures['weight'], 3)
+    }
+    _, counts = metrics_engine.histogram(columns['weight'])
+    return growth_data, counts, metrics_engine.column_means(columns)
+
+
+def best_of(func, *args, repeat=5):
+    return min(timeit.repeat(lambda: func(*args), number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        print(f"🚀 Seeding {ROWS} larvae rows ({ROWS // LARVAE_PER_CAPTURE} captures)...")
+        user_id = seed_database()
+
+        loop_result = python_loops(user_id)
+        numpy_result = vectorized(user_id)
+        assert loop_result[0] == numpy_result[0], "growth series differ"
+        assert loop_result[1] == numpy_result[1], "histograms differ"
+        print("✅ Both paths produce the same growth series and histogram")
+
+        loop_time = best_of(python_loops, user_id)
+        numpy_time = best_of(vectorized, user_id)
+        print(f"Python loops over ORM rows: {loop_time * 1000:8.1f} ms")
+        print(f"metrics_engine (NumPy):     {numpy_time * 1000:8.1f} ms")
+        print(f"Speed-up:                   {loop_time / numpy_time:8.1f}x")
+
+    os.remove(BENCH_DB)
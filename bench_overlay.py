@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server-side overlay rendering. Times one render per style and size, a cache
+hit, and the throughput of OverlayRenderer's pool rendering many distinct overlays at once.
+The stored image is a 1200x900 JPEG; detections come from a 2400x1800 frame as RLE masks.
+    python bench_overlay.py [masks]
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import bench_mask_codec
+import mask_codec
+from overlay_renderer import OverlayRenderer, OVERLAY_SIZES, OVERLAY_STYLES, render_overlay
+from response_cache import build_response_cache
+
+MASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+IMAGES = 24
+
+
+def capture():
+    """(image_bytes, boxes_json, masks_json, frame_json) like an upload from the edge."""
+    bench_mask_codec.HEIGHT, bench_mask_codec.WIDTH = 1800, 2400
+    masks = bench_mask_codec.larva_masks(MASKS)
+    boxes = []
+    for mask in masks:
+        ys, xs = np.nonzero(mask[0])
+        boxes.append([int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())])
+    noise = np.random.default_rng(0).integers(60, 160, (900, 1200, 3), dtype=np.uint8)
+    output = BytesIO()
+    Image.fromarray(noise).save(output, format='JPEG', quality=85)
+    return (output.getvalue(), json.dumps(boxes), json.dumps([mask_codec.encode_rle(mask) for mask in masks]),
+            json.dumps([1800, 2400]))
+
+
+def ms(run, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    row = capture()
+    print(f"{MASKS} masks, stored image {len(row[0]) / 1024:.0f} KB")
+    print(f"{'style':>8} " + ' '.join(f"{f'size {size}':>10}" for size in OVERLAY_SIZES) + "   (render ms)")
+    for style in OVERLAY_STYLES:
+        print(f"{style:>8} " + ' '.join(f"{ms(lambda: render_overlay(*row, style, size)):>10.1f}" for size in OVERLAY_SIZES))
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        renderer = OverlayRenderer(build_response_cache(max_bytes=256 * 1024 * 1024), workers=workers)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=IMAGES) as clients:
+            list(clients.map(lambda image_id: renderer.get(image_id, 'default', 640, lambda: row), range(IMAGES)))
+        elapsed = time.perf_counter() - start
+        hit = ms(lambda: renderer.get(0, 'default', 640, lambda: row), repeat=100)
+        print(f"{workers} worker(s): {IMAGES} distinct 640px overlays in {elapsed * 1000:.0f} ms "
+              f"({IMAGES / elapsed:.1f}/s); cached overlay {hit:.3f} ms")
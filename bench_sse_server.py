@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sse_server.py holding many concurrent SSE clients. Runs the server in a
+subprocess fed by a Unix-socket event bus, opens streams with a signed session cookie
+and reports the server's memory per connection and the time until every client has
+read a burst of events published from this process.
+    python bench_sse_server.py [clients clients ...]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import psutil
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from event_bus import build_event_bus
+
+CLIENTS = [int(arg) for arg in sys.argv[1:]] or [1000, 2000]
+EVENTS = 100
+USERS = 10
+PORT = 10991
+SECRET_KEY = 'bench-secret'
+BUS_PATH = os.path.join(tempfile.gettempdir(), 'bench_sse_server.sock')
+
+
+def session_cookie(user_id):
+    """A Flask session cookie as Flask-Login would set it after logging in."""
+    flask_app = Flask(__name__)
+    flask_app.secret_key = SECRET_KEY
+    return SecureCookieSessionInterface().get_signing_serializer(flask_app).dumps({'_user_id': str(user_id)})
+
+
+def start_server(client_count):
+    env = {**os.environ, 'SSE_PORT': str(PORT), 'SECRET_KEY': SECRET_KEY, 'EVENT_BUS_URL': f'unix://{BUS_PATH}',
+           'SSE_MAX_CLIENTS': str(client_count), 'SSE_HEARTBEAT_SECONDS': '60'}
+    return subprocess.Popen([sys.executable, 'sse_server.py'], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_until_ready(session, bus):
+    while True:
+        try:
+            async with session.get(f'http://127.0.0.1:{PORT}/stats') as response:
+                if response.status == 200 and bus.stats()['peers']:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+
+
+async def client(session, user_id, cookie, connected, received, done):
+    """Reads one stream until it has seen its user's share of the events."""
+    async with session.get(f'http://127.0.0.1:{PORT}/stream', headers={'Cookie': f'session={cookie}'}) as response:
+        connected.release()
+        count = 0
+        async for line in response.content:
+            if line.startswith(b'id: '):
+                count += 1
+                received[user_id] += 1
+                if count == EVENTS // USERS:
+                    done.release()
+                    return
+
+
+async def run(client_count, bus):
+    server = start_server(client_count)
+    process = psutil.Process(server.pid)
+    cookies = {user_id: session_cookie(user_id) for user_id in range(USERS)}
+    received = dict.fromkeys(range(USERS), 0)
+    connected, done = asyncio.Semaphore(0), asyncio.Semaphore(0)
+
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0),
+                                         timeout=aiohttp.ClientTimeout(total=None)) as session:
+            await wait_until_ready(session, bus)
+            baseline = process.memory_info().rss
+
+            tasks = [asyncio.create_task(client(session, i % USERS, cookies[i % USERS], connected, received, done))
+                     for i in range(client_count)]
+            for _ in range(client_count):
+                await connected.acquire()
+            await asyncio.sleep(1.0)
+            holding = process.memory_info().rss
+
+            start = time.perf_counter()
+            for event in range(EVENTS):
+                bus.publish({'type': 'new_data', 'tray_number': 1, 'count': event}, event % USERS, 1)
+            for _ in range(client_count):
+                await done.acquire()
+            fan_out = time.perf_counter() - start
+
+            await asyncio.gather(*tasks)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return baseline, holding, fan_out
+
+
+async def main():
+    if os.path.exists(BUS_PATH):
+        os.unlink(BUS_PATH)
+    bus = build_event_bus(lambda data, user_id, tray_number: None, f'unix://{BUS_PATH}')
+    print(f"{USERS} users, {EVENTS} events published round-robin across them")
+    print(f"{'clients':>8} {'server RSS idle':>16} {'holding streams':>16} {'per stream':>11} {'all clients read their events':>30}")
+    for client_count in CLIENTS:
+        baseline, holding, fan_out = await run(client_count, bus)
+        print(f"{client_count:>8} {baseline / 1e6:>13.1f} MB {holding / 1e6:>13.1f} MB "
+              f"{(holding - baseline) / client_count / 1024:>8.1f} KB {fan_out * 1000:>27.1f} ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
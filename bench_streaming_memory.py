@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak Python memory of /get_comparison_data built with jsonify vs streamed
+from a server-side cursor, at growing data sizes. The streamed peak should stay flat.
+Uses a throwaway SQLite database, so it never touches the configured DATABASE_URL:
+    python bench_streaming_memory.py [rows rows ...]
+"""
+import os
+import sys
+import random
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), 'bench_streaming_memory.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{BENCH_DB}'
+
+from BSFwebdashboard import app, db, User, LarvaeData, response_cache, rebuild_tray_summaries
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [20000, 80000, 320000]
+TRAYS = 4
+LARVAE_PER_CAPTURE = 50
+
+
+def seed_database(rows):
+    """Creates a user with rows larvae spread over TRAYS trays, one capture per hour."""
+    db.drop_all()
+    db.create_all()
+    user = User(username='bench', is_verified=True)
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'tray_number': i % TRAYS + 1,
+            'user_id': user.id,
+            'length': random.uniform(5, 25),
+            'width': random.uniform(1, 4),
+            'area': random.uniform(5, 80),
+            'weight': random.uniform(0.05, 0.25),
+            'count': 1,
+            'timestamp': start + timedelta(hours=i // (LARVAE_PER_CAPTURE * TRAYS))
+        })
+        if len(batch) == 10000:
+            db.session.bulk_insert_mappings(LarvaeData, batch)
+            batch = []
+    db.session.bulk_insert_mappings(LarvaeData, batch)
+    db.session.commit()
+    rebuild_tray_summaries(user.id)
+    return user.id
+
+
+def peak_memory(client, user_id, stream):
+    """Peak traced allocation (bytes) while serving and reading one response."""
+    response_cache.bump(user_id, None)  # Make sure the request is a cache miss
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    response = client.get(f'/get_comparison_data?stream={stream}', buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200
+    return peak, size
+
+
+if __name__ == '__main__':
+    print(f"{'rows':>8} {'body MB':>8} {'jsonify peak MB':>16} {'streamed peak MB':>17}")
+    for rows in SIZES:
+        with app.app_context():
+            user_id = seed_database(rows)
+
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+        buffered_peak, size = peak_memory(client, user_id, 0)
+        streamed_peak, _ = peak_memory(client, user_id, 1)
+        print(f"{rows:>8} {size / 1e6:>8.1f} {buffered_peak / 1e6:>16.1f} {streamed_peak / 1e6:>17.1f}")
+
+    os.remove(BENCH_DB)
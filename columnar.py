@@ -0,0 +1,103 @@
+# columnar.py - Binary columnar encodings of chart payloads
+#
+# Every NumPy array (or fast_json.Rounded) in a response dict becomes a float32 little-endian
+# column; everything else stays in a small JSON header. The browser maps each column onto a
+# typed array without parsing text.
+#
+# application/x-bsf-columns layout:
+#   4 bytes   magic b'BSFC'
+#   uint16    format version
+#   uint16    reserved (0)
+#   uint32    header length in bytes
+#   header    UTF-8 JSON {"meta": payload without the arrays,
+#                         "columns": [{"path": [...], "offset": n, "length": n, "decimals": d|null}]}
+#   padding   zero bytes up to a 4-byte boundary
+#   columns   float32 LE values; each offset is relative to the start of this section
+#
+# "decimals" marks columns that were Rounded: the decoder rounds the float32 values back to
+# that many places, so clients see the same numbers as in the JSON response.
+#
+# application/vnd.apache.arrow.stream (when pyarrow is installed) carries the same columns as
+# one record batch of list<float32> fields named by the dotted path, with the header JSON
+# (minus offsets) in the schema metadata under b'bsf'.
+
+import struct
+
+import numpy as np
+
+import fast_json
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+JSON_MIMETYPE = 'application/json'
+COLUMNS_MIMETYPE = 'application/x-bsf-columns'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+MAGIC = b'BSFC'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sHHI')
+
+# JSON first, so clients that send */* (or no Accept header) keep getting JSON
+MIMETYPES = [JSON_MIMETYPE, COLUMNS_MIMETYPE] + ([ARROW_MIMETYPE] if pyarrow is not None else [])
+
+
+def split_columns(payload, path=()):
+    """
+    Separates a payload into (meta, columns): meta is the payload with every array removed,
+    columns is a list of (path, float32 array, decimals) in document order.
+    """
+    meta, columns = {}, []
+    for name, value in payload.items():
+        if isinstance(value, fast_json.Rounded):
+            columns.append(((*path, name), value.array().astype('<f4'), value.decimals))
+        elif isinstance(value, np.ndarray):
+            columns.append(((*path, name), value.astype('<f4'), None))
+        elif isinstance(value, dict):
+            meta[name], nested = split_columns(value, (*path, name))
+            columns.extend(nested)
+        else:
+            meta[name] = value
+    return meta, columns
+
+
+def encode_columns(payload):
+    """Encodes a payload as application/x-bsf-columns."""
+    meta, columns = split_columns(payload)
+
+    descriptors, offset = [], 0
+    for path, values, decimals in columns:
+        descriptors.append({'path': list(path), 'offset': offset, 'length': len(values), 'decimals': decimals})
+        offset += values.nbytes
+
+    header = fast_json.dumps_bytes({'meta': meta, 'columns': descriptors})
+    padding = -(PREAMBLE.size + len(header)) % 4
+    parts = [PREAMBLE.pack(MAGIC, VERSION, 0, len(header)), header, b'\0' * padding]
+    parts.extend(values.tobytes() for _, values, _ in columns)
+    return b''.join(parts)
+
+
+def encode_arrow(payload):
+    """Encodes a payload as an Arrow IPC stream (requires pyarrow)."""
+    meta, columns = split_columns(payload)
+    descriptors = [{'path': list(path), 'decimals': decimals} for path, _, decimals in columns]
+
+    arrays = [pyarrow.array([values], type=pyarrow.list_(pyarrow.float32())) for _, values, _ in columns]
+    names = ['.'.join(path) for path, _, _ in columns]
+    batch = pyarrow.record_batch(arrays, names=names)
+    schema = batch.schema.with_metadata({b'bsf': fast_json.dumps_bytes({'meta': meta, 'columns': descriptors})})
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, mimetype):
+    """Body bytes of payload in one of the binary MIMETYPES."""
+    if mimetype == ARROW_MIMETYPE:
+        return encode_arrow(payload)
+    return encode_columns(payload)
@@ -0,0 +1,65 @@
+"""
+Shared pytest setup: the app runs against a throwaway SQLite database, with stored images on
+and no SMTP worker. Fixtures give each test a fresh schema and empty caches.
+"""
+import os
+import tempfile
+
+import pytest
+
+TEST_DB = os.path.join(tempfile.gettempdir(), 'bsf_test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{TEST_DB}'
+os.environ['IMAGES_ENABLED'] = 'true'
+os.environ.pop('SMTP_SERVER', None)  # Keep the app from starting its own email worker
+
+TEST_USERNAME = 'grower'
+TEST_PASSWORD = 'larvae123'
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """App context over an empty schema; cached responses and users don't leak between tests."""
+    import BSFwebdashboard
+    from response_cache import MemoryBackend
+    from session_auth import UserCache
+
+    monkeypatch.setattr(BSFwebdashboard.response_cache, 'backend', MemoryBackend(32 * 1024 * 1024))
+    monkeypatch.setattr(BSFwebdashboard, 'user_cache', UserCache())
+    app, db = BSFwebdashboard.app, BSFwebdashboard.db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(TEST_DB)
+
+
+@pytest.fixture
+def client(database):
+    """Test client logged in as a verified user."""
+    from BSFwebdashboard import app, User
+
+    user = User(username=TEST_USERNAME, email='grower@example.com', is_verified=True)
+    user.set_password(TEST_PASSWORD)
+    database.session.add(user)
+    database.session.commit()
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': TEST_USERNAME, 'password': TEST_PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def upload(client):
+    """Posts a capture to /api/upload the way the edge does; returns the JSON reply."""
+    def post(tray_number, weights, status=200, **fields):
+        response = client.post('/api/upload', json={
+            'username': TEST_USERNAME, 'password': TEST_PASSWORD,
+            'tray_number': tray_number, 'count': len(weights), 'individual_weights': weights,
+            'avg_length': 20.0, 'avg_weight': sum(weights) / len(weights) if weights else 0.0, **fields
+        })
+        assert response.status_code == status, response.get_json()
+        return response.get_json()
+    return post
@@ -0,0 +1,239 @@
+# email_outbox.py - Background delivery of queued emails
+#
+# Request handlers add a row to the email_outbox table and return straight away. OutboxWorker,
+# one daemon thread per process, claims due rows, sends them over a single reused SMTP
+# connection and records how long delivery took. A failed send is retried with exponential
+# backoff (plus jitter) up to MAX_ATTEMPTS times. Rows left in 'sending' by a process that died
+# are claimed again after CLAIM_TIMEOUT. Claims are conditional UPDATEs, so several gunicorn
+# workers can share the table without sending a message twice.
+#
+# SMTP settings come from the environment: SMTP_SERVER, SMTP_PORT (587), SMTP_USERNAME and
+# SMTP_PASSWORD (no login when unset), FROM_EMAIL, SMTP_STARTTLS (true) and SMTP_TIMEOUT (30 s).
+# A local stand-in such as `python -m aiosmtpd -n -l localhost:1025` with SMTP_STARTTLS=false
+# receives everything during development.
+
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from sqlalchemy import or_, and_, update
+
+MAX_ATTEMPTS = 6
+BACKOFF_SECONDS = 30           # Delay before the first retry; doubles with every attempt
+MAX_BACKOFF_SECONDS = 3600
+CLAIM_TIMEOUT = timedelta(minutes=5)
+IDLE_DISCONNECT_SECONDS = 60   # Close the SMTP connection after this long without mail
+BATCH_SIZE = 20
+
+
+def utcnow():
+    """Naive UTC, as the DateTime columns store it on both SQLite and PostgreSQL."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts`: exponential, capped, with +/-20% jitter."""
+    delay = min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SMTPSender:
+    """One SMTP connection reused across messages; reconnects when the server drops it."""
+
+    def __init__(self, host, port=587, username='', password='', from_email='', starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.from_email = from_email or username
+        self.starttls = starttls
+        self.timeout = timeout
+        self.connection = None
+        self.last_used = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Sender configured from the SMTP_* variables, or None when SMTP_SERVER is unset."""
+        host = os.environ.get('SMTP_SERVER', '')
+        if not host:
+            return None
+        return cls(
+            host,
+            port=int(os.environ.get('SMTP_PORT', 587)),
+            username=os.environ.get('SMTP_USERNAME', ''),
+            password=os.environ.get('SMTP_PASSWORD', ''),
+            from_email=os.environ.get('FROM_EMAIL', ''),
+            starttls=os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false',
+            timeout=float(os.environ.get('SMTP_TIMEOUT', 30))
+        )
+
+    def connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username and self.password:
+            connection.login(self.username, self.password)
+        self.connection = connection
+
+    def send(self, recipient, subject, html):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self.from_email
+        msg['To'] = recipient
+        msg.attach(MIMEText(html, 'html'))
+
+        self.last_used = time.monotonic()
+        for attempt in range(2):
+            if self.connection is None:
+                self.connect()
+            try:
+                self.connection.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # The server closed the idle connection; reconnect once and retry
+                self.connection = None
+                if attempt:
+                    raise
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > IDLE_DISCONNECT_SECONDS:
+            self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.connection = None
+
+
+class OutboxWorker:
+    """Daemon thread delivering due rows of the outbox model through an SMTPSender."""
+
+    def __init__(self, app, db, model, sender, poll_seconds=30):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.sender = sender
+        self.poll_seconds = poll_seconds
+        self.wakeup = threading.Event()
+        self.next_retry = None  # Monotonic time of the earliest retry this worker scheduled
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+                self.thread.start()
+        return self
+
+    def notify(self):
+        """Sends newly queued mail now instead of at the next poll."""
+        self.wakeup.set()
+
+    def run(self):
+        print("📧 Email outbox worker started")
+        while True:
+            self.wakeup.clear()
+            if self.next_retry is not None and self.next_retry <= time.monotonic():
+                self.next_retry = None  # Due now, so this pass claims it
+            delivered = 0
+            with self.app.app_context():
+                try:
+                    delivered = self.process_due()
+                except Exception as e:
+                    self.db.session.rollback()
+                    print(f"❌ Email outbox error: {e}")
+                finally:
+                    self.db.session.remove()
+            if delivered == BATCH_SIZE:
+                continue  # More may be due
+            self.sender.close_if_idle()
+            self.wakeup.wait(self.wait_seconds())
+
+    def wait_seconds(self):
+        """Sleep until the next poll, or sooner if one of our retries falls due before it."""
+        if self.next_retry is None:
+            return self.poll_seconds
+        return min(max(self.next_retry - time.monotonic(), 0), self.poll_seconds)
+
+    def claim_due(self):
+        """Marks up to BATCH_SIZE due rows as 'sending' for this worker and returns them."""
+        return self.claim(self.due_candidates())
+
+    def due_candidates(self):
+        """(id, status, attempts, claimed_at) of up to BATCH_SIZE rows that are due to be sent."""
+        model, session = self.model, self.db.session
+        now = utcnow()
+        due = or_(
+            and_(model.status == 'pending', model.next_attempt_at <= now),
+            and_(model.status == 'sending', model.claimed_at < now - CLAIM_TIMEOUT)
+        )
+        return session.execute(
+            session.query(model.id, model.status, model.attempts, model.claimed_at)
+                   .filter(due)
+                   .order_by(model.next_attempt_at)
+                   .limit(BATCH_SIZE)
+                   .statement
+        ).all()
+
+    def claim(self, candidates):
+        model, session = self.model, self.db.session
+        now = utcnow()
+        claimed = []
+        for row_id, status, attempts, claimed_at in candidates:
+            # Only one worker's UPDATE can match the row as it was read. claimed_at is part of
+            # the match: reclaiming a stale 'sending' row changes neither status nor attempts
+            result = session.execute(
+                update(model)
+                .where(model.id == row_id, model.status == status, model.attempts == attempts,
+                       model.claimed_at.is_(None) if claimed_at is None else model.claimed_at == claimed_at)
+                .values(status='sending', claimed_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(row_id)
+        session.commit()
+        return [session.get(model, row_id) for row_id in claimed]
+
+    def process_due(self):
+        messages = self.claim_due()
+        for message in messages:
+            self.deliver(message)
+        return len(messages)
+
+    def deliver(self, message):
+        message.attempts += 1
+        start = time.perf_counter()
+        try:
+            self.sender.send(message.recipient, message.subject, message.html)
+        except Exception as e:
+            if not isinstance(e, smtplib.SMTPResponseException):
+                self.sender.close()  # Only a refusal leaves the connection usable
+            message.last_error = str(e)[:500]
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = 'failed'
+                print(f"❌ Giving up on email {message.id} to {message.recipient} after {message.attempts} attempts: {e}")
+            else:
+                message.status = 'pending'
+                delay = backoff_delay(message.attempts)
+                message.next_attempt_at = utcnow() + timedelta(seconds=delay)
+                retry_at = time.monotonic() + delay
+                self.next_retry = min(self.next_retry or retry_at, retry_at)
+                print(f"⚠️ Email {message.id} to {message.recipient} failed ({e}), retrying at {message.next_attempt_at}")
+        else:
+            message.status = 'sent'
+            message.sent_at = utcnow()
+            message.send_ms = (time.perf_counter() - start) * 1000
+            message.html = ''  # The body (a verification code) isn't needed once delivered
+            print(f"✅ Email {message.id} sent to {message.recipient} in {message.send_ms:.0f} ms "
+                  f"({(message.sent_at - message.created_at).total_seconds():.1f} s after queueing)")
+        self.db.session.commit()
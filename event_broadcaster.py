@@ -0,0 +1,235 @@
+# event_broadcaster.py - SSE fan-out over one shared ring buffer
+#
+# publish() encodes an event once and appends it to a bounded ring buffer under a new sequence
+# number and its channel, (user_id, tray_number). Each SSE generator keeps only a cursor (the
+# last sequence it sent) and blocks on its own condition until an event on one of its channels
+# arrives. Subscribers are indexed by channel, so a publish wakes only the streams of that user
+# (all trays, or the tray filtered on), and every one of them reads the same encoded payload.
+#
+# EventBroadcaster serves the threaded Flask /stream; AsyncEventBroadcaster is the same ring
+# buffer for coroutines (sse_server.py), waking each stream through an asyncio.Event.
+#
+# Events go out with an SSE `id:` of "<epoch>-<sequence>". A reconnecting client sends it back
+# as Last-Event-ID and is replayed whatever it missed from the ring buffer; the epoch (new on
+# every process start) tells a stale cursor from a restarted sequence.
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+
+import fast_json
+
+
+def channel_keys(user_id, trays=None):
+    """Index keys a subscription listens on: one per tray, or (user_id, None) for all trays."""
+    if not trays:
+        return ((user_id, None),)
+    return tuple((user_id, tray) for tray in sorted(set(trays)))
+
+
+class Subscriber:
+    """Bookkeeping for one connected stream (the cursor itself lives in the generator)."""
+
+    __slots__ = ('client_id', 'user_id', 'trays', 'keys', 'created', 'last_sequence', 'pending', 'closed', 'signal')
+
+    def __init__(self, client_id, user_id, trays, sequence, signal):
+        self.client_id = client_id
+        self.user_id = user_id
+        self.trays = frozenset(trays) if trays else None
+        self.keys = channel_keys(user_id, trays)
+        self.created = time.time()
+        self.last_sequence = sequence
+        self.pending = False  # An event for this stream arrived since its last wait()
+        self.closed = False
+        self.signal = signal  # Whatever the broadcaster wakes this stream with
+
+    def wants(self, channel):
+        user_id, tray_number = channel
+        return user_id == self.user_id and (self.trays is None or tray_number in self.trays)
+
+
+class EventBroadcaster:
+    """Sequence-numbered ring buffer of encoded events shared by all SSE clients."""
+
+    def __init__(self, capacity=256, max_clients=50):
+        self.events = deque(maxlen=capacity)  # (sequence, channel, encoded JSON payload)
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.channels = {}  # channel key -> set of Subscribers
+        self.evicted = {}   # channel key -> newest sequence pushed out of the ring buffer
+        self.max_clients = max_clients
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def publish(self, data, user_id=None, tray_number=None):
+        """Encodes data once and wakes the subscribers of its channel. Returns its sequence number."""
+        payload = fast_json.dumps(data)
+        channel = (user_id, tray_number)
+        keys = (channel, (user_id, None))
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                sequence, (old_user, old_tray), _ = self.events[0]
+                self.evicted[(old_user, old_tray)] = sequence
+                self.evicted[(old_user, None)] = sequence
+            self.sequence += 1
+            self.events.append((self.sequence, channel, payload))
+            for key in keys:
+                for subscriber in self.channels.get(key, ()):
+                    subscriber.pending = True
+                    self.wake(subscriber)
+            return self.sequence
+
+    def new_signal(self):
+        return threading.Condition(self.lock)
+
+    def wake(self, subscriber):
+        """Wakes a blocked stream. Called with the lock held."""
+        subscriber.signal.notify()
+
+    def event_id(self, sequence):
+        """SSE id for a sequence number."""
+        return f"{self.epoch}-{sequence}"
+
+    def parse_event_id(self, event_id):
+        """Sequence number from an SSE id issued by this process, else None."""
+        epoch, _, sequence = (event_id or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def resume_cursor(self, last_event_id, user_id=None, trays=None):
+        """
+        Cursor to resume a stream from a Last-Event-ID, plus whether the client must reload
+        because events it missed on its channels are gone (aged out of the buffer, or another process).
+        """
+        with self.lock:
+            if not last_event_id:
+                return self.sequence, False
+            cursor = self.parse_event_id(last_event_id)
+            if cursor is None or cursor > self.sequence:
+                return self.sequence, True
+            if self.missed(channel_keys(user_id, trays), cursor):
+                return self.sequence, True
+            return cursor, False
+
+    def subscribe(self, client_id, user_id=None, trays=None, cursor=None):
+        """
+        Registers a stream for a user's events (optionally only some trays), from cursor or the
+        current sequence. The oldest stream is closed when full.
+        """
+        with self.lock:
+            if len(self.subscribers) >= self.max_clients:
+                oldest = min(self.subscribers.values(), key=lambda subscriber: subscriber.created)
+                self.remove(oldest)
+                self.wake(oldest)
+                print(f"🧹 Closed oldest stream {oldest.client_id} to stay under {self.max_clients} clients")
+
+            subscriber = Subscriber(client_id, user_id, trays, self.sequence if cursor is None else cursor, self.new_signal())
+            subscriber.pending = subscriber.last_sequence < self.sequence  # Replay on the first wait()
+            self.subscribers[client_id] = subscriber
+            for key in subscriber.keys:
+                self.channels.setdefault(key, set()).add(subscriber)
+            print(f"✅ Added client {client_id}, total: {len(self.subscribers)}")
+            return subscriber
+
+    def remove(self, subscriber):
+        """Drops a subscriber from the indexes. Call with the lock held."""
+        subscriber.closed = True
+        if self.subscribers.get(subscriber.client_id) is subscriber:
+            del self.subscribers[subscriber.client_id]
+        for key in subscriber.keys:
+            listeners = self.channels.get(key)
+            if listeners is not None:
+                listeners.discard(subscriber)
+                if not listeners:
+                    del self.channels[key]
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.remove(subscriber)
+            print(f"✅ Removed client {subscriber.client_id}, remaining: {len(self.subscribers)}")
+
+    def missed(self, keys, cursor):
+        """Whether an event newer than cursor on one of these channels was overwritten. Call with the lock held."""
+        return any(self.evicted.get(key, 0) > cursor for key in keys)
+
+    def events_after(self, subscriber, cursor):
+        """
+        Buffered events for the subscriber newer than cursor as (sequence, payload), plus whether
+        some were already overwritten. Call with the lock held.
+        """
+        if not self.events or cursor >= self.sequence:
+            return [], False
+        start = max(cursor + 1 - self.events[0][0], 0)
+        events = [(sequence, payload) for sequence, channel, payload in islice(self.events, start, None)
+                  if subscriber.wants(channel)]
+        return events, self.missed(subscriber.keys, cursor)
+
+    def wait(self, subscriber, cursor, timeout):
+        """
+        Blocks until an event for this subscriber is published, it is closed, or timeout
+        seconds pass. Returns (events, missed); after a miss the client reloads instead, so
+        no events are returned and subscriber.last_sequence jumps to the newest sequence.
+        """
+        with self.lock:
+            subscriber.signal.wait_for(lambda: subscriber.pending or subscriber.closed, timeout)
+            return self.collect(subscriber, cursor)
+
+    def collect(self, subscriber, cursor):
+        """Result of a wait(). Call with the lock held."""
+        subscriber.pending = False
+        events, missed = self.events_after(subscriber, cursor)
+        if missed:
+            events = []
+            subscriber.last_sequence = self.sequence
+        elif events:
+            subscriber.last_sequence = events[-1][0]
+        return events, missed
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            return {
+                'total_clients': len(self.subscribers),
+                'channels': len(self.channels),
+                'max_clients': self.max_clients,
+                'sequence': self.sequence,
+                'buffered_events': len(self.events),
+                'capacity': self.events.maxlen,
+                'clients': {
+                    client_id: {
+                        'created': subscriber.created,
+                        'age_seconds': now - subscriber.created,
+                        'trays': sorted(subscriber.trays) if subscriber.trays else 'all',
+                        'lag': self.sequence - subscriber.last_sequence
+                    }
+                    for client_id, subscriber in self.subscribers.items()
+                }
+            }
+
+
+class AsyncEventBroadcaster(EventBroadcaster):
+    """
+    EventBroadcaster for coroutines on one event loop. Every method must run on that loop's
+    thread (hand events over from other threads with loop.call_soon_threadsafe), so the lock
+    is never contended and only guards the shared bookkeeping.
+    """
+
+    def new_signal(self):
+        return asyncio.Event()
+
+    def wake(self, subscriber):
+        subscriber.signal.set()
+
+    async def wait(self, subscriber, cursor, timeout):
+        if not (subscriber.pending or subscriber.closed):
+            try:
+                await asyncio.wait_for(subscriber.signal.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        subscriber.signal.clear()
+        with self.lock:
+            return self.collect(subscriber, cursor)
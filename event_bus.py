@@ -0,0 +1,327 @@
+# event_bus.py - Cross-process delivery of SSE events
+#
+# broadcast_to_clients() publishes through an event bus instead of straight into the local
+# EventBroadcaster, so an upload handled by one gunicorn worker (or by mqtt_worker.py) reaches
+# the SSE streams held by every other process. Each process delivers its own events locally
+# right away and fans out the ones it receives from the bus through its own ring buffer.
+#
+#   local                  single process, no bus (default)
+#   postgresql://...       LISTEN/NOTIFY on the app database
+#   unix:///path/to.sock   socket hub: the process holding an flock on <path>.lock binds the
+#                          path and relays newline-delimited events between the others; a
+#                          peer takes over the lock (and the hub) when that process exits.
+#                          Each socket is written by its own SocketWriter thread, so lines never
+#                          interleave and a stalled process only holds up its own queue
+#
+# Messages on the wire are {"origin": <process token>, "user_id": u, "tray_number": t,
+# "data": <event>}: the origin lets a process skip its own events when the bus echoes them
+# back, the rest is the channel the local broadcaster delivers the event on.
+
+import fcntl
+import os
+import queue
+import select
+import socket
+import threading
+import time
+import uuid
+
+import fast_json
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:
+    psycopg2 = None
+
+CHANNEL = 'bsf_events'
+NOTIFY_MAX_BYTES = 7900  # PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+RECONNECT_SECONDS = 2
+SOCKET_QUEUE_LINES = 1000  # Events queued for one process before its connection is dropped
+
+
+class LocalEventBus:
+    """In-process bus: events only reach streams connected to this process."""
+
+    name = 'local'
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self.origin = uuid.uuid4().hex
+
+    def start(self):
+        return self
+
+    def publish(self, data, user_id=None, tray_number=None):
+        """Delivers data locally (and to other processes on a real bus). Returns the local sequence."""
+        return self.deliver(data, user_id, tray_number)
+
+    def message(self, data, user_id, tray_number):
+        return fast_json.dumps({'origin': self.origin, 'user_id': user_id, 'tray_number': tray_number, 'data': data})
+
+    def receive(self, raw):
+        """Delivers a message read from the bus unless this process sent it."""
+        try:
+            message = fast_json.loads(raw)
+        except ValueError:
+            print(f"⚠️ Dropped malformed event bus message: {raw[:80]!r}")
+            return
+        if message.get('origin') != self.origin:
+            self.deliver(message.get('data'), message.get('user_id'), message.get('tray_number'))
+
+    def stats(self):
+        return {'bus': self.name}
+
+
+class PostgresEventBus(LocalEventBus):
+    """LISTEN/NOTIFY on the app database (psycopg2)."""
+
+    name = 'postgresql'
+
+    def __init__(self, deliver, dsn):
+        super().__init__(deliver)
+        # libpq understands postgresql:// URLs but not SQLAlchemy's +driver suffix
+        self.dsn = dsn.replace('postgresql+psycopg2://', 'postgresql://', 1)
+        self.publish_connection = None
+        self.publish_lock = threading.Lock()
+        self.listening = False
+
+    def connect(self):
+        connection = psycopg2.connect(self.dsn)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return connection
+
+    def start(self):
+        threading.Thread(target=self.listen, name='event-bus-listener', daemon=True).start()
+        return self
+
+    def listen(self):
+        while True:
+            connection = None
+            try:
+                connection = self.connect()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                self.listening = True
+                print(f"📡 Event bus listening on PostgreSQL channel {CHANNEL}")
+                while True:
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.receive(connection.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"❌ Event bus listener error: {e}, reconnecting in {RECONNECT_SECONDS}s")
+            finally:
+                self.listening = False
+                if connection is not None:
+                    connection.close()
+            time.sleep(RECONNECT_SECONDS)
+
+    def publish(self, data, user_id=None, tray_number=None):
+        sequence = self.deliver(data, user_id, tray_number)
+        message = self.message(data, user_id, tray_number)
+        size = len(message.encode('utf-8'))
+        if size > NOTIFY_MAX_BYTES:
+            # Too big for NOTIFY: other processes get its scalar fields flagged `truncated`,
+            # which dashboards take as a cue to refetch what the rest would have carried
+            print(f"⚠️ Event bus: {data.get('type')} event is {size} bytes, over the NOTIFY limit; "
+                  f"sending a truncated stub")
+            stub = {key: value for key, value in data.items()
+                    if isinstance(value, (str, int, float, bool, type(None)))}
+            message = self.message({**stub, 'truncated': True}, user_id, tray_number)
+
+        with self.publish_lock:
+            for attempt in range(2):
+                try:
+                    if self.publish_connection is None or self.publish_connection.closed:
+                        self.publish_connection = self.connect()
+                    with self.publish_connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, message))
+                    break
+                except Exception as e:
+                    print(f"❌ Event bus publish error: {e}")
+                    if self.publish_connection is not None:
+                        self.publish_connection.close()
+                    self.publish_connection = None
+        return sequence
+
+    def stats(self):
+        return {'bus': self.name, 'channel': CHANNEL, 'listening': self.listening}
+
+
+class SocketWriter:
+    """Sends lines to one socket from its own thread, in the order they were queued."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.queue = queue.Queue(maxsize=SOCKET_QUEUE_LINES)
+        self.closed = False
+        threading.Thread(target=self.run, name='event-bus-writer', daemon=True).start()
+
+    def send(self, line):
+        """Queues a line. False once the socket is closed or its reader has fallen too far behind."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(line)
+            return True
+        except queue.Full:
+            print(f"⚠️ Event bus connection fell {SOCKET_QUEUE_LINES} events behind, dropping it")
+            self.close()
+            return False
+
+    def run(self):
+        while not self.closed:
+            line = self.queue.get()
+            if line is None:
+                break
+            try:
+                self.connection.sendall(line)
+            except OSError:
+                break
+        self.close()
+
+    def close(self):
+        """Stops the writer and shuts the socket down, which also ends the thread reading it."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass  # The writer sees `closed` after its current line
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class UnixSocketEventBus(LocalEventBus):
+    """Hub-and-spoke relay over a Unix domain socket shared by the processes on one host."""
+
+    name = 'unix'
+
+    def __init__(self, deliver, path):
+        super().__init__(deliver)
+        self.path = path
+        self.is_hub = False
+        self.peers = {}             # hub: socket -> SocketWriter of each connected process
+        self.hub = None             # peer: SocketWriter of the connection to the hub
+        self.lock_file = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.run, name='event-bus', daemon=True).start()
+        return self
+
+    def run(self):
+        while True:  # The hub keeps its lock for life, so only peers come round again
+            try:
+                if self.bind_hub():
+                    self.serve_hub()
+                else:
+                    self.join_hub()
+            except Exception as e:
+                print(f"❌ Event bus socket error: {e}, reconnecting in {RECONNECT_SECONDS}s")
+            time.sleep(RECONNECT_SECONDS)
+
+    def bind_hub(self):
+        """Becomes the hub unless another live process holds the hub lock."""
+        if self.lock_file is None:
+            self.lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        # The lock is released only when its holder exits, so any socket file left is stale
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(64)
+        self.server = server
+        return True
+
+    def serve_hub(self):
+        print(f"📡 Event bus hub listening on {self.path}")
+        self.is_hub = True
+        try:
+            while True:
+                connection, _ = self.server.accept()
+                with self.lock:
+                    self.peers[connection] = SocketWriter(connection)
+                threading.Thread(target=self.read_peer, args=(connection,), daemon=True).start()
+        finally:
+            self.is_hub = False
+            self.server.close()
+
+    def read_peer(self, connection):
+        """Hub: relays each line from one peer to every other peer and delivers it here."""
+        try:
+            for line in connection.makefile('rb'):
+                self.relay(line, exclude=connection)
+                self.receive(line)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                writer = self.peers.pop(connection, None)
+            if writer is not None:
+                writer.close()
+            connection.close()
+
+    def relay(self, line, exclude=None):
+        """Hub: queues the line for every peer; a peer whose queue is full is disconnected."""
+        with self.lock:
+            writers = [writer for peer, writer in self.peers.items() if peer is not exclude]
+        for writer in writers:
+            writer.send(line)  # read_peer forgets the peer once its socket is shut down
+
+    def join_hub(self):
+        hub = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        hub.connect(self.path)
+        print(f"📡 Event bus connected to hub at {self.path}")
+        writer = SocketWriter(hub)
+        with self.lock:
+            self.hub = writer
+        try:
+            for line in hub.makefile('rb'):
+                self.receive(line)
+        finally:
+            with self.lock:
+                self.hub = None
+            writer.close()
+            hub.close()
+        # The hub went away: loop round and try to take over
+
+    def publish(self, data, user_id=None, tray_number=None):
+        sequence = self.deliver(data, user_id, tray_number)
+        line = self.message(data, user_id, tray_number).encode('utf-8') + b'\n'
+        if self.is_hub:
+            self.relay(line)
+        else:
+            with self.lock:
+                hub = self.hub
+            if hub is None or not hub.send(line):
+                print("⚠️ Event bus hub unavailable, event delivered locally only")
+        return sequence
+
+    def stats(self):
+        with self.lock:
+            return {'bus': self.name, 'path': self.path, 'hub': self.is_hub,
+                    'peers': len(self.peers), 'connected': self.is_hub or self.hub is not None}
+
+
+def build_event_bus(deliver, url=None):
+    """Event bus for an EVENT_BUS_URL: unset/'local', a postgresql:// URL or unix:///path."""
+    if not url or url == 'local':
+        return LocalEventBus(deliver)
+    if url.startswith('unix://'):
+        return UnixSocketEventBus(deliver, url[len('unix://'):]).start()
+    if url.startswith(('postgres://', 'postgresql://', 'postgresql+psycopg2://')):
+        if psycopg2 is None:
+            raise RuntimeError("EVENT_BUS_URL is a PostgreSQL URL but psycopg2 is not installed")
+        return PostgresEventBus(deliver, url.replace('postgres://', 'postgresql://', 1)).start()
+    raise ValueError(f"Unsupported EVENT_BUS_URL: {url}")
@@ -0,0 +1,50 @@
+# event_coalescer.py - Merges bursts of live updates before they are broadcast
+#
+# add(key, item) queues an item and, if no flush is pending, schedules one `window` seconds
+# later. The flush callback gets every key queued in that window with all of its items, so a
+# burst of uploads to one tray turns into a single SSE event instead of one per upload.
+
+import threading
+
+
+class EventCoalescer:
+    """Collects items per key for `window` seconds, then hands them to flush({key: [items]})."""
+
+    def __init__(self, flush, window=1.0):
+        self.flush = flush
+        self.window = window
+        self.pending = {}
+        self.timer = None
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.items = 0
+
+    def add(self, key, item):
+        if self.window <= 0:
+            self.run({key: [item]})
+            return
+        with self.lock:
+            self.pending.setdefault(key, []).append(item)
+            self.items += 1
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush_pending)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush_pending(self):
+        with self.lock:
+            batches, self.pending, self.timer = self.pending, {}, None
+        if batches:
+            self.run(batches)
+
+    def run(self, batches):
+        self.flushes += 1
+        try:
+            self.flush(batches)
+        except Exception as e:
+            print(f"❌ Error flushing {len(batches)} coalesced updates: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {'window_seconds': self.window, 'pending_keys': len(self.pending),
+                    'items': self.items, 'flushes': self.flushes}
@@ -0,0 +1,111 @@
+# fast_json.py - App JSON provider with native NumPy and datetime serialization
+#
+# Uses orjson when it is installed and falls back to the stdlib json module otherwise.
+# Both backends write the same documents: compact, sorted keys, ISO datetimes, and NumPy
+# arrays/scalars as plain JSON numbers. Rounded defers float rounding to serialization,
+# where NumPy rounds the whole array at once instead of round() per value.
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class Rounded:
+    """Float values (array or list) written with at most `decimals` decimal places."""
+
+    __slots__ = ('values', 'decimals')
+
+    def __init__(self, values, decimals):
+        self.values = values
+        self.decimals = decimals
+
+    def array(self):
+        return np.round(np.asarray(self.values, dtype=np.float64), self.decimals)
+
+
+def default(value):
+    """Serializes the types neither backend handles on its own."""
+    if isinstance(value, Rounded):
+        return value.array()
+    if isinstance(value, np.ndarray):
+        # orjson only gets here for non-contiguous or unsupported dtypes
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_orjson(obj, sort_keys=True):
+    """UTF-8 JSON bytes via orjson."""
+    options = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else ORJSON_OPTIONS
+    return orjson.dumps(obj, default=default, option=options)
+
+
+def dumps_stdlib(obj, sort_keys=True, **kwargs):
+    """UTF-8 JSON bytes via the stdlib json module."""
+    kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False, **kwargs).encode('utf-8')
+
+
+def dumps_bytes(obj, sort_keys=True):
+    """UTF-8 JSON bytes with the fastest available backend."""
+    if ORJSON_AVAILABLE:
+        return dumps_orjson(obj, sort_keys)
+    return dumps_stdlib(obj, sort_keys)
+
+
+def dumps(obj, sort_keys=True):
+    """JSON text with the fastest available backend."""
+    return dumps_bytes(obj, sort_keys).decode('utf-8')
+
+
+def loads(s):
+    """Parses JSON text or bytes. Payloads orjson rejects (e.g. NaN) are retried with the stdlib."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(s)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by this module, used by jsonify, request.get_json and |tojson.
+    Calls with stdlib-only options (e.g. indent) go through the stdlib backend.
+    """
+
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if kwargs:
+            return dumps_stdlib(obj, sort_keys, **kwargs).decode('utf-8')
+        return dumps(obj, sort_keys)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand the encoded bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys), mimetype='application/json')
@@ -1,10 +1,27 @@
 # gunicorn.conf.py
+import os
+
 bind = "0.0.0.0:10000"
-workers = 1
+# More than one worker needs:
+#   SECRET_KEY          - the same session key in every worker
+#   EVENT_BUS_URL       - SSE events reach streams held by the other workers (see event_bus.py)
+#   RESPONSE_CACHE_DIR  - a response cache shared by the workers. The default cache is in memory,
+#                         per process, and an upload's version bump only invalidates the worker
+#                         that handled it, so the others would keep serving stale chart data
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
 threads = 2
 worker_class = "gthread"
 timeout = 120
 keepalive = 5
 max_requests = 1000
 max_requests_jitter = 50
-preload_app = False
\ No newline at end of file
+preload_app = False
+
+
+def on_starting(server):
+    # Checked here rather than above so a worker count given with -w on the command line counts too
+    if server.cfg.workers > 1 and not os.environ.get('RESPONSE_CACHE_DIR'):
+        raise RuntimeError(
+            f"{server.cfg.workers} workers need RESPONSE_CACHE_DIR set to a directory they share; "
+            "the in-memory response cache would serve stale data after uploads"
+        )
@@ -12,6 +12,7 @@ import base64
 #from camera_capture import capture_image
 import math
 from skimage.measure import perimeter
+import mask_codec
 import RPi.GPIO as GPIO
 import subprocess
 # --- Flat-Bug Model Imports ---
@@ -56,6 +57,13 @@ FLATBUG_DTYPE = "float32"
 # Calibration Factor (pixels per millimeter)
 PIXELS_PER_MM = 0.132
 
+# Detection mask encoding for uploads: "rle" (lossless) or "polygon" (simplified outlines)
+MASK_FORMAT = "rle"
+
+# Draw boxes and masks with prediction_results.plot() on the Pi as well. The server renders
+# overlays from the uploaded detections (/image/<id>/overlay), so this is only for local review.
+ANNOTATE_ON_DEVICE = False
+
 # =============================================================================
 def capture_image(DIR):
     if not os.path.exists(DIR):
@@ -247,17 +255,18 @@ def compute_and_aggregate_metrics(prediction_results, tray_number):
         print(f"Found {total_count} larvae in Tray {tray_number}.")
 
         # Save detection image locally (optional)
-        output_overview_path = os.path.join(OUTPUT_DETECTION_DIR, f"detected_{tray_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-        prediction_results.plot(
-            outpath=output_overview_path,
-            masks=True,
-            boxes=True,
-            confidence=True,
-            linewidth=2,
-            contour_color=(0, 255, 0),
-            box_color=(255, 0, 0)
-        )
-        print(f"Saved detection image to: {output_overview_path}")
+        if ANNOTATE_ON_DEVICE:
+            output_overview_path = os.path.join(OUTPUT_DETECTION_DIR, f"detected_{tray_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
+            prediction_results.plot(
+                outpath=output_overview_path,
+                masks=True,
+                boxes=True,
+                confidence=True,
+                linewidth=2,
+                contour_color=(0, 255, 0),
+                box_color=(255, 0, 0)
+            )
+            print(f"Saved detection image to: {output_overview_path}")
 
         # Calculate metrics
         for larva_id in range(total_count):
@@ -334,6 +343,7 @@ def upload_image_to_api(image_path, tray_number, count, avg_length, avg_weight,
         # Resize if too large (same as your main app)
         max_dimension = 1200
         height, width = img_rgb.shape[:2]
+        detection_frame = [height, width]  # The boxes are in this frame, not the resized upload's
         
         if max(height, width) > max_dimension:
             scale = max_dimension / max(height, width)
@@ -367,7 +377,8 @@ def upload_image_to_api(image_path, tray_number, count, avg_length, avg_weight,
             'avg_length': avg_length,
             'avg_weight': avg_weight,
             'bounding_boxes': json.dumps(bounding_boxes) if bounding_boxes else "[]",
-            'masks': json.dumps(masks) if masks else "[]"
+            'masks': json.dumps(masks) if masks else "[]",
+            'detection_frame': detection_frame
         }
         
         print(f"Uploading image for Tray {tray_number} to API...")
@@ -444,8 +455,8 @@ def upload_image_to_api_with_retry(image_path, tray_number, count, avg_length, a
     return False
 
 # NEW: Extract bounding boxes and masks with limit
-def extract_detection_data(prediction_results, max_detections=50):
-    """Extracts bounding boxes and masks from prediction results for API upload, with limit to avoid oversized payloads."""
+def extract_detection_data(prediction_results, max_detections=50, mask_format=MASK_FORMAT):
+    """Extracts bounding boxes and encoded masks (see mask_codec) from prediction results for API upload, with limit to avoid oversized payloads."""
     bounding_boxes = []
     masks = []
     
@@ -463,7 +474,7 @@ def extract_detection_data(prediction_results, max_detections=50):
             if hasattr(prediction_results, 'masks') and prediction_results.masks is not None and len(prediction_results.masks) > larva_id:
                 larva_mask_object = prediction_results.masks[larva_id]
                 mask = larva_mask_object.data.cpu().numpy().astype(np.uint8)
-                masks.append(mask.tolist())
+                masks.append(mask_codec.encode_mask(mask, mask_format))
     
     return bounding_boxes, masks
 
@@ -0,0 +1,43 @@
+# json_stream.py - Incremental JSON writing for streamed (chunked) responses
+#
+# Generators yield the document piece by piece, so a response over a large result set
+# only ever holds one chunk of rows in memory instead of the whole payload.
+
+from flask import Response, stream_with_context
+
+import fast_json
+
+
+def dumps(value):
+    """Compact JSON for one value of a streamed document (NumPy arrays and Rounded allowed)."""
+    return fast_json.dumps(value)
+
+
+def key(name):
+    """JSON object key followed by its colon."""
+    return dumps(str(name)) + ':'
+
+
+class ArrayWriter:
+    """Writes the items of one JSON array across several chunks."""
+
+    def __init__(self):
+        self.empty = True
+
+    def items(self, values):
+        """Comma-separated JSON items for the next chunk of the array (no brackets)."""
+        if len(values) == 0:
+            return ''
+        body = dumps(values)[1:-1]
+        if self.empty:
+            self.empty = False
+            return body
+        return ',' + body
+
+
+def streamed_json(generator):
+    """
+    Wraps a generator of JSON text in a streamed response.
+    The request context stays open while it runs, so it can use db.session and current_user.
+    """
+    return Response(stream_with_context(generator), mimetype='application/json')
@@ -0,0 +1,240 @@
+# mask_codec.py - Compact encodings for detection masks
+#
+# The edge used to upload every mask as mask.tolist(): a full-frame grid of 0/1 as JSON, about
+# 2 bytes per pixel and megabytes per capture. Masks are now encoded once on the edge and stored
+# as sent:
+#
+#   rle      {"size": [h, w], "counts": "..."} - COCO run-length encoding (column-major runs,
+#            starting with background, packed into the compact COCO string). Lossless.
+#   polygon  {"size": [h, w], "polygons": [[x0, y0, x1, y1, ...], ...]} - outer contours
+#            simplified to `tolerance` pixels. Lossy, and for larva-sized blobs no smaller than
+#            RLE (bench_mask_codec.py), but cheaper to encode and ready to draw as an outline.
+#            Encoding needs OpenCV (as the edge has); decoding only needs Pillow.
+#
+# decode_mask() also accepts the old nested lists, and compact_masks() turns uploads from edges
+# that still send those into RLE before they are stored. Nothing is decoded on upload otherwise:
+# masks stay encoded in ImageFile.masks until an overlay asks for them.
+
+import json
+
+import numpy as np
+
+MASK_FORMATS = ('rle', 'polygon')
+POLYGON_TOLERANCE = 1.0  # Max distance (px) of the simplified outline from the mask edge
+MAX_FRAME_PIXELS = 50_000_000  # Larger declared frames are rejected on upload
+
+
+def as_2d(mask):
+    """The mask as a 2-D array; drops the leading 1-sized axis model outputs have."""
+    mask = np.asarray(mask)
+    if mask.ndim > 2:
+        mask = mask.reshape(mask.shape[-2:])
+    return mask
+
+
+def run_lengths(mask):
+    """Column-major run lengths of a mask, starting with a (possibly empty) background run."""
+    flat = as_2d(mask).ravel(order='F') != 0
+    if not flat.size:
+        return []
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], edges, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.tolist()
+
+
+def counts_to_string(counts):
+    """COCO's compact RLE string: each count as a delta to the one two back, 5 bits per char."""
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return ''.join(chars)
+
+
+def string_to_counts(s):
+    counts = []
+    p = 0
+    while p < len(s):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1f) << 5 * k
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << 5 * k
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def encode_rle(mask):
+    mask = as_2d(mask)
+    return {'size': list(mask.shape), 'counts': counts_to_string(run_lengths(mask))}
+
+
+def decode_rle(rle):
+    height, width = rle['size']
+    counts = rle['counts']
+    if isinstance(counts, str):
+        counts = string_to_counts(counts)
+    values = np.arange(len(counts), dtype=np.uint8) & 1
+    return np.repeat(values, counts).reshape((height, width), order='F')
+
+
+def encode_polygon(mask, tolerance=POLYGON_TOLERANCE):
+    import cv2  # The edge has OpenCV; the server only ever decodes polygons
+
+    mask = as_2d(mask)
+    contours, _ = cv2.findContours((mask != 0).astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    polygons = []
+    for contour in contours:
+        contour = cv2.approxPolyDP(contour, tolerance, True)
+        if len(contour) >= 3:
+            polygons.append(contour.reshape(-1).tolist())
+    return {'size': list(mask.shape), 'polygons': polygons}
+
+
+def decode_polygon(polygon):
+    from PIL import Image, ImageDraw
+
+    height, width = polygon['size']
+    canvas = Image.new('L', (width, height), 0)
+    draw = ImageDraw.Draw(canvas)
+    for points in polygon['polygons']:
+        draw.polygon(points, fill=1, outline=1)
+    return np.asarray(canvas, dtype=np.uint8)
+
+
+def encode_mask(mask, fmt='rle', tolerance=POLYGON_TOLERANCE):
+    if fmt == 'rle':
+        return encode_rle(mask)
+    if fmt == 'polygon':
+        return encode_polygon(mask, tolerance)
+    raise ValueError(f"Unknown mask format {fmt!r}; use one of {MASK_FORMATS}")
+
+
+def decode_mask(encoded):
+    """A uint8 0/1 array from any stored form: RLE, polygon or the old nested list."""
+    if isinstance(encoded, dict):
+        if 'counts' in encoded:
+            return decode_rle(encoded)
+        if 'polygons' in encoded:
+            return decode_polygon(encoded)
+        raise ValueError(f"Unrecognised mask encoding with keys {sorted(encoded)}")
+    return (as_2d(np.asarray(encoded, dtype=np.uint8)) != 0).astype(np.uint8)
+
+
+def mask_region(encoded):
+    """
+    (top, left, crop): the mask's bounding region in its frame as a uint8 0/1 array, without
+    building the full frame for RLE or polygons. None if the mask is empty.
+    """
+    if isinstance(encoded, dict) and 'counts' in encoded:
+        height = encoded['size'][0]
+        counts = encoded['counts']
+        counts = np.asarray(string_to_counts(counts) if isinstance(counts, str) else counts, dtype=np.int64)
+        ends = np.cumsum(counts)
+        starts, ends = (ends - counts)[1::2], ends[1::2]  # Foreground runs
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if not len(starts) or not height:
+            return None
+        # Only the columns the runs touch are decoded
+        left, right = starts[0] // height, (ends[-1] - 1) // height
+        base = left * height
+        delta = np.zeros((right - left + 1) * height + 1, dtype=np.int32)
+        np.add.at(delta, starts - base, 1)
+        np.add.at(delta, ends - base, -1)
+        columns = (np.cumsum(delta[:-1]) > 0).astype(np.uint8).reshape((height, -1), order='F')
+        rows = np.flatnonzero(columns.any(axis=1))
+        return int(rows[0]), int(left), columns[rows[0]:rows[-1] + 1]
+
+    if isinstance(encoded, dict) and 'polygons' in encoded:
+        from PIL import Image, ImageDraw
+
+        points = [np.asarray(polygon, dtype=np.int64).reshape(-1, 2) for polygon in encoded['polygons'] if polygon]
+        if not points:
+            return None
+        corners = np.concatenate(points)
+        left, top = corners.min(axis=0)
+        right, bottom = corners.max(axis=0)
+        canvas = Image.new('L', (int(right - left) + 1, int(bottom - top) + 1), 0)
+        draw = ImageDraw.Draw(canvas)
+        for polygon in points:
+            draw.polygon((polygon - (left, top)).reshape(-1).tolist(), fill=1, outline=1)
+        return int(top), int(left), np.asarray(canvas, dtype=np.uint8)
+
+    mask = decode_mask(encoded)
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+    return int(rows[0]), int(cols[0]), mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def decode_masks(stored):
+    """Every mask of an ImageFile.masks value (JSON text or an already parsed list)."""
+    if not stored:
+        return []
+    if isinstance(stored, str):
+        stored = json.loads(stored)
+    return [decode_mask(encoded) for encoded in stored]
+
+
+def compact_masks(masks):
+    """
+    Masks as uploaded (JSON text or a list) -> JSON text to store, or None if there are none.
+    Encoded masks are kept as they are; old nested lists are re-encoded as RLE.
+    """
+    if not masks:
+        return None
+    if isinstance(masks, str):
+        masks = json.loads(masks)
+        if not masks:
+            return None
+    return json.dumps([checked(encoded) if isinstance(encoded, dict) else encode_rle(decode_mask(encoded))
+                       for encoded in masks], separators=(',', ':'))
+
+
+def checked(encoded):
+    """An uploaded RLE or polygon mask, if it is well formed; raises ValueError otherwise."""
+    size = encoded.get('size')
+    if not (isinstance(size, list) and len(size) == 2 and all(isinstance(n, int) and n >= 0 for n in size)):
+        raise ValueError("Mask size must be [height, width]")
+    if size[0] * size[1] > MAX_FRAME_PIXELS:
+        raise ValueError("Mask frame is too large")
+    if isinstance(encoded.get('counts'), str):
+        # Decoding sizes arrays by these runs, so they must tile the frame exactly
+        try:
+            counts = string_to_counts(encoded['counts'])
+        except IndexError:
+            raise ValueError("Mask RLE counts are truncated") from None
+        if any(n < 0 for n in counts):
+            raise ValueError("Mask RLE counts must not be negative")
+        if sum(counts) != size[0] * size[1]:
+            raise ValueError("Mask RLE counts must add up to height * width")
+        return encoded
+    if isinstance(encoded.get('polygons'), list):
+        for polygon in encoded['polygons']:
+            if not (isinstance(polygon, list) and len(polygon) % 2 == 0
+                    and all(isinstance(v, (int, float)) for v in polygon)):
+                raise ValueError("Mask polygons must be flat [x0, y0, x1, y1, ...] lists")
+            xs, ys = polygon[0::2], polygon[1::2]
+            if xs and (min(xs) < 0 or min(ys) < 0 or max(xs) > size[1] or max(ys) > size[0]):
+                raise ValueError("Mask polygon lies outside its frame")
+        return encoded
+    raise ValueError("Mask must have RLE 'counts' or 'polygons'")
@@ -0,0 +1,278 @@
+# metrics_engine.py - Vectorized aggregation shared by the dashboard read endpoints
+
+import numpy as np
+
+# Weight distribution bins: [0.08, 0.10), [0.10, 0.12), ... [0.18, 0.20), then 0.20+
+WEIGHT_BIN_EDGES = (0.08, 0.10, 0.12, 0.14, 0.16, 0.18, 0.20)
+WEIGHT_BIN_DECIMALS = 2
+
+METRIC_NAMES = ('length', 'width', 'area', 'weight')
+
+# Growth-rate regressions use days since a fixed epoch, so per-day sufficient statistics
+# (n, Σt, Σw, Σt², Σtw, Σw²) from different days can simply be added together
+GROWTH_EPOCH = np.datetime64('2025-01-01T00:00:00', 'us')
+GROWTH_SUM_NAMES = ('n', 'sum_t', 'sum_w', 'sum_tt', 'sum_tw', 'sum_ww')
+
+# Growth chart bucketing. Rows closer together than CAPTURE_GAP_SECONDS belong to one
+# capture: older uploads stamped every larva separately, microseconds apart.
+GROWTH_BUCKETS = ('capture', 'hour', 'day')
+CAPTURE_GAP_SECONDS = 1
+
+
+# Rows fetched per round trip when reading through a server-side cursor
+CHUNK_SIZE = 5000
+
+
+def rows_to_columns(keys, rows):
+    """Converts a list of row tuples to NumPy column arrays keyed by column label."""
+    if not rows:
+        return {key: np.empty(0) for key in keys}
+
+    columns = {}
+    for key, values in zip(keys, zip(*rows)):
+        if hasattr(values[0], 'isoformat'):
+            if getattr(values[0], 'tzinfo', None) is not None:
+                # Drop tzinfo so NumPy can store the values as datetime64
+                values = [v.replace(tzinfo=None) for v in values]
+            columns[key] = np.array(values, dtype='datetime64[us]')
+        else:
+            columns[key] = np.asarray(values, dtype=np.float64)
+    return columns
+
+
+def iter_column_chunks(session, statement, chunk_size=CHUNK_SIZE):
+    """
+    Executes a Core select through a server-side cursor (yield_per) and yields the rows
+    chunk_size at a time as column arrays. Only one chunk of row tuples is alive at once.
+    """
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    keys = list(result.keys())
+    for rows in result.partitions():
+        yield rows_to_columns(keys, rows)
+
+
+def load_columns(session, statement, chunk_size=CHUNK_SIZE):
+    """
+    Executes a Core select and returns each selected column as a NumPy array keyed by its label.
+    Rows are read in chunks and come back as plain tuples, so no ORM entities are built and
+    the full result never exists as Python objects.
+    """
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    keys = list(result.keys())
+    chunks = [rows_to_columns(keys, rows) for rows in result.partitions()]
+    if not chunks:
+        return rows_to_columns(keys, [])
+    if len(chunks) == 1:
+        return chunks[0]
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def to_datetime(value):
+    """Converts a NumPy datetime64 back to a Python datetime."""
+    return value.astype('datetime64[us]').item()
+
+
+def column_means(columns, names=METRIC_NAMES):
+    """Mean of each named column (0 when there are no rows)."""
+    return {
+        name: float(columns[name].mean()) if len(columns[name]) else 0.0
+        for name in names
+    }
+
+
+def group_starts(keys):
+    """
+    Start offset of each run of equal keys.
+    Keys must already be sorted (the queries order by them).
+    """
+    _, starts = np.unique(keys, return_index=True)
+    return starts
+
+
+def group_slices(keys):
+    """(start, end) offsets of each run of equal (sorted) keys."""
+    starts = group_starts(keys)
+    ends = np.append(starts[1:], len(keys))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def group_by_key(keys, columns, mean_names=(), sum_names=()):
+    """
+    Groups rows by a sorted key column (e.g. capture timestamp) with np.add.reduceat.
+    Returns the unique keys, rows per group, and per-group means/sums of the named columns.
+    """
+    if len(keys) == 0:
+        grouped = {'key': keys, 'start': np.empty(0, dtype=np.int64), 'rows': np.empty(0, dtype=np.int64)}
+        grouped.update({name: np.empty(0) for name in (*mean_names, *sum_names)})
+        return grouped
+
+    starts = group_starts(keys)
+    rows = np.diff(np.append(starts, len(keys)))
+
+    grouped = {'key': keys[starts], 'start': starts, 'rows': rows}
+    for name in mean_names:
+        grouped[name] = np.add.reduceat(columns[name], starts) / rows
+    for name in sum_names:
+        grouped[name] = np.add.reduceat(columns[name], starts)
+    return grouped
+
+
+def last_per_group(keys):
+    """Index of the last row of each run of equal (sorted) keys."""
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.append(np.flatnonzero(keys[1:] != keys[:-1]), len(keys) - 1)
+
+
+def bucket_keys(timestamps, bucket='capture'):
+    """
+    Sorted grouping key per row: a capture number (split where the gap between rows
+    exceeds CAPTURE_GAP_SECONDS), or the timestamp floored to the hour/day.
+    """
+    if bucket == 'hour':
+        return timestamps.astype('datetime64[h]')
+    if bucket == 'day':
+        return timestamps.astype('datetime64[D]')
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.int64)
+    gaps = np.diff(timestamps) > np.timedelta64(CAPTURE_GAP_SECONDS, 's')
+    return np.concatenate(([0], np.cumsum(gaps)))
+
+
+def growth_series(columns, start_time, mean_names, bucket='capture', max_points=None, shape_name='weight'):
+    """
+    Growth points for one tray: per-bucket means of mean_names, with x in hours since start_time.
+    When there are more than max_points buckets, LTTB keeps the points that preserve the
+    shape of the shape_name series and the same points are taken from every other series.
+    Returns (hours, {name: values}).
+    """
+    timestamps = columns['timestamp']
+    grouped = group_by_key(bucket_keys(timestamps, bucket), columns, mean_names=mean_names)
+
+    # Each bucket is placed at its first row, so hour/day buckets never fall before start_time
+    hours = hours_since(timestamps[grouped['start']], start_time)
+
+    series = {name: grouped[name] for name in mean_names}
+    if max_points and len(hours) > max_points:
+        keep = lttb_indices(hours, series[shape_name], max_points)
+        hours = hours[keep]
+        series = {name: values[keep] for name, values in series.items()}
+    return hours, series
+
+
+def latest_capture(columns, mean_names=METRIC_NAMES):
+    """Means (and summed count) of the most recent capture in a tray's columns."""
+    keys = bucket_keys(columns['timestamp'], 'capture')
+    last = slice(int(np.searchsorted(keys, keys[-1])), len(keys))
+    latest = {name: float(columns[name][last].mean()) for name in mean_names}
+    latest['count'] = int(columns['count'][last].sum())
+    return latest
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of at most max_points
+    points that keep the visual shape of y(x). First and last points are always kept.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max_points])
+
+    # Interior points are split into max_points - 2 buckets; one point is picked from each
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, (edges[i + 2] if i + 2 < len(edges) else n)
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def hours_since(timestamps, start):
+    """Hours elapsed from start for an array of datetime64 values."""
+    return (timestamps - start) / np.timedelta64(1, 'h')
+
+
+def days_since_epoch(timestamps):
+    """Days (fractional) from GROWTH_EPOCH for datetime64 values."""
+    return (np.asarray(timestamps, dtype='datetime64[us]') - GROWTH_EPOCH) / np.timedelta64(1, 'D')
+
+
+def growth_sums(t, weights, counts=None):
+    """Sufficient statistics of weight-over-time samples, each weighted by its count."""
+    t = np.broadcast_to(np.asarray(t, dtype=np.float64), np.shape(weights))
+    w = np.asarray(weights, dtype=np.float64)
+    c = np.ones_like(w) if counts is None else np.asarray(counts, dtype=np.float64)
+    return {
+        'n': float(c.sum()),
+        'sum_t': float((c * t).sum()),
+        'sum_w': float((c * w).sum()),
+        'sum_tt': float((c * t * t).sum()),
+        'sum_tw': float((c * t * w).sum()),
+        'sum_ww': float((c * w * w).sum()),
+    }
+
+
+def linear_fit(sums):
+    """
+    Least-squares weight = intercept + slope * t from growth_sums-style totals, in O(1).
+    Returns None when there are fewer than two distinct sample times.
+    """
+    n = sums['n']
+    if n < 2:
+        return None
+    s_tt = sums['sum_tt'] - sums['sum_t'] ** 2 / n
+    if s_tt <= 1e-9 * max(sums['sum_tt'], 1.0):
+        return None
+    s_tw = sums['sum_tw'] - sums['sum_t'] * sums['sum_w'] / n
+    s_ww = sums['sum_ww'] - sums['sum_w'] ** 2 / n
+
+    slope = s_tw / s_tt
+    intercept = (sums['sum_w'] - slope * sums['sum_t']) / n
+    r2 = s_tw ** 2 / (s_tt * s_ww) if s_ww > 0 else 1.0
+    return {'slope': slope, 'intercept': intercept, 'r2': min(r2, 1.0)}
+
+
+def day_numbers(timestamps):
+    """1-based calendar day of each timestamp, counted from the first one."""
+    days = timestamps.astype('datetime64[D]')
+    return (days - days[0]).astype(np.int64) + 1
+
+
+def histogram(values, edges=WEIGHT_BIN_EDGES, decimals=WEIGHT_BIN_DECIMALS):
+    """
+    Counts values into [edge_i, edge_i+1) bins plus an open-ended last bin (edge_n+).
+    Values below the first edge are not counted.
+    Returns (labels, counts) ready for the weightDistribution payload.
+    """
+    bins = np.append(np.asarray(edges, dtype=np.float64), np.inf)
+    counts, _ = np.histogram(values, bins=bins)
+    return histogram_labels(edges, decimals), counts.tolist()
+
+
+def histogram_labels(edges, decimals=WEIGHT_BIN_DECIMALS):
+    """Labels like '0.08-0.10' ... '0.20+' for the given bin edges."""
+    labels = [f"{lo:.{decimals}f}-{hi:.{decimals}f}" for lo, hi in zip(edges[:-1], edges[1:])]
+    labels.append(f"{edges[-1]:.{decimals}f}+")
+    return labels
+
+
+def rounded(values, decimals):
+    """Rounds a NumPy array and returns a plain list for jsonify."""
+    return np.round(values, decimals).tolist()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the larvae_data indexes added after the initial schema:
+  idx_larvae_user_tray_ts - covering (user_id, tray_number, timestamp) index used by the
+                            latest-capture-per-tray lookup on the compare page
+  idx_larvae_user_ts_id   - (user_id, timestamp, id) keyset order for /api/export
+db.create_all() only creates indexes for new tables, so existing databases need this once.
+"""
+from BSFwebdashboard import app, db, LarvaeData
+
+INDEX_NAMES = ('idx_larvae_user_tray_ts', 'idx_larvae_user_ts_id')
+
+def migrate():
+    with app.app_context():
+        print("🚀 Starting migration: Adding indexes to larvae_data...")
+
+        for index in LarvaeData.__table__.indexes:
+            if index.name not in INDEX_NAMES:
+                continue
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✅ Index {index.name} is in place")
+            except Exception as e:
+                print(f"❌ Migration error: {e}")
+                raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the detection_frame column to image_files: the "[height, width]" of
+the capture the boxes were detected in. The edge shrinks uploads to 1200 px, so overlays of
+images with boxes but no masks need it to scale the boxes onto the stored image.
+Images uploaded before this keep NULL and are drawn as before.
+"""
+from BSFwebdashboard import app, db
+from sqlalchemy import inspect, text
+
+def migrate():
+    with app.app_context():
+        print("🚀 Starting migration: Adding detection_frame to image_files...")
+
+        try:
+            columns = [column['name'] for column in inspect(db.engine).get_columns('image_files')]
+            if 'detection_frame' in columns:
+                print("⚠️ detection_frame already exists in image_files")
+            else:
+                with db.engine.begin() as conn:
+                    conn.execute(text("ALTER TABLE image_files ADD COLUMN detection_frame VARCHAR(32)"))
+                print("✅ Added detection_frame to image_files")
+        except Exception as e:
+            print(f"❌ Migration error: {e}")
+            raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
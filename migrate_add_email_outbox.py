@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the email_outbox table (with its idx_email_outbox_due index) that
+verification emails are queued in and email_outbox.OutboxWorker delivers from.
+The app never runs db.create_all() under gunicorn, so existing databases need this once;
+until then queueing fails and users are shown their verification code instead.
+"""
+from BSFwebdashboard import app, db, EmailOutbox
+
+def migrate():
+    with app.app_context():
+        print("🚀 Starting migration: Adding email_outbox table...")
+
+        try:
+            EmailOutbox.__table__.create(bind=db.engine, checkfirst=True)
+            print("✅ Table email_outbox is in place")
+        except Exception as e:
+            print(f"❌ Migration error: {e}")
+            raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the image_files indexes behind the paginated /api/images gallery:
+  idx_image_user_tray_ts_id - (user_id, tray_number, timestamp, id) keyset order for one tray
+  idx_image_user_ts_id      - (user_id, timestamp, id) keyset order across all trays
+db.create_all() only creates indexes for new tables, so existing databases need this once.
+"""
+from BSFwebdashboard import app, db, ImageFile
+
+INDEX_NAMES = ('idx_image_user_tray_ts_id', 'idx_image_user_ts_id')
+
+def migrate():
+    with app.app_context():
+        print("🚀 Starting migration: Adding gallery indexes to image_files...")
+
+        for index in ImageFile.__table__.indexes:
+            if index.name not in INDEX_NAMES:
+                continue
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✅ Index {index.name} is in place")
+            except Exception as e:
+                print(f"❌ Migration error: {e}")
+                raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
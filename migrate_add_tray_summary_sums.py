@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the running sums to tray_summary (larvae_rows, sum_length, sum_width,
+sum_area, sum_weight) that the combined metrics are computed from, then fill them by
+rebuilding the summaries from larvae_data.
+"""
+from BSFwebdashboard import app, db, rebuild_tray_summaries
+from sqlalchemy import inspect, text
+
+NEW_COLUMNS = {
+    'larvae_rows': 'INTEGER',
+    'sum_length': 'FLOAT',
+    'sum_width': 'FLOAT',
+    'sum_area': 'FLOAT',
+    'sum_weight': 'FLOAT',
+}
+
+def migrate():
+    with app.app_context():
+        print("🚀 Starting migration: Adding running sums to tray_summary...")
+
+        try:
+            columns = [column['name'] for column in inspect(db.engine).get_columns('tray_summary')]
+            with db.engine.begin() as conn:
+                for name, sql_type in NEW_COLUMNS.items():
+                    if name in columns:
+                        print(f"⚠️ {name} already exists in tray_summary")
+                        continue
+                    conn.execute(text(f"ALTER TABLE tray_summary ADD COLUMN {name} {sql_type} DEFAULT 0 NOT NULL"))
+                    print(f"✅ Added {name} to tray_summary")
+
+            tray_count = rebuild_tray_summaries()
+            print(f"✅ Rebuilt summaries for {tray_count} trays")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration error: {e}")
+            raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
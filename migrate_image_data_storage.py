@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Migration script (PostgreSQL only) to store image_files.image_data out of line without
+compression (STORAGE EXTERNAL). /image/<id> streams images with substr(); on an uncompressed
+TOAST value PostgreSQL fetches only the chunks a substr() covers, while a compressed one has
+to be decompressed from the start for every chunk. JPEGs barely compress, so nothing is lost.
+Applies to images stored from now on; existing rows keep their current storage.
+"""
+from BSFwebdashboard import app, db
+
+def migrate():
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("ℹ️ Not a PostgreSQL database; nothing to do")
+            return
+
+        print("🚀 Starting migration: image_files.image_data -> STORAGE EXTERNAL...")
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(db.text("ALTER TABLE image_files ALTER COLUMN image_data SET STORAGE EXTERNAL"))
+            print("✅ image_data is stored uncompressed out of line")
+        except Exception as e:
+            print(f"❌ Migration error: {e}")
+            raise
+
+        print("\n🎉 Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
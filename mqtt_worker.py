@@ -8,6 +8,8 @@ from PIL import Image
 from io import BytesIO
 from datetime import datetime, timezone
 
+import mask_codec
+
 # Import from your main app
 from BSFwebdashboard import app, db, LarvaeData, ImageFile
 
@@ -94,7 +96,7 @@ def on_message(client, userdata, msg):
                         avg_weight=data.get('avg_weight'),
                         count=data.get('count'),
                         bounding_boxes=json.dumps(bounding_boxes) if bounding_boxes else None,
-                        masks=json.dumps(masks) if masks else None,
+                        masks=mask_codec.compact_masks(masks),
                         timestamp=datetime.now(timezone.utc)
                     )
                     db.session.add(new_image_file)
@@ -104,6 +106,9 @@ def on_message(client, userdata, msg):
                 db.session.commit()
                 print(f"✅ Data successfully saved to PostgreSQL for Tray {tray_number}")
 
+                # No SSE event: MQTT messages don't say which user they belong to, and streams
+                # are scoped per user, so there is no channel to publish them on
+
             except Exception as e:
                 db.session.rollback()
                 print(f"❌ Database error: {e}")
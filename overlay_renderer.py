@@ -0,0 +1,185 @@
+# overlay_renderer.py - Detection overlays drawn on the server, on request
+#
+# The edge used to draw boxes and masks with prediction_results.plot() on every capture and
+# upload the annotated picture. It now uploads the original with the encoded detections, and
+# render_overlay() draws them onto it here when a dashboard asks: boxes in the detection frame
+# (the masks' "size", else the uploaded detection_frame; the stored image's own frame only for
+# older uploads that have neither, since the edge shrinks uploads to 1200 px), masks decoded
+# only within their bounding region (mask_codec.mask_region) and scaled to the output size.
+#
+# OverlayRenderer runs renders in a bounded thread pool - Pillow releases the GIL while it
+# decodes, resizes, filters and encodes - caches the JPEG by (image, style, size) and shares
+# one render between concurrent requests for the same overlay.
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageOps
+
+import mask_codec
+
+OVERLAY_STYLES = {
+    'default': {'boxes': True, 'fill': True, 'outline': True},
+    'masks': {'boxes': False, 'fill': True, 'outline': True},
+    'outline': {'boxes': False, 'fill': False, 'outline': True},
+    'boxes': {'boxes': True, 'fill': False, 'outline': False},
+}
+STYLE_DEFAULTS = {
+    'box_color': (255, 0, 0),
+    'mask_color': (0, 255, 0),
+    'fill_alpha': 0.35,
+    'line_width': 2,
+}
+OVERLAY_SIZES = (0, 320, 640, 1280)  # Longest side in px; 0 keeps the stored image's size
+JPEG_QUALITY = 85
+
+
+def output_size(width, height, size):
+    if not size or max(width, height) <= size:
+        return width, height
+    scale = size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def mask_layers(masks, frame, out_size, line_width):
+    """
+    Two 'L' layers at out_size: the masks (255 inside, soft at the scaled edges) and their
+    outlines, `line_width` px wide. Both are built piece by piece, so the cost follows the
+    masks' area rather than the image's.
+    """
+    layer = Image.new('L', out_size, 0)
+    outlines = Image.new('L', out_size, 0)
+    pad = line_width + 1
+    thicken = ImageFilter.MaxFilter(2 * (line_width // 2) + 1) if line_width > 1 else None
+    frame_height, frame_width = frame
+    sx, sy = out_size[0] / frame_width, out_size[1] / frame_height
+    for encoded in masks:
+        region = mask_codec.mask_region(encoded)
+        if region is None:
+            continue
+        top, left, crop = region
+        x0, y0 = int(left * sx), int(top * sy)
+        width = max(1, round(crop.shape[1] * sx))
+        height = max(1, round(crop.shape[0] * sy))
+        piece = Image.fromarray(crop * 255).resize((width, height), Image.BILINEAR)
+        box = (x0, y0, x0 + width, y0 + height)
+        layer.paste(ImageChops.lighter(layer.crop(box), piece), box)
+
+        # Padded so the outline survives where the mask touches its crop
+        edges = ImageOps.expand(piece, border=pad, fill=0).point(lambda v: 255 if v >= 128 else 0)
+        edges = edges.filter(ImageFilter.FIND_EDGES)
+        if thicken:
+            edges = edges.filter(thicken)
+        box = (x0 - pad, y0 - pad, x0 + width + pad, y0 + height + pad)
+        outlines.paste(ImageChops.lighter(outlines.crop(box), edges), box)
+    return layer, outlines
+
+
+def render_overlay(image_bytes, boxes_json, masks_json, frame_json=None, style='default', size=0):
+    """
+    JPEG bytes of the stored image with its boxes and masks drawn on in `style`, at `size`.
+    frame_json is the "[height, width]" the detections were made in, when the upload said.
+    """
+    options = {**STYLE_DEFAULTS, **OVERLAY_STYLES[style]}
+    image = Image.open(BytesIO(image_bytes))
+    image.draft('RGB', output_size(*image.size, size))  # Lets JPEG decode at a reduced scale
+    image = image.convert('RGB')
+    out_size = output_size(*image.size, size)
+    if image.size != out_size:
+        image = image.resize(out_size, Image.LANCZOS)
+
+    masks = json.loads(masks_json) if masks_json else []
+    boxes = json.loads(boxes_json) if boxes_json else []
+    frame = masks[0]['size'] if masks and isinstance(masks[0], dict) else None
+    if frame is None and masks:
+        frame = mask_codec.as_2d(masks[0]).shape
+    if frame is None and frame_json:
+        frame = json.loads(frame_json)
+
+    line_width = options['line_width']
+    if masks and (options['fill'] or options['outline']):
+        layer, outlines = mask_layers(masks, frame, out_size, line_width)
+        color = Image.new('RGB', out_size, options['mask_color'])
+        if options['fill']:
+            image = Image.composite(color, image, layer.point(lambda v: int(v * options['fill_alpha'])))
+        if options['outline']:
+            image = Image.composite(color, image, outlines)
+
+    if boxes and options['boxes']:
+        # Without a frame (older uploads) the boxes can only be taken as the stored image's
+        frame_height, frame_width = frame or (image.height, image.width)
+        sx, sy = out_size[0] / frame_width, out_size[1] / frame_height
+        draw = ImageDraw.Draw(image)
+        for x1, y1, x2, y2 in (box[:4] for box in boxes):
+            draw.rectangle((min(x1, x2) * sx, min(y1, y2) * sy, max(x1, x2) * sx, max(y1, y2) * sy),
+                           outline=options['box_color'], width=line_width)
+
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=JPEG_QUALITY)
+    return output.getvalue()
+
+
+class OverlayRenderer:
+    """Renders overlays in a worker pool, once per (image, style, size), through a response cache."""
+
+    def __init__(self, cache, workers=2):
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='overlay')
+        self.workers = workers
+        self.in_flight = {}  # key -> Future of the render
+        self.lock = threading.Lock()
+        self.renders = 0
+        self.shared = 0
+
+    @staticmethod
+    def key(image_id, style, size):
+        return f"overlay|{image_id}|{style}|{size}"
+
+    def get(self, image_id, style, size, load):
+        """
+        JPEG bytes of the overlay, or None when load() finds no image. load() is only called
+        on a cache miss, in the caller's thread (it needs the app context), and returns
+        (image_bytes, boxes_json, masks_json, frame_json) or None.
+        """
+        key = self.key(image_id, style, size)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[1]
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+        if future is not None:
+            return future.result()
+
+        row = load()
+        if row is None:
+            return None
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is None:
+                future = self.pool.submit(render_overlay, *row, style, size)
+                self.in_flight[key] = future
+                self.renders += 1
+                owner = True
+            else:
+                self.shared += 1
+                owner = False
+        try:
+            body = future.result()
+            if owner:
+                self.cache.put(key, 'image/jpeg', body)
+            return body
+        finally:
+            if owner:
+                with self.lock:
+                    self.in_flight.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {'workers': self.workers, 'in_flight': len(self.in_flight), 'renders': self.renders,
+                    'shared_renders': self.shared, 'cache': self.cache.stats()}
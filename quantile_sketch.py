@@ -0,0 +1,134 @@
+# quantile_sketch.py - Mergeable t-digest for larva weight quantiles
+#
+# A t-digest keeps a few hundred weighted centroids: small ones near the tails, larger
+# ones around the median (Dunning's k1 scale function), so extreme quantiles stay
+# accurate. Digests merge by pooling their centroids and compressing again, which is
+# how per-day sketches answer queries over arbitrary day ranges.
+
+import struct
+
+import numpy as np
+
+DEFAULT_COMPRESSION = 100
+
+# version, compression, centroid count, min, max
+HEADER = struct.Struct('<HHIdd')
+VERSION = 1
+
+
+def _k(q, compression):
+    """k1 scale function: maps a quantile to the centroid index space."""
+    return compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+
+def _q(k, compression):
+    """Inverse of _k."""
+    return (np.sin(min(k, compression / 4) * 2 * np.pi / compression) + 1) / 2
+
+
+class TDigest:
+    """Merging t-digest over float values with optional per-value weights (counts)."""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION, means=None, weights=None, minimum=np.inf, maximum=-np.inf):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def add(self, values, weights=None):
+        """Adds values (each with weight 1 unless weights are given) and recompresses."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+        weights = np.ones_like(values) if weights is None else np.broadcast_to(np.asarray(weights, dtype=np.float64), values.shape)
+        keep = weights > 0
+        if not keep.any():
+            return self
+
+        self.min = min(self.min, float(values[keep].min()))
+        self.max = max(self.max, float(values[keep].max()))
+        self._compress(np.concatenate((self.means, values[keep])), np.concatenate((self.weights, weights[keep])))
+        return self
+
+    def merge(self, other):
+        """Folds another digest into this one."""
+        if other.weights.size:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate((self.means, other.means)), np.concatenate((self.weights, other.weights)))
+        return self
+
+    def _compress(self, means, weights):
+        """Greedily merges sorted centroids while each stays within one unit of k."""
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        merged_means, merged_weights = [], []
+        current_mean, current_weight = means[0], weights[0]
+        cumulative = 0.0
+        limit = _q(_k(0.0, self.compression) + 1, self.compression) * total
+
+        for mean, weight in zip(means[1:].tolist(), weights[1:].tolist()):
+            if cumulative + current_weight + weight <= limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                merged_means.append(current_mean)
+                merged_weights.append(current_weight)
+                cumulative += current_weight
+                limit = _q(_k(cumulative / total, self.compression) + 1, self.compression) * total
+                current_mean, current_weight = mean, weight
+
+        merged_means.append(current_mean)
+        merged_weights.append(current_weight)
+        self.means = np.array(merged_means)
+        self.weights = np.array(merged_weights)
+
+    def _knots(self):
+        """(cumulative weight, value) points: min, each centroid's midpoint, max."""
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centers, [self.weights.sum()]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return positions, values
+
+    def quantile(self, q):
+        """Value at quantile(s) q in [0, 1] (NaN for an empty digest)."""
+        if not self.weights.size:
+            return np.full(np.shape(q), np.nan)
+        positions, values = self._knots()
+        return np.interp(np.asarray(q, dtype=np.float64) * positions[-1], positions, values)
+
+    def cdf(self, x):
+        """Fraction of the weight at or below value(s) x (NaN for an empty digest)."""
+        if not self.weights.size:
+            return np.full(np.shape(x), np.nan)
+        positions, values = self._knots()
+        return np.interp(np.asarray(x, dtype=np.float64), values, positions) / positions[-1]
+
+    def to_bytes(self):
+        """Compact form: header, float64 centroid means, float32 centroid weights."""
+        header = HEADER.pack(VERSION, self.compression, len(self.means), self.min, self.max)
+        return header + self.means.astype('<f8').tobytes() + self.weights.astype('<f4').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, compression, size, minimum, maximum = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported t-digest version {version}")
+        means = np.frombuffer(data, dtype='<f8', count=size, offset=HEADER.size)
+        weights = np.frombuffer(data, dtype='<f4', count=size, offset=HEADER.size + 8 * size)
+        return cls(compression, means.astype(np.float64), weights.astype(np.float64), minimum, maximum)
+
+
+def merge_all(digests, compression=DEFAULT_COMPRESSION):
+    """One digest summarising all the given digests."""
+    merged = TDigest(compression)
+    for digest in digests:
+        merged.merge(digest)
+    return merged
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Rebuilds the ingest-maintained rollups (tray_summary, weight_sketch and growth_stats) from larvae_data.
+Run once after deploying the tables, or any time they drift:
+    python rebuild_tray_summary.py            # all users
+    python rebuild_tray_summary.py <user_id>  # one user
+"""
+import sys
+
+from BSFwebdashboard import app, db, rebuild_tray_summaries, rebuild_weight_sketches, rebuild_growth_stats
+
+def rebuild(user_id=None):
+    with app.app_context():
+        print("🚀 Rebuilding tray_summary, weight_sketch and growth_stats...")
+
+        try:
+            # Creates the rollup tables if this database predates them (existing tables are untouched)
+            db.create_all()
+            tray_count = rebuild_tray_summaries(user_id)
+            sketch_count = rebuild_weight_sketches(user_id)
+            stats_count = rebuild_growth_stats(user_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild error: {e}")
+            raise
+
+        print(f"✅ Rebuilt summaries for {tray_count} trays")
+        print(f"✅ Rebuilt {sketch_count} daily weight sketches")
+        print(f"✅ Rebuilt {stats_count} daily growth statistics")
+
+if __name__ == "__main__":
+    rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
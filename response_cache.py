@@ -0,0 +1,203 @@
+# response_cache.py - Versioned per-user response cache for the dashboard read endpoints
+#
+# Entries are keyed by (user, endpoint, tray, params, version). upload_image bumps the
+# (user, tray) version on commit, so stale entries are never looked up again and simply
+# age out of the LRU. A repeated view of an unchanged tray is a version lookup plus one
+# cache lookup.
+
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+ALL_TRAYS = 'all'
+
+
+class MemoryBackend:
+    """Process-local LRU store bounded by a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.current_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, mimetype, body):
+        size = len(body) + len(mimetype)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old[1]) + len(old[0])
+            self.entries[key] = (mimetype, body)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (old_mimetype, old_body) = self.entries.popitem(last=False)
+                self.current_bytes -= len(old_body) + len(old_mimetype)
+                self.evictions += 1
+
+    def get_version(self, scope):
+        return self.versions.get(scope, 0)
+
+    def bump_version(self, scope):
+        with self.lock:
+            self.versions[scope] = self.versions.get(scope, 0) + 1
+
+    def size(self):
+        return {'entries': len(self.entries), 'bytes': self.current_bytes, 'evictions': self.evictions}
+
+
+class DiskBackend:
+    """
+    Directory-backed store shared by every worker process on the host.
+    Version counters live next to the entries, so a bump in one worker invalidates all of them.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.entries_dir = os.path.join(directory, 'entries')
+        self.versions_dir = os.path.join(directory, 'versions')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.current_bytes = sum(entry.stat().st_size for entry in os.scandir(self.entries_dir))
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _version_path(self, scope):
+        return os.path.join(self.versions_dir, hashlib.sha1(scope.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                mimetype, _, body = f.read().partition(b'\n')
+            os.utime(path)  # Mark as recently used for LRU eviction
+            return mimetype.decode('ascii'), body
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, mimetype, body):
+        data = mimetype.encode('ascii') + b'\n' + body
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.entries_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._entry_path(key))
+        with self.lock:
+            self.current_bytes += len(data)
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drops least recently used entries until the directory is back under budget."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.entries_dir) if not entry.name.endswith('.tmp')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self.current_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.current_bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.current_bytes -= size
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Another worker evicted it first
+
+    def get_version(self, scope):
+        try:
+            with open(self._version_path(scope), 'r') as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump_version(self, scope):
+        # flock serialises bumps across workers so no increment is lost
+        with open(self._version_path(scope), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            version = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(version))
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def size(self):
+        return {'entries': len(os.listdir(self.entries_dir)), 'bytes': self.current_bytes, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """Versioned response cache with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _scope(user_id, tray_number):
+        return f"{user_id}:{ALL_TRAYS if tray_number is None else tray_number}"
+
+    def make_key(self, user_id, endpoint, tray_number, params):
+        """Builds the cache key, including the current version of the tray (or of all trays)."""
+        version = self.backend.get_version(self._scope(user_id, tray_number))
+        param_str = '&'.join(f"{name}={value}" for name, value in sorted(params))
+        return f"{user_id}|{endpoint}|{tray_number}|{param_str}|v{version}"
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, mimetype, body):
+        self.backend.set(key, mimetype, body)
+
+    def bump(self, user_id, tray_number):
+        """Invalidates cached responses for one tray and for the user's all-tray views."""
+        self.backend.bump_version(self._scope(user_id, tray_number))
+        self.backend.bump_version(self._scope(user_id, None))
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'max_bytes': self.backend.max_bytes,
+            **self.backend.size()
+        }
+
+
+def build_response_cache(cache_dir=None, max_bytes=32 * 1024 * 1024):
+    """In-memory cache by default; a directory shares entries between gunicorn workers."""
+    if cache_dir:
+        return ResponseCache(DiskBackend(cache_dir, max_bytes))
+    return ResponseCache(MemoryBackend(max_bytes))
@@ -0,0 +1,90 @@
+# session_auth.py - Cheap authentication for the dashboard's read requests
+#
+# Flask-Login calls the user loader on every @login_required request. UserCache keeps small
+# UserRecord stand-ins (id, username, verified) for USER_CACHE_TTL_SECONDS so most requests
+# skip the users query; the app drops an entry whenever that User row is updated or deleted
+# (other workers notice within the TTL).
+#
+# Read-only API routes can go further with @session_login_required: the user id is read
+# from Flask's signed session cookie, where login_user() put it, and no user is loaded at
+# all. Unauthenticated requests get a JSON 401 instead of a redirect to the login page.
+
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, session
+from flask_login import UserMixin
+
+
+class UserRecord(UserMixin):
+    """What request handlers read from current_user, without an ORM instance."""
+
+    def __init__(self, id, username, is_verified):
+        self.id = id
+        self.username = username
+        self.is_verified = is_verified
+
+    def __repr__(self):
+        return f"<UserRecord {self.username}>"
+
+
+class UserCache:
+    """Process-local TTL cache of UserRecords keyed by user id."""
+
+    def __init__(self, ttl=60.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # user_id -> (expires_at, UserRecord)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, load):
+        """Cached record for user_id, else load(user_id) (which may return None; not cached)."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        record = load(user_id)
+        if record is not None and self.ttl > 0:
+            with self.lock:
+                if len(self.entries) >= self.max_entries:
+                    # Expired entries go first; if none, start over rather than track recency
+                    self.entries = {key: value for key, value in self.entries.items() if value[0] > now}
+                    if len(self.entries) >= self.max_entries:
+                        self.entries.clear()
+                self.entries[user_id] = (now + self.ttl, record)
+        return record
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'ttl_seconds': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+def session_user_id():
+    """User id from the signed session cookie (set by login_user), or None."""
+    try:
+        return int(session['_user_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def session_login_required(view):
+    """Like @login_required for read-only API routes, without loading the user: sets g.user_id."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session_user_id()
+        if user_id is None:
+            return jsonify({"error": "Login required"}), 401
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
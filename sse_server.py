@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# sse_server.py - Asyncio SSE server for many concurrent dashboards
+#
+# The Flask /stream holds a gthread worker thread per open dashboard, so a couple of them can
+# starve the app. This aiohttp server holds each stream as a coroutine over the same ring
+# buffer (AsyncEventBroadcaster) and gets its events from the web workers through the event
+# bus, so it needs EVENT_BUS_URL set to the same value as the Flask app.
+#
+#   EVENT_BUS_URL=unix:///tmp/bsf_events.sock SECRET_KEY=... python sse_server.py
+#
+# Point the dashboard at it with SSE_STREAM_URL (e.g. https://host:10001/stream, or /sse/stream
+# behind a proxy). Users are authenticated from the Flask session cookie, so both sides need the
+# same SECRET_KEY; set SSE_ALLOWED_ORIGIN when the dashboard is served from another origin.
+#
+# Each connection is budgeted SSE_CONNECTION_BUFFER_BYTES of unsent output: a client that can't
+# keep up is dropped and resumes from its Last-Event-ID when it reconnects.
+
+import asyncio
+import os
+import time
+import uuid
+
+from aiohttp import web
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+import fast_json
+from event_broadcaster import AsyncEventBroadcaster
+from event_bus import build_event_bus
+
+SSE_PORT = int(os.environ.get('SSE_PORT', 10001))
+HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 20))
+MAX_CONNECTION_SECONDS = int(os.environ.get('SSE_MAX_CONNECTION_SECONDS', 3600))
+CONNECTION_BUFFER_BYTES = int(os.environ.get('SSE_CONNECTION_BUFFER_BYTES', 64 * 1024))
+WRITE_TIMEOUT_SECONDS = 10
+SESSION_COOKIE_NAME = 'session'
+
+
+def session_reader(secret_key):
+    """Returns a function reading the Flask-Login user id from a signed Flask session cookie."""
+    flask_app = Flask(__name__)
+    flask_app.secret_key = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(flask_app)
+    max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+
+    def user_id(cookie):
+        if not cookie:
+            return None
+        try:
+            return int(serializer.loads(cookie, max_age=max_age)['_user_id'])
+        except Exception:
+            return None
+
+    return user_id
+
+
+def sse(data, event_id=None):
+    """One SSE message; data is an already encoded JSON string."""
+    return (f"id: {event_id}\ndata: {data}\n\n" if event_id else f"data: {data}\n\n").encode('utf-8')
+
+
+async def write(request, response, chunk):
+    """
+    Writes a chunk, or returns False when the client is already over its buffer budget or
+    stalls. A chunk larger than the budget still goes out to a client that is keeping up:
+    response.write() waits for the buffer to drain below the budget before returning.
+    """
+    transport = request.transport
+    if transport is None or transport.is_closing():
+        return False
+    if transport.get_write_buffer_size() > CONNECTION_BUFFER_BYTES:
+        return False
+    try:
+        await asyncio.wait_for(response.write(chunk), WRITE_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, ConnectionResetError):
+        return False
+    return True
+
+
+async def event_stream(request):
+    """Same protocol as the Flask /stream: per-user channels, ?trays=, Last-Event-ID replay."""
+    user_id = request.app['session_user'](request.cookies.get(SESSION_COOKIE_NAME))
+    if user_id is None:
+        return web.json_response({"error": "Login required"}, status=401, headers=cors_headers(request))
+    try:
+        tray_numbers = [int(tray) for tray in request.query.get('trays', '').split(',') if tray.strip()]
+    except ValueError:
+        return web.json_response({"error": "Invalid trays. Use comma-separated tray numbers"}, status=400,
+                                 headers=cors_headers(request))
+
+    client_id = request.query.get('client_id', f"client_{uuid.uuid4().hex[:8]}_{int(time.time())}")
+    last_event_id = request.headers.get('Last-Event-ID') or request.query.get('last_event_id')
+    broadcaster = request.app['broadcaster']
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream; charset=utf-8',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        **cors_headers(request)
+    })
+    await response.prepare(request)
+    request.transport.set_write_buffer_limits(high=CONNECTION_BUFFER_BYTES)
+
+    cursor, reset = broadcaster.resume_cursor(last_event_id, user_id, tray_numbers)
+    subscriber = broadcaster.subscribe(client_id, user_id, tray_numbers, cursor)
+    try:
+        connected = fast_json.dumps({'type': 'connected', 'message': 'Stream started', 'client_id': client_id})
+        if not await write(request, response, sse(connected)):
+            return response
+        if reset:
+            if not await write(request, response, sse(fast_json.dumps({'type': 'reset'}), broadcaster.event_id(cursor))):
+                return response
+
+        deadline = time.monotonic() + MAX_CONNECTION_SECONDS
+        while not subscriber.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            events, missed = await broadcaster.wait(subscriber, cursor, min(HEARTBEAT_SECONDS, remaining))
+            cursor = subscriber.last_sequence
+            if missed:
+                chunks = [sse(fast_json.dumps({'type': 'reset'}), broadcaster.event_id(cursor))]
+            elif events:
+                # One write per event, so a long replay after a reconnect drains as it goes
+                # instead of arriving as one chunk over the budget
+                chunks = (sse(payload, broadcaster.event_id(sequence)) for sequence, payload in events)
+            else:
+                chunks = [sse(fast_json.dumps({'type': 'heartbeat', 'timestamp': time.time()}))]
+
+            written = True
+            for chunk in chunks:
+                written = await write(request, response, chunk)
+                if not written:
+                    break
+            if not written:
+                print(f"🧹 Dropped slow or closed stream {client_id}")
+                break
+    finally:
+        broadcaster.unsubscribe(subscriber)
+    return response
+
+
+def cors_headers(request):
+    origin = request.app['allowed_origin']
+    if not origin:
+        return {}
+    return {'Access-Control-Allow-Origin': origin, 'Access-Control-Allow-Credentials': 'true'}
+
+
+async def stats(request):
+    broadcaster = request.app['broadcaster']
+    result = broadcaster.stats()
+    result.pop('clients')  # One entry per connection is too much at this scale
+    return web.json_response({**result, 'event_bus': request.app['event_bus'].stats()})
+
+
+async def start_event_bus(app):
+    """Hands events from the bus threads over to the event loop."""
+    loop = asyncio.get_running_loop()
+    broadcaster = app['broadcaster']
+
+    def deliver(data, user_id, tray_number):
+        loop.call_soon_threadsafe(broadcaster.publish, data, user_id, tray_number)
+
+    url = os.environ.get('EVENT_BUS_URL')
+    if not url or url == 'local':
+        print("⚠️ EVENT_BUS_URL is not set: this server will not receive any events")
+    app['event_bus'] = build_event_bus(deliver, url)
+
+
+def create_app(secret_key=None, allowed_origin=None):
+    app = web.Application()
+    app['broadcaster'] = AsyncEventBroadcaster(
+        capacity=int(os.environ.get('SSE_BUFFER_EVENTS', 256)),
+        max_clients=int(os.environ.get('SSE_MAX_CLIENTS', 5000))
+    )
+    app['session_user'] = session_reader(secret_key or os.environ['SECRET_KEY'])
+    app['allowed_origin'] = allowed_origin or os.environ.get('SSE_ALLOWED_ORIGIN')
+    app.on_startup.append(start_event_bus)
+    app.router.add_get('/stream', event_stream)
+    app.router.add_get('/stats', stats)
+    return app
+
+
+if __name__ == '__main__':
+    print(f"🚀 Starting SSE server on port {SSE_PORT}...")
+    web.run_app(create_app(), port=SSE_PORT, access_log=None)
@@ -0,0 +1,157 @@
+"""
+Tests for email_outbox.py against a local SMTP stand-in (aiosmtpd) and the throwaway SQLite
+database from conftest.py. The worker is driven one pass at a time through process_due(),
+not its thread.
+    pip install pytest aiosmtpd
+    python -m pytest test_email_outbox.py
+"""
+import socket
+from datetime import timedelta
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+from BSFwebdashboard import app, db, EmailOutbox
+from email_outbox import (OutboxWorker, SMTPSender, utcnow, BACKOFF_SECONDS, CLAIM_TIMEOUT,
+                          MAX_ATTEMPTS)
+
+
+class StandInHandler:
+    """Accepts mail like a real server, remembering which connection delivered each message."""
+
+    def __init__(self):
+        self.messages = []       # (connection peer, recipients)
+        self.refuse_mail = 0     # Refuse this many MAIL FROM commands with a 550
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.refuse_mail:
+            self.refuse_mail -= 1
+            return '550 Sender rejected'
+        envelope.mail_from = address
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos))
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = StandInHandler()
+    port = free_port()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+@pytest.fixture
+def worker(smtp_server, database):
+    _, port = smtp_server
+    sender = SMTPSender('127.0.0.1', port, from_email='dashboard@example.com', starttls=False, timeout=5)
+    yield OutboxWorker(app, database, EmailOutbox, sender)
+    sender.close()
+
+
+def queue(recipient, **columns):
+    message = EmailOutbox(recipient=recipient, subject='Verify your account', html='<p>123456</p>', **columns)
+    db.session.add(message)
+    db.session.commit()
+    return message.id
+
+
+def make_due(message_id):
+    db.session.get(EmailOutbox, message_id).next_attempt_at = utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_messages_share_one_connection(smtp_server, worker):
+    handler, _ = smtp_server
+    ids = [queue(f'user{i}@example.com') for i in range(3)]
+
+    assert worker.process_due() == 3
+
+    assert [recipients for _, recipients in handler.messages] == [[f'user{i}@example.com'] for i in range(3)]
+    assert len({peer for peer, _ in handler.messages}) == 1
+    for message_id in ids:
+        message = db.session.get(EmailOutbox, message_id)
+        assert message.status == 'sent'
+        assert message.attempts == 1
+        assert message.html == ''
+        assert message.send_ms is not None
+
+
+def test_refused_mail_is_retried_with_backoff(smtp_server, worker):
+    handler, _ = smtp_server
+    handler.refuse_mail = 1
+    message_id = queue('user@example.com')
+
+    before = utcnow()
+    worker.process_due()
+
+    message = db.session.get(EmailOutbox, message_id)
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert '550' in message.last_error
+    delay = (message.next_attempt_at - before).total_seconds()
+    assert BACKOFF_SECONDS * 0.8 <= delay <= BACKOFF_SECONDS * 1.2 + 1
+    assert worker.next_retry is not None
+    assert worker.process_due() == 0  # Not due yet
+
+    make_due(message_id)
+    worker.process_due()
+
+    message = db.session.get(EmailOutbox, message_id)
+    assert message.status == 'sent'
+    assert message.attempts == 2
+    assert worker.sender.connection is not None  # A refusal doesn't cost the connection
+    assert len(handler.messages) == 1
+
+
+def test_gives_up_after_max_attempts(smtp_server, worker):
+    handler, _ = smtp_server
+    handler.refuse_mail = MAX_ATTEMPTS + 1
+    message_id = queue('user@example.com')
+
+    for _ in range(MAX_ATTEMPTS):
+        make_due(message_id)
+        assert worker.process_due() == 1
+
+    message = db.session.get(EmailOutbox, message_id)
+    assert message.status == 'failed'
+    assert message.attempts == MAX_ATTEMPTS
+    make_due(message_id)
+    assert worker.process_due() == 0
+    assert handler.messages == []
+
+
+def test_stale_sending_rows_are_reclaimed(smtp_server, worker):
+    handler, _ = smtp_server
+    stale = queue('stale@example.com', status='sending', attempts=1,
+                  claimed_at=utcnow() - CLAIM_TIMEOUT - timedelta(minutes=1))
+    in_progress = queue('busy@example.com', status='sending', attempts=1, claimed_at=utcnow())
+
+    assert worker.process_due() == 1
+
+    assert db.session.get(EmailOutbox, stale).status == 'sent'
+    assert db.session.get(EmailOutbox, in_progress).status == 'sending'
+    assert [recipients for _, recipients in handler.messages] == [['stale@example.com']]
+
+
+def test_stale_row_is_claimed_by_one_worker_only(worker):
+    message_id = queue('stale@example.com', status='sending', attempts=1,
+                       claimed_at=utcnow() - CLAIM_TIMEOUT - timedelta(minutes=1))
+    other = OutboxWorker(app, db, EmailOutbox, worker.sender)
+
+    # Both workers read the row before either claims it
+    seen_first, seen_second = worker.due_candidates(), other.due_candidates()
+
+    assert [message.id for message in worker.claim(seen_first)] == [message_id]
+    assert other.claim(seen_second) == []
@@ -0,0 +1,86 @@
+"""Tests for the Unix socket event bus: a hub and its peers, all in this process."""
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+import event_bus
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Inbox:
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def deliver(self, data, user_id, tray_number):
+        with self.lock:
+            self.events.append(data)
+
+
+@pytest.fixture
+def bus_path():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'events.sock')
+
+
+def start_bus(path):
+    inbox = Inbox()
+    bus = event_bus.build_event_bus(inbox.deliver, f'unix://{path}')
+    return bus, inbox
+
+
+def test_concurrent_publishes_arrive_whole(bus_path):
+    hub, hub_inbox = start_bus(bus_path)
+    assert wait_for(lambda: hub.is_hub)
+    sender, _ = start_bus(bus_path)
+    receiver, receiver_inbox = start_bus(bus_path)
+    assert wait_for(lambda: hub.stats()['peers'] == 2)
+
+    def publish_many(thread):
+        for i in range(100):
+            sender.publish({'type': 'new_data', 'thread': thread, 'i': i, 'padding': 'x' * 300000}, user_id=1)
+
+    threads = [threading.Thread(target=publish_many, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert wait_for(lambda: len(receiver_inbox.events) == 400)
+    assert wait_for(lambda: len(hub_inbox.events) == 400)
+    for thread in range(4):
+        # Every line parsed, and each publisher's events kept in order
+        assert [e['i'] for e in receiver_inbox.events if e['thread'] == thread] == list(range(100))
+
+
+def test_stalled_peer_is_dropped_without_holding_up_the_others(bus_path):
+    hub, _ = start_bus(bus_path)
+    assert wait_for(lambda: hub.is_hub)
+    receiver, receiver_inbox = start_bus(bus_path)
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.connect(bus_path)  # Never reads
+    assert wait_for(lambda: hub.stats()['peers'] == 2)
+
+    # Enough to fill the stalled socket's buffers and then its queue
+    events = event_bus.SOCKET_QUEUE_LINES * 3
+    for i in range(events):
+        hub.publish({'type': 'new_data', 'i': i, 'padding': 'x' * 2000}, user_id=1)
+        if i % 100 == 99:
+            assert wait_for(lambda: len(receiver_inbox.events) > i - 100)  # Healthy peers keep up
+
+    assert wait_for(lambda: len(receiver_inbox.events) == events)
+    assert [event['i'] for event in receiver_inbox.events] == list(range(events))
+    assert wait_for(lambda: hub.stats()['peers'] == 1)
+    stalled.close()
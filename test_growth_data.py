@@ -0,0 +1,93 @@
+"""Tests for the growth chart endpoints: windows, max_points and the ?since= deltas."""
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import pytest
+
+from BSFwebdashboard import LarvaeData, rebuild_tray_summaries
+
+FIRST_CAPTURE = datetime(2026, 3, 1, 8, 0)
+
+
+@pytest.fixture
+def seed(database, client):
+    """Adds hourly captures of three larvae to a tray and rebuilds its summary."""
+    def add(tray_number, captures, start=FIRST_CAPTURE):
+        for i in range(captures):
+            for weight in (90.0, 100.0, 110.0):
+                database.session.add(LarvaeData(
+                    user_id=1, tray_number=tray_number, length=20.0, width=4.0, area=60.0,
+                    weight=weight + i, count=1, timestamp=start + timedelta(hours=i)
+                ))
+        database.session.commit()
+        rebuild_tray_summaries(1)
+    return add
+
+
+def delta(client, endpoint, cursor, **params):
+    query = '&'.join([f'since={quote(cursor)}', *(f'{name}={value}' for name, value in params.items())])
+    return client.get(f'{endpoint}?{query}').get_json()
+
+
+def test_tray_series_and_delta(client, upload, seed):
+    seed(1, 4)
+    base = client.get('/get_tray_data/1?max_points=5').get_json()
+    assert base['growthData']['days'] == [0.0, 1.0, 2.0, 3.0]
+    assert base['growthData']['weight'] == [100.0, 101.0, 102.0, 103.0]
+
+    upload(1, [120.0, 130.0])
+
+    body = delta(client, '/get_tray_data/1', base['cursor'], max_points=5)
+    assert 'reset' not in body
+    assert body['growthData']['weight'] == [125.0]
+    assert sum(body['weightDistribution']['counts']) == 2
+    assert body['cursor'] > base['cursor']
+    assert delta(client, '/get_tray_data/1', body['cursor'], max_points=5)['growthData']['days'] == []
+
+
+def test_delta_resets_once_the_series_is_downsampled(client, upload, seed):
+    seed(1, 5)
+    base = client.get('/get_tray_data/1?max_points=5').get_json()
+    upload(1, [120.0])
+
+    assert delta(client, '/get_tray_data/1', base['cursor'], max_points=5)['reset'] is True
+    # Without max_points the charts hold every capture, so the point can be appended
+    assert delta(client, '/get_tray_data/1', base['cursor'])['growthData']['weight'] == [120.0]
+
+
+def test_delta_resets_for_bucketed_series(client, upload, seed):
+    seed(1, 2)
+    base = client.get('/get_tray_data/1?bucket=day').get_json()
+    upload(1, [120.0])
+
+    assert delta(client, '/get_tray_data/1', base['cursor'], bucket='day')['reset'] is True
+
+
+def test_combined_delta(client, upload, seed):
+    seed(1, 3)
+    seed(2, 3, start=FIRST_CAPTURE + timedelta(minutes=30))
+    base = client.get('/get_combined_tray_data?max_points=5').get_json()
+    assert set(base['traysGrowthData']) == {'1', '2'}
+
+    upload(2, [150.0])
+
+    body = delta(client, '/get_combined_tray_data', base['cursor'], max_points=5)
+    assert list(body['traysGrowthData']) == ['2']
+    assert body['traysGrowthData']['2']['weight'] == [150.0]
+    assert body['metrics']['count'] == 19
+    assert delta(client, '/get_combined_tray_data', base['cursor'], max_points=3)['reset'] is True
+
+
+def test_invalid_delta_parameters(client, seed):
+    seed(1, 2)
+    assert client.get('/get_tray_data/1?since=yesterday').status_code == 400
+    assert client.get(f"/get_tray_data/1?since={quote(FIRST_CAPTURE.isoformat())}&max_points=1").status_code == 400
+
+
+def test_date_only_to_covers_the_whole_day(client, seed):
+    seed(1, 4, start=datetime(2026, 3, 1, 21, 0))  # 21:00 to 00:00 the next day
+
+    body = client.get('/get_tray_data/1?from=2026-03-01&to=2026-03-01').get_json()
+
+    assert body['growthData']['weight'] == [100.0, 101.0, 102.0]
+    assert client.get('/get_tray_data/1?to=2026-03-01T00:00:00').status_code == 404
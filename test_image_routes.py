@@ -0,0 +1,124 @@
+"""Tests for the stored-image routes: byte ranges on /image/<id> and the paginated gallery."""
+import base64
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from BSFwebdashboard import ImageFile, User
+
+
+def jpeg(width=64, height=48):
+    noise = np.random.default_rng(width).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    output = BytesIO()
+    Image.fromarray(noise).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def upload_image(upload, tray_number, data):
+    """Uploads one capture with an image and returns the stored image's id."""
+    upload(tray_number, [100.0], image_data=base64.b64encode(data).decode())
+    return ImageFile.query.order_by(ImageFile.id.desc()).first().id
+
+
+@pytest.fixture
+def image(upload):
+    """(image_id, bytes) of one uploaded image."""
+    data = jpeg()
+    return upload_image(upload, 1, data), data
+
+
+def test_whole_image(client, image):
+    image_id, data = image
+
+    response = client.get(f'/image/{image_id}')
+
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == str(len(data))
+    assert response.mimetype == 'image/jpeg'
+
+
+@pytest.mark.parametrize('header, span', [
+    ('bytes=0-99', (0, 100)),
+    ('bytes=100-', (100, None)),
+    ('bytes=-50', (-50, None)),
+])
+def test_byte_ranges(client, image, header, span):
+    image_id, data = image
+    expected = data[span[0]:span[1]]
+
+    response = client.get(f'/image/{image_id}', headers={'Range': header})
+
+    assert response.status_code == 206
+    assert response.data == expected
+    start = span[0] % len(data)
+    assert response.headers['Content-Range'] == f"bytes {start}-{start + len(expected) - 1}/{len(data)}"
+    assert response.headers['Content-Length'] == str(len(expected))
+
+
+def test_unsatisfiable_range(client, image):
+    image_id, data = image
+
+    response = client.get(f'/image/{image_id}', headers={'Range': f'bytes={len(data) + 10}-'})
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(data)}"
+
+
+def test_if_range_needs_our_strong_etag(client, image):
+    image_id, data = image
+    etag = client.get(f'/image/{image_id}').headers['ETag']
+
+    def fetch(if_range):
+        return client.get(f'/image/{image_id}', headers={'Range': 'bytes=0-9', 'If-Range': if_range})
+
+    assert fetch(etag).status_code == 206
+    for stale in ('W/' + etag, '"something-else"', 'Tue, 01 Sep 2026 00:00:00 GMT'):
+        response = fetch(stale)
+        assert response.status_code == 200
+        assert response.data == data
+
+
+def test_if_none_match(client, image):
+    image_id, _ = image
+    etag = client.get(f'/image/{image_id}').headers['ETag']
+
+    assert client.get(f'/image/{image_id}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_other_users_image_is_not_found(client, image, database):
+    image_id, _ = image
+    other = User(username='neighbour', email='neighbour@example.com', is_verified=True)
+    other.set_password('secret123')
+    database.session.add(other)
+    database.session.commit()
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'neighbour', 'password': 'secret123'})
+
+    assert client.get(f'/image/{image_id}').status_code == 404
+
+
+def test_gallery_pages_through_every_image_once(client, upload):
+    ids = [upload_image(upload, 1 + i % 2, jpeg(32 + i)) for i in range(7)]
+
+    seen, cursor = [], None
+    for _ in range(10):
+        body = client.get('/api/images/all?limit=3' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        seen += [image['id'] for image in body['images']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == ids[::-1]  # Newest first
+    tray_one = client.get('/api/images/1?limit=10').get_json()
+    assert [image['id'] for image in tray_one['images']] == ids[::2][::-1]
+    assert tray_one['next_cursor'] is None
+
+
+def test_gallery_rejects_bad_parameters(client):
+    assert client.get('/api/images/all?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/images/one').status_code == 400
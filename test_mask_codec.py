@@ -0,0 +1,90 @@
+"""Tests for mask_codec: RLE round-trips, mask regions and validation of uploaded masks."""
+import base64
+import json
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import mask_codec
+
+
+def larva_mask(height=40, width=60):
+    mask = np.zeros((height, width), dtype=np.uint8)
+    mask[10:18, 5:30] = 1
+    mask[30:35, 50:60] = 1  # Touches the right edge
+    return mask
+
+
+@pytest.mark.parametrize('mask', [
+    larva_mask(),
+    np.zeros((6, 4), dtype=np.uint8),
+    np.ones((6, 4), dtype=np.uint8),
+    np.eye(5, dtype=np.uint8),
+    larva_mask()[None],  # Model outputs have a leading 1-sized axis
+])
+def test_rle_round_trip(mask):
+    encoded = mask_codec.encode_rle(mask)
+
+    assert encoded['size'] == list(mask_codec.as_2d(mask).shape)
+    assert np.array_equal(mask_codec.decode_mask(encoded), mask_codec.as_2d(mask))
+    assert mask_codec.checked(json.loads(json.dumps(encoded))) == encoded
+
+
+def test_counts_string_round_trip_large_runs():
+    counts = [0, 1, 70000, 3, 2_000_000, 31, 32, 1]
+    assert mask_codec.string_to_counts(mask_codec.counts_to_string(counts)) == counts
+
+
+def test_mask_region_matches_full_decode():
+    mask = larva_mask()
+    top, left, crop = mask_codec.mask_region(mask_codec.encode_rle(mask))
+
+    assert (top, left) == (10, 5)
+    assert crop.shape == (25, 55)
+    assert np.array_equal(crop, mask[10:35, 5:60])
+    assert mask_codec.mask_region(mask_codec.encode_rle(np.zeros((4, 4), dtype=np.uint8))) is None
+
+
+def test_legacy_nested_lists_are_stored_as_rle():
+    mask = larva_mask()
+    stored = json.loads(mask_codec.compact_masks(json.dumps([mask[None].tolist()])))
+
+    assert set(stored[0]) == {'size', 'counts'}
+    assert np.array_equal(mask_codec.decode_masks(stored)[0], mask)
+
+
+def test_polygon_decodes_inside_its_frame():
+    polygon = {'size': [10, 10], 'polygons': [[2, 2, 7, 2, 7, 6, 2, 6]]}
+    mask = mask_codec.decode_mask(mask_codec.checked(polygon))
+
+    assert mask.shape == (10, 10)
+    assert mask[2:7, 2:8].all() and mask.sum() == 30
+
+
+@pytest.mark.parametrize('encoded', [
+    {'size': [2, 2], 'counts': '0314'},        # Runs add up to 11 pixels, not 4
+    {'size': [2, 2], 'counts': '1'},           # Too few pixels
+    {'size': [2, 2], 'counts': 'R'},           # Truncated: the last char says more follow
+    {'size': [2, 2], 'counts': mask_codec.counts_to_string([5, -1])},
+    {'size': [2, 2], 'counts': [4]},
+    {'size': [2], 'counts': '4'},
+    {'size': [100_000, 100_000], 'counts': '0'},
+    {'size': [4, 4], 'polygons': [[0, 0, 9, 0, 9, 3]]},
+    {'size': [4, 4], 'polygons': [[0, 0, 1]]},
+])
+def test_malformed_uploads_are_rejected(encoded):
+    with pytest.raises(ValueError):
+        mask_codec.compact_masks([encoded])
+
+
+
+def test_upload_with_malformed_mask_is_refused(upload):
+    image = BytesIO()
+    Image.new('RGB', (8, 8)).save(image, format='JPEG')
+
+    body = upload(1, [100.0], image_data=base64.b64encode(image.getvalue()).decode(),
+                  masks=json.dumps([{'size': [2, 2], 'counts': '0314'}]), status=400)
+
+    assert body['error'] == 'Invalid masks'
@@ -0,0 +1,94 @@
+"""Tests for metrics_engine: capture/hour/day bucketing, growth series and LTTB downsampling."""
+import numpy as np
+import pytest
+
+import metrics_engine
+
+START = np.datetime64('2026-03-01T00:00:00', 'us')
+
+
+def columns_at(offsets_seconds, weights, lengths=None):
+    timestamps = START + (np.asarray(offsets_seconds, dtype=np.float64) * 1e6).astype('timedelta64[us]')
+    weights = np.asarray(weights, dtype=np.float64)
+    return {
+        'timestamp': timestamps,
+        'weight': weights,
+        'length': np.asarray(lengths if lengths is not None else weights / 5, dtype=np.float64),
+    }
+
+
+def test_rows_of_one_capture_become_one_point():
+    # Two captures an hour apart; older uploads stamped each larva microseconds apart
+    columns = columns_at([0, 0.000001, 0.000002, 3600, 3600], [90, 100, 110, 120, 140])
+
+    hours, series = metrics_engine.growth_series(columns, START, ('weight', 'length'))
+
+    assert hours.tolist() == [0.0, 1.0]
+    assert series['weight'].tolist() == [100.0, 130.0]
+    assert series['length'].tolist() == [20.0, 26.0]
+
+
+@pytest.mark.parametrize('bucket, expected_hours, expected_weights', [
+    ('capture', [0.0, 0.5, 1.5, 25.0], [100.0, 110.0, 120.0, 130.0]),
+    ('hour', [0.0, 1.5, 25.0], [105.0, 120.0, 130.0]),
+    ('day', [0.0, 25.0], [110.0, 130.0]),
+])
+def test_buckets(bucket, expected_hours, expected_weights):
+    columns = columns_at([0, 1800, 5400, 90000], [100, 110, 120, 130])
+
+    hours, series = metrics_engine.growth_series(columns, START, ('weight',), bucket=bucket)
+
+    assert hours.tolist() == expected_hours  # Each bucket sits at its first row
+    assert series['weight'].tolist() == expected_weights
+
+
+def test_hours_count_from_the_given_start():
+    columns = columns_at([7200, 10800], [100, 110])
+
+    hours, _ = metrics_engine.growth_series(columns, START - np.timedelta64(1, 'h'), ('weight',))
+
+    assert hours.tolist() == [3.0, 4.0]
+
+
+def test_max_points_downsamples_every_series_alike():
+    n = 1000
+    weights = 100 + np.sin(np.linspace(0, 6, n)) * 10
+    weights[500] = 400  # A spike LTTB must keep
+    columns = columns_at(np.arange(n) * 600, weights)
+
+    hours, series = metrics_engine.growth_series(columns, START, ('weight', 'length'), max_points=50)
+
+    assert len(hours) == len(series['weight']) == len(series['length']) == 50
+    assert hours[0] == 0.0 and hours[-1] == (n - 1) / 6
+    assert np.all(np.diff(hours) > 0)
+    assert 400 in series['weight']
+    assert np.allclose(series['length'], series['weight'] / 5)
+
+
+def test_short_series_is_not_downsampled():
+    columns = columns_at(np.arange(10) * 600, np.arange(10) + 100.0)
+
+    hours, series = metrics_engine.growth_series(columns, START, ('weight',), max_points=50)
+
+    assert len(hours) == 10
+    assert series['weight'].tolist() == (np.arange(10) + 100.0).tolist()
+
+
+@pytest.mark.parametrize('n, max_points', [(10, 2), (10, 3), (101, 10), (5, 5)])
+def test_lttb_indices(n, max_points):
+    x = np.arange(n, dtype=np.float64)
+    y = np.random.default_rng(n).normal(size=n)
+
+    keep = metrics_engine.lttb_indices(x, y, max_points)
+
+    assert len(keep) == min(n, max_points)
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_empty_columns():
+    columns = {'timestamp': np.empty(0, dtype='datetime64[us]'), 'weight': np.empty(0)}
+
+    hours, series = metrics_engine.growth_series(columns, START, ('weight',), max_points=10)
+
+    assert len(hours) == 0 and len(series['weight']) == 0
@@ -0,0 +1,84 @@
+"""Tests for quantile_sketch.TDigest: accuracy, merging, weights and the stored byte form."""
+import numpy as np
+import pytest
+
+from quantile_sketch import TDigest, merge_all
+
+QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+@pytest.fixture
+def weights():
+    return np.random.default_rng(7).normal(110.0, 15.0, 20_000)
+
+
+def test_quantiles_track_the_exact_ones(weights):
+    digest = TDigest().add(weights)
+
+    assert digest.count == len(weights)
+    assert digest.min == weights.min() and digest.max == weights.max()
+    assert len(digest.means) < 300
+    exact = np.quantile(weights, QUANTILES)
+    # Within 0.5% of the value range everywhere, tighter in the tails
+    assert np.abs(digest.quantile(QUANTILES) - exact).max() < 0.005 * np.ptp(weights)
+    assert digest.quantile(0.0) == weights.min() and digest.quantile(1.0) == weights.max()
+
+
+def test_cdf_inverts_quantile(weights):
+    digest = TDigest().add(weights)
+
+    values = digest.quantile(QUANTILES)
+    assert np.allclose(digest.cdf(values), QUANTILES, atol=0.002)
+    assert digest.cdf(weights.min() - 1) == 0.0 and digest.cdf(weights.max() + 1) == 1.0
+
+
+def test_merged_days_match_one_digest(weights):
+    days = np.array_split(weights, 30)
+
+    merged = merge_all(TDigest().add(day) for day in days)
+
+    assert merged.count == len(weights)
+    assert merged.min == weights.min() and merged.max == weights.max()
+    assert np.abs(merged.quantile(QUANTILES) - np.quantile(weights, QUANTILES)).max() < 0.005 * np.ptp(weights)
+
+
+def test_counts_weigh_like_repeated_values():
+    rng = np.random.default_rng(3)
+    values = rng.normal(110.0, 15.0, 5000)
+    counts = rng.integers(1, 6, 5000)
+
+    weighted = TDigest().add(values, counts)
+    repeated = np.repeat(values, counts)
+
+    assert weighted.count == counts.sum()
+    exact = np.quantile(repeated, QUANTILES)
+    assert np.abs(weighted.quantile(QUANTILES) - exact).max() < 0.005 * np.ptp(repeated)
+    assert TDigest().add([90.0, 100.0], [0, 0]).count == 0
+
+
+def test_bytes_round_trip(weights):
+    digest = TDigest().add(weights)
+
+    restored = TDigest.from_bytes(digest.to_bytes())
+
+    assert restored.compression == digest.compression
+    assert (restored.min, restored.max) == (digest.min, digest.max)
+    assert np.array_equal(restored.means, digest.means)
+    assert np.allclose(restored.quantile(QUANTILES), digest.quantile(QUANTILES), rtol=1e-6)
+
+
+def test_empty_digest():
+    digest = TDigest()
+
+    assert digest.count == 0
+    assert np.isnan(digest.quantile(0.5))
+    assert np.isnan(digest.cdf(100.0))
+    assert TDigest.from_bytes(digest.to_bytes()).count == 0
+    assert merge_all([]).count == 0
+
+
+def test_unknown_version_is_rejected():
+    data = bytearray(TDigest().add([1.0, 2.0]).to_bytes())
+    data[0] = 99
+    with pytest.raises(ValueError):
+        TDigest.from_bytes(bytes(data))
@@ -0,0 +1,48 @@
+"""Tests for the ingest-maintained tray_summary and the combined metrics taken from it."""
+import pytest
+from sqlalchemy import event, func
+
+import BSFwebdashboard
+from BSFwebdashboard import LarvaeData, aggregate_metrics, rebuild_tray_summaries
+
+
+def larvae_averages(db):
+    length, weight, rows = db.session.query(
+        func.avg(LarvaeData.length), func.avg(LarvaeData.weight), func.count()
+    ).one()
+    return {'length': round(length, 1), 'weight': round(weight, 3), 'count': rows}
+
+
+def test_combined_metrics_match_the_larvae_rows(database, upload):
+    upload(1, [90.0, 100.0, 110.0])
+    upload(2, [120.0], avg_length=30.0)
+    upload(1, [], count=4, avg_weight=95.0)  # Average-only capture: one row stands in for it
+
+    metrics = aggregate_metrics(1)
+
+    assert {key: metrics[key] for key in ('length', 'weight', 'count')} == larvae_averages(database)
+    rebuild_tray_summaries(1)
+    assert aggregate_metrics(1) == metrics
+
+
+def test_live_update_flush_does_not_scan_larvae(database, upload, monkeypatch):
+    events = []
+    monkeypatch.setattr(BSFwebdashboard, 'broadcast_to_clients', lambda data, user_id=None: events.append(data))
+    monkeypatch.setattr(BSFwebdashboard.live_updates, 'window', 3600)  # Flushed by hand below
+    upload(1, [90.0, 100.0, 110.0])
+    upload(2, [120.0])
+    BSFwebdashboard.live_updates.flush_pending()
+    events.clear()
+
+    upload(2, [130.0])
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(database.engine, 'before_cursor_execute', listener)
+    try:
+        BSFwebdashboard.live_updates.flush_pending()
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', listener)
+
+    assert statements and not any('larvae_data' in statement for statement in statements)
+    assert [e['combinedDelta']['metrics']['count'] for e in events if e['type'] == 'new_data'] == [5]
+    assert events[-1]['combinedDelta']['metrics']['weight'] == pytest.approx(110.0)
@@ -0,0 +1,42 @@
+"""Tests for /api/weight_quantiles, the per-day t-digests behind it and its cached responses."""
+
+
+def test_quantiles_of_one_tray(client, upload):
+    upload(1, [90.0, 100.0, 110.0])
+
+    body = client.get('/api/weight_quantiles/1?q=0,0.5,1').get_json()
+
+    assert body['count'] == 3
+    assert body['min'] == 90.0
+    assert body['max'] == 110.0
+    assert body['quantiles'] == {'0.0': 90.0, '0.5': 100.0, '1.0': 110.0}
+
+
+def test_all_trays_view_sees_new_uploads(client, upload):
+    upload(1, [90.0, 100.0, 110.0])
+    assert client.get('/api/weight_quantiles/0').get_json()['count'] == 3
+
+    upload(2, [95.0, 105.0, 115.0, 125.0])
+
+    assert client.get('/api/weight_quantiles/0').get_json()['count'] == 7
+    assert client.get('/api/weight_quantiles/2').get_json()['count'] == 4
+
+
+def test_tray_view_sees_new_uploads(client, upload):
+    upload(1, [90.0, 100.0, 110.0])
+    assert client.get('/api/weight_quantiles/1').get_json()['count'] == 3
+
+    upload(1, [120.0])
+
+    assert client.get('/api/weight_quantiles/1').get_json()['count'] == 4
+
+
+def test_invalid_quantile_is_rejected(client, upload):
+    upload(1, [100.0])
+    assert client.get('/api/weight_quantiles/1?q=1.5').status_code == 400
+    assert client.get('/api/weight_quantiles/1?from=yesterday').status_code == 400
+
+
+def test_unknown_tray_is_not_found(client, upload):
+    upload(1, [100.0])
+    assert client.get('/api/weight_quantiles/9').status_code == 404
@@ -12,6 +12,7 @@ import base64
 #from camera_capture import capture_image
 import math
 from skimage.measure import perimeter
+import mask_codec
 import RPi.GPIO as GPIO
 import subprocess
 # --- Flat-Bug Model Imports ---
@@ -60,6 +61,13 @@ FLATBUG_DTYPE = "float32"
 # Calibration Factor (pixels per millimeter)
 PIXELS_PER_MM = 0.132
 
+# Detection mask encoding for uploads: "rle" (lossless) or "polygon" (simplified outlines)
+MASK_FORMAT = "rle"
+
+# Draw boxes and masks with prediction_results.plot() on the Pi as well. The server renders
+# overlays from the uploaded detections (/image/<id>/overlay), so this is only for local review.
+ANNOTATE_ON_DEVICE = False
+
 # =============================================================================
 def capture_image(DIR):
     if not os.path.exists(DIR):
@@ -264,17 +272,18 @@ def compute_and_aggregate_metrics(prediction_results, tray_number):
         print(f"Found {total_count} larvae in Tray {tray_number}.")
 
         # Save detection image locally (optional)
-        detected_image_path = os.path.join(OUTPUT_DETECTION_DIR, f"detected_{tray_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-        prediction_results.plot(
-            outpath=detected_image_path,
-            masks=True,
-            boxes=True,
-            confidence=True,
-            linewidth=2,
-            contour_color=(0, 255, 0),
-            box_color=(255, 0, 0)
-        )
-        print(f"Saved detection image to: {detected_image_path}")
+        if ANNOTATE_ON_DEVICE:
+            detected_image_path = os.path.join(OUTPUT_DETECTION_DIR, f"detected_{tray_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
+            prediction_results.plot(
+                outpath=detected_image_path,
+                masks=True,
+                boxes=True,
+                confidence=True,
+                linewidth=2,
+                contour_color=(0, 255, 0),
+                box_color=(255, 0, 0)
+            )
+            print(f"Saved detection image to: {detected_image_path}")
 
         # Calculate metrics
         for larva_id in range(total_count):
@@ -341,6 +350,7 @@ def upload_image_to_api(image_path, tray_number, count, avg_length, avg_width, a
     """Uploads detection data directly to web app API; image is optional."""
     try:
         image_data_base64 = None
+        detection_frame = None
         if image_path:
             # Read and compress image before encoding - PRESERVES ORIGINAL COLORS
             print(f"Reading and compressing image for Tray {tray_number}...")
@@ -357,6 +367,7 @@ def upload_image_to_api(image_path, tray_number, count, avg_length, avg_width, a
             # Resize if too large (same as your main app)
             max_dimension = 1200
             height, width = img_rgb.shape[:2]
+            detection_frame = [height, width]  # The boxes are in this frame, not the resized upload's
 
             if max(height, width) > max_dimension:
                 scale = max_dimension / max(height, width)
@@ -400,6 +411,7 @@ def upload_image_to_api(image_path, tray_number, count, avg_length, avg_width, a
         }
         if image_data_base64:
             api_payload['image_data'] = image_data_base64
+            api_payload['detection_frame'] = detection_frame
         
         print(f"Uploading payload for Tray {tray_number} to API...")
         
@@ -475,8 +487,8 @@ def upload_image_to_api_with_retry(image_path, tray_number, count, avg_length, a
     return False
 
 # NEW: Extract bounding boxes and masks with limit
-def extract_detection_data(prediction_results, max_detections=50):
-    """Extracts bounding boxes and masks from prediction results for API upload, with limit to avoid oversized payloads."""
+def extract_detection_data(prediction_results, max_detections=50, mask_format=MASK_FORMAT):
+    """Extracts bounding boxes and encoded masks (see mask_codec) from prediction results for API upload, with limit to avoid oversized payloads."""
     bounding_boxes = []
     masks = []
     
@@ -494,7 +506,7 @@ def extract_detection_data(prediction_results, max_detections=50):
             if hasattr(prediction_results, 'masks') and prediction_results.masks is not None and len(prediction_results.masks) > larva_id:
                 larva_mask_object = prediction_results.masks[larva_id]
                 mask = larva_mask_object.data.cpu().numpy().astype(np.uint8)
-                masks.append(mask.tolist())
+                masks.append(mask_codec.encode_mask(mask, mask_format))
     
     return bounding_boxes, masks
 
@@ -580,8 +592,8 @@ def process_available_images(reader, predictor, mqtt_client):
     # Send metrics via MQTT
     publish_data(mqtt_client, metrics_payload)
 
-    # Upload payload via API (image optional)
-    api_image_path = detected_image_path if detected_image_path else None
+    # Upload payload via API (image optional): the original capture, the server draws the overlays
+    api_image_path = image_path if total_count > 0 else None
     upload_success = upload_image_to_api_with_retry(
             image_path=api_image_path,
             tray_number=tray_number,